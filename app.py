@@ -1,5 +1,3 @@
-import time
-
 import streamlit as st
 
 from config import (
@@ -23,15 +21,26 @@ from callbacks import (
     _set_cached_pages,
     _set_processed_pages,
     _set_client,
+    get_scraper,
+    job_manager,
 )
 
-from data_processing import process_data
+from data_processing import (
+    StreamingProcessor,
+    process_data,
+    processing_cache,
+    save_table,
+)
 
+from espatula.jobs import ERRO, JobSpec
 from ui import (
+    ARRANJO_COLUNAS,
+    COLUMN_CONFIG,
     presentation_page,
     is_folders_ok,
     get_cached_info,
     get_params,
+    show_raw_data,
     show_results,
 )
 
@@ -115,13 +124,13 @@ def set_client():
 @st.fragment
 def show_links():
     if STATE.cached_links:
-        st.json(list(STATE.cached_links.values()), expanded=True)
+        show_raw_data(STATE, "links")
 
 
 @st.fragment
 def show_pages():
     if STATE.cached_pages is not None:
-        st.json(list(STATE.cached_pages.values()), expanded=1)
+        show_raw_data(STATE, "pages")
 
 
 @st.fragment
@@ -131,97 +140,146 @@ def show_processed_pages():
             show_results(STATE)
 
 
-def run_search(scraper):
-    try:
-        with st.container():
-            progress_text = "Realizando a busca de produtos...🕸️"
-            progress_bar = st.progress(0, text=progress_text)
-            output = st.empty()
-            step = 100 / STATE.max_search
-            i = 0
-            for result in scraper.search(
-                keyword=STATE.keyword,
-                max_pages=STATE.max_search,
-            ):
-                i += 1
-                percentage = min(int(i * step), 100)
-                progress_bar.progress(percentage, text=f"{progress_text} {percentage}%")
-                with output.empty():
-                    st.write(result)
-            time.sleep(1)
-            output.empty()
-            progress_bar.empty()
-        set_cached_links()
-    except Exception as e:
-        raise e
-
-
-def inspect_pages(scraper):
-    with st.container():
-        progress_text = "Realizando raspagem das páginas dos produtos...🕷️"
-        progress_bar = st.progress(0, text=progress_text)
-        output = st.empty()
-        step = 100 / STATE.max_pages
-        i = 0
-        for result in scraper.inspect_pages(
-            keyword=STATE.keyword,
-            screenshot=True,  # STATE.screenshot,
-            sample=STATE.max_pages,
-            shuffle=STATE.shuffle,
-        ):
-            i += 1
-            percentage = min(int(i * step), 100)
-            progress_bar.progress(percentage, text=f"{progress_text} {percentage}%")
-            with output.empty():
-                left, right = st.columns([1, 1], vertical_alignment="top")
-                with left:
-                    try:
-                        if imagem := result.get("imagens"):
-                            imagem = imagem[0]
-                        else:
-                            imagem = result.get("imagem")
-                        left.write("Imagem do produto")
-                        nome = result.get("nome")
-                        left.image(imagem, use_column_width="auto", caption=nome)
-                    except Exception:
-                        left.write("Não foi possível carregar a imagem do produto")
-                with right:
-                    right.write("Dados do produto")
-                    right.json(result, expanded=1)
-        time.sleep(1)
-        output.empty()
-        progress_bar.empty()
+def show_product(placeholder, result: dict):
+    # Último anúncio recebido do job, exibido enquanto a raspagem continua
+    with placeholder.container():
+        left, right = st.columns([1, 1], vertical_alignment="top")
+        with left:
+            try:
+                if imagem := result.get("imagens"):
+                    imagem = imagem[0]
+                else:
+                    imagem = result.get("imagem")
+                left.write("Imagem do produto")
+                nome = result.get("nome")
+                left.image(imagem, use_column_width="auto", caption=nome)
+            except Exception:
+                left.write("Não foi possível carregar a imagem do produto")
+        with right:
+            right.write("Dados do produto")
+            right.json(result, expanded=1)
+
+
+def show_partial_results(placeholder):
+    df = STATE.processed_pages
+    with placeholder.container():
+        st.write(f"Anúncios processados: **{len(df)}**")
+        st.dataframe(
+            df,
+            use_container_width=True,
+            column_order=[c for c in ARRANJO_COLUNAS if c in df.columns],
+            column_config=COLUMN_CONFIG,
+            hide_index=True,
+        )
 
 
-def run():
-    save_config(STATE)
-    scraper = SCRAPERS[STATE.mkplc](
-        path=STATE.folder, reconnect=STATE.reconnect, timeout=STATE.timeout, demo=True
-    )
+def sync_progress():
+    progress_text = "Sincronizando os screenshots com a nuvem...☁️"
+    progress_bar = st.progress(0, text=progress_text)
+
+    def update(done: int, total: int):
+        percentage = int(100 * done / total)
+        progress_bar.progress(
+            percentage, text=f"{progress_text} {done}/{total} arquivos"
+        )
+
+    return progress_bar, update
+
+
+def finish_job(job, scraper) -> bool:
+    # Os anúncios restantes são processados e a tabela é salva
+    processed = 0
+    if STATE.processor is not None:
+        STATE.processor.close()
+        # Com lotes perdidos a tabela é refeita, o cache evita reprocessar o restante
+        if not STATE.processor.failed:
+            processed = STATE.processor.processed
+    STATE.processor = None
+    STATE.job_id = None
+    STATE.job_result = None
+    ok = True
+    if job.status == ERRO:
+        ok = False
+        st.error(
+            f"Erro ao realizar a raspagem: {job.message}. Verifique sua conexão e tente novamente, se persistir, reporte o erro no Github."
+        )
+    progress_bar, progress = sync_progress()
     try:
-        if STATE.use_cache == CACHE[1]:
-            run_search(scraper)
+        if processed:
+            save_table(STATE, progress)
+        else:
+            process_data(STATE, scraper.pages_file(STATE.keyword), progress)
     except Exception as e:
+        ok = False
         st.error(
-            f"Erro ao realizar a busca: {e}. Verifique sua conexão e tente novamente, se persistir, reporte o erro no Github."
+            f"Erro ao realizar o processamento dos dados: {e}. Se o erro persistir, reporte o erro no Github."
+        )
+    progress_bar.empty()
+    return ok
+
+
+def follow_job(job, output, partial_results) -> None:
+    """Processa em lotes os anúncios recebidos do job desta sessão"""
+    scraper = get_scraper(STATE.mkplc, STATE.folder)
+    if STATE.processor is None:
+        STATE.processor = StreamingProcessor(STATE, processing_cache(STATE, scraper))
+    for record in job.take_results():
+        STATE.processor.add(record)
+        STATE.job_result = record
+    if STATE.job_result is not None:
+        show_product(output, STATE.job_result)
+    if STATE.processor.poll():
+        show_partial_results(partial_results)
+    if job.done and finish_job(job, scraper):
+        st.toast("Processamento dos dados finalizado!", icon="🎉")
+        # Recarrega os links, anúncios e a tabela atualizados
+        st.rerun()
+
+
+@st.fragment(run_every=1)
+def track_jobs():
+    manager = job_manager()
+    jobs = [job for job in manager.poll() if not job.done or job.id == STATE.job_id]
+    if STATE.job_id is None and (job := manager.find(STATE.mkplc, STATE.keyword)):
+        # A página foi recarregada durante a raspagem
+        STATE.job_id = job.id
+    for job in jobs:
+        st.progress(
+            job.progress,
+            text=f"🕷️ {job.spec.marketplace} - {job.spec.keyword}: {job.stage or job.status} {job.step}/{job.total}",
         )
+    output = st.empty()
+    partial_results = st.empty()
+    if (job := manager.get(STATE.job_id)) is not None:
+        if (job.spec.marketplace, job.spec.keyword) == (STATE.mkplc, STATE.keyword):
+            follow_job(job, output, partial_results)
+        elif job.done:
+            # Os dados são processados ao selecionar o marketplace e a palavra-chave
+            STATE.job_id = None
 
-    if STATE.cached_links:
-        try:
-            inspect_pages(scraper)
-        except Exception as e:
-            st.error(
-                f"Erro ao realizar a navegação de páginas: {e}. Verifique sua conexão e tente novamente, se persistir, reporte o erro no Github."
-            )
-
-        try:
-            process_data(STATE, scraper.pages_file(STATE.keyword))
-        except Exception as e:
-            st.error(
-                f"Erro ao realizar o processamento dos dados: {e}. Se o erro persistir, reporte o erro no Github."
-            )
-        st.snow()
-        st.success("Processamento dos dados finalizado!", icon="🎉")
+
+def run():
+    save_config(STATE)
+    spec = JobSpec(
+        marketplace=STATE.mkplc,
+        scraper=SCRAPERS[STATE.mkplc],
+        keyword=STATE.keyword,
+        options=dict(
+            path=STATE.folder,
+            reconnect=STATE.reconnect,
+            timeout=STATE.timeout,
+            demo=True,
+        ),
+        search=STATE.use_cache == CACHE[1],
+        max_search=STATE.max_search,
+        max_pages=STATE.max_pages,
+        shuffle=STATE.shuffle,
+        screenshot=True,  # STATE.screenshot,
+    )
+    # A raspagem roda num processo separado, a página somente acompanha o andamento
+    STATE.processor = None
+    STATE.job_result = None
+    STATE.job_id = job_manager().submit(spec)
 
 
 config_container = st.sidebar.expander(label=BASE, expanded=True)
@@ -256,6 +314,10 @@ else:
             set_cached_pages()
             set_client()  # It has to be called before set_processed_pages
             set_processed_pages()
+            if STATE.job_id is not None or not all(
+                job.done for job in job_manager().poll()
+            ):
+                track_jobs()
             container = st.sidebar.expander("DADOS", expanded=True)
             has_data, cache_info = get_cached_info(STATE)
             if not has_data:
@@ -0,0 +1,200 @@
+"""Benchmark da compressão dos screenshots em pdf com os perfis de `espatula.compression`
+
+Cada perfil é executado num processo novo sobre o mesmo conjunto de pdfs, com a
+medição do tempo de CPU, do pico de memória do processo e do tamanho final. A
+fidelidade das imagens é avaliada pelo PSNR em relação às originais, na resolução
+original: as imagens reduzidas são ampliadas de volta antes da comparação, de modo
+que a perda de resolução também é penalizada. O perfil recomendado é o menor
+resultado com PSNR mínimo.
+
+    uv sync --extra benchmark
+    python benchmarks/compression.py                              # pdfs sintéticos
+    python benchmarks/compression.py --corpus <pasta>/screenshots # screenshots reais
+"""
+
+import math
+import platform
+import statistics
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+from time import process_time
+
+import numpy as np
+import psutil
+import typer
+from fastcore.xtras import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from espatula.compression import DEFAULT_PROFILE, PROFILES, compress_pdf
+
+# Dimensões de uma página A4 em pontos
+A4 = (595, 842)
+
+
+def peak_memory() -> int:
+    """Pico do uso de memória do processo, em bytes"""
+    info = psutil.Process().memory_info()
+    if hasattr(info, "peak_wset"):
+        return info.peak_wset
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def synthetic_image(rng: np.random.Generator, width: int, height: int):
+    """Imagem suave com ruído, próxima de uma foto de produto"""
+    from PIL import Image
+
+    coarse = rng.integers(0, 256, (max(height // 64, 2), max(width // 64, 2), 3))
+    image = Image.fromarray(coarse.astype(np.uint8)).resize(
+        (width, height), Image.BICUBIC
+    )
+    noise = rng.normal(0, 6, (height, width, 3))
+    pixels = np.clip(np.asarray(image, dtype=np.float64) + noise, 0, 255)
+    return Image.fromarray(pixels.astype(np.uint8))
+
+
+def image_page(image):
+    from pypdf import PdfReader
+
+    stream = BytesIO()
+    image.save(stream, "PDF", quality=95)
+    return PdfReader(stream).pages[0]
+
+
+def synthetic_corpus(folder: Path, files: int, seed: int) -> list[Path]:
+    """Páginas com fotos grandes, miniaturas e um logotipo repetido em todas"""
+    from pypdf import PdfWriter, Transformation
+
+    rng = np.random.default_rng(seed)
+    logo = image_page(synthetic_image(rng, 160, 48))
+    paths = []
+    for n in range(files):
+        writer = PdfWriter()
+        for _ in range(int(rng.integers(2, 5))):
+            page = writer.add_blank_page(*A4)
+            page.merge_transformed_page(
+                logo, Transformation().scale(0.5).translate(20, A4[1] - 44)
+            )
+            side = int(rng.integers(1200, 2000))
+            photo = image_page(synthetic_image(rng, side, side))
+            page.merge_transformed_page(
+                photo, Transformation().scale(300 / side).translate(20, 420)
+            )
+            for i in range(int(rng.integers(3, 7))):
+                thumb = image_page(synthetic_image(rng, 96, 96))
+                page.merge_transformed_page(
+                    thumb, Transformation().scale(0.6).translate(20 + i * 66, 320)
+                )
+        paths.append(path := folder / f"sintetico_{n:02d}.pdf")
+        with open(path, "wb") as f:
+            writer.write(f)
+    return paths
+
+
+def images(pdf: bytes) -> list:
+    from pypdf import PdfReader
+
+    return [
+        img.image.convert("RGB")
+        for page in PdfReader(BytesIO(pdf)).pages
+        for img in page.images
+    ]
+
+
+def psnr(originals: list[bytes], outputs: list[bytes]) -> float:
+    """PSNR agregado de todas as imagens, na resolução das originais"""
+    error = pixels = 0
+    for original, output in zip(originals, outputs):
+        for a, b in zip(images(original), images(output)):
+            if a.size != b.size:
+                b = b.resize(a.size)
+            diff = np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)
+            error += float((diff**2).sum())
+            pixels += diff.size
+    if not error:
+        return math.inf
+    return 10 * math.log10(255**2 * pixels / error)
+
+
+def run_profile(name: str, files: list[str]) -> dict:
+    """Executado num processo novo, para que o pico de memória seja só do perfil"""
+    profile = PROFILES[name]
+    originals = [Path(file).read_bytes() for file in files]
+    import pypdf  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+    baseline = psutil.Process().memory_info().rss
+    durations, outputs = [], []
+    for pdf in originals:
+        start = process_time()
+        outputs.append(compress_pdf(BytesIO(pdf), profile))
+        durations.append(process_time() - start)
+    return {
+        "perfil": name,
+        "cpu": sum(durations),
+        "cpu_mediana": statistics.median(durations),
+        "memoria": max(peak_memory() - baseline, 0),
+        "entrada": sum(map(len, originals)),
+        "saida": sum(map(len, outputs)),
+        "psnr": psnr(originals, outputs),
+    }
+
+
+def recommend(results: list[dict], min_psnr: float) -> str | None:
+    candidates = [r for r in results if r["psnr"] >= min_psnr]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda r: (r["saida"], r["cpu"]))["perfil"]
+
+
+def main(
+    corpus: Path = None,
+    files: int = 8,
+    seed: int = 0,
+    profile: list[str] = typer.Option(None),
+    min_psnr: float = 35.0,
+):
+    names = profile or list(PROFILES)
+    if unknown := set(names) - set(PROFILES):
+        raise typer.BadParameter(f"Perfis inexistentes: {', '.join(sorted(unknown))}")
+    with tempfile.TemporaryDirectory() as folder:
+        if corpus:
+            paths = sorted(Path(corpus).glob("*.pdf"))
+            if not paths:
+                raise typer.BadParameter(f"Nenhum pdf em {corpus}")
+        else:
+            paths = synthetic_corpus(Path(folder), files, seed)
+        total = sum(p.stat().st_size for p in paths)
+        print(f"{len(paths)} pdfs, {total / 2**20:.1f} MB")
+        results = []
+        for name in names:
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+                results.append(
+                    executor.submit(run_profile, name, list(map(str, paths))).result()
+                )
+
+    print(
+        f"{'perfil':<21}{'cpu (s)':>9}{'mediana (ms)':>14}{'memória (MB)':>14}"
+        f"{'tamanho (MB)':>14}{'redução':>9}{'psnr (dB)':>11}"
+    )
+    for r in results:
+        print(
+            f"{r['perfil'] + ('*' if r['perfil'] == DEFAULT_PROFILE else ''):<21}"
+            f"{r['cpu']:>9.2f}{r['cpu_mediana'] * 1e3:>14.1f}"
+            f"{r['memoria'] / 2**20:>14.1f}{r['saida'] / 2**20:>14.2f}"
+            f"{1 - r['saida'] / r['entrada']:>9.0%}{r['psnr']:>11.1f}"
+        )
+    print(f"* perfil padrão atual: {DEFAULT_PROFILE}")
+    if chosen := recommend(results, min_psnr):
+        print(f"Perfil recomendado, menor saída com PSNR >= {min_psnr} dB: {chosen}")
+    else:
+        print(f"Nenhum perfil atinge PSNR >= {min_psnr} dB")
+
+
+if __name__ == "__main__":
+    typer.run(main)
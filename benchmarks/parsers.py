@@ -0,0 +1,265 @@
+"""Benchmark offline dos parsers, sobre as páginas salvas em `benchmarks/fixtures`
+
+Mede a construção do soup, a leitura dos cards da busca, a extração dos dados do
+anúncio e as expressões regulares de certificado e EAN, confere as saídas com as
+de `benchmarks/golden` e compara os tempos com `benchmarks/baseline_parsers.json`.
+São exibidas as medianas, a regressão é avaliada sobre os mínimos, menos sensíveis
+à carga momentânea da máquina.
+
+    python benchmarks/parsers.py                       # mede e confere
+    python benchmarks/parsers.py --update-golden       # regrava as saídas esperadas
+    python benchmarks/parsers.py --save-baseline       # grava os tempos de referência
+    python benchmarks/parsers.py --record ml --url URL # salva uma página real como fixture
+"""
+
+import json
+import platform
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+import typer
+from bs4 import BeautifulSoup
+from fastcore.xtras import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from espatula import (
+    AmazonScraper,
+    AmericanasScraper,
+    CarrefourScraper,
+    CasasBahiaScraper,
+    MagaluScraper,
+    MercadoLivreScraper,
+)
+
+BENCHMARKS = Path(__file__).parent
+FIXTURES = BENCHMARKS / "fixtures"
+GOLDEN = BENCHMARKS / "golden"
+BASELINE = BENCHMARKS / "baseline_parsers.json"
+SCRAPERS = {
+    "amazon": AmazonScraper,
+    "ml": MercadoLivreScraper,
+    "magalu": MagaluScraper,
+    "americanas": AmericanasScraper,
+    "casasbahia": CasasBahiaScraper,
+    "carrefour": CarrefourScraper,
+}
+STAGES = ("soup_busca", "busca", "soup_anuncio", "extracao", "regex")
+# Campos que mudam a cada execução e não entram na conferência
+VOLATILE = {"data"}
+
+
+class FixtureDriver:
+    """Substitui o navegador: devolve a página salva e ignora as interações"""
+
+    def __init__(self, html: str, url: str, soup: BeautifulSoup | None = None):
+        self.html = html
+        self.url = url
+        self.soup = soup
+
+    def get_beautiful_soup(self) -> BeautifulSoup:
+        # Mesmo parser do SeleniumBase
+        return self.soup or BeautifulSoup(self.html, "html.parser")
+
+    def get_page_source(self) -> str:
+        return self.html
+
+    def get_current_url(self) -> str:
+        return self.url
+
+    def click_visible_elements(self, *args, **kwargs):
+        pass
+
+    def uc_click(self, *args, **kwargs):
+        pass
+
+    def post_message(self, *args, **kwargs):
+        pass
+
+
+def measure(function, repeat: int, warmup: int = 3) -> list[float]:
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        durations.append(perf_counter() - start)
+    return durations
+
+
+def stable(data):
+    """Remove os campos voláteis e normaliza os tipos como no json gravado"""
+    if isinstance(data, dict):
+        return {k: stable(v) for k, v in data.items() if k not in VOLATILE}
+    if isinstance(data, (list, tuple)):
+        return [stable(v) for v in data]
+    return data
+
+
+def run_marketplace(name: str, repeat: int, folder: str) -> tuple[dict, dict]:
+    scraper = SCRAPERS[name](headless=True, path=folder)
+    fixtures = FIXTURES / name
+    meta = json.loads((fixtures / "meta.json").read_text(encoding="utf-8"))
+    search_html = (fixtures / "search.html").read_text(encoding="utf-8")
+    product_html = (fixtures / "product.html").read_text(encoding="utf-8")
+    search_soup = BeautifulSoup(search_html, "html.parser")
+    product_soup = BeautifulSoup(product_html, "html.parser")
+    driver = FixtureDriver(product_html, meta["url"], product_soup)
+    text = product_soup.get_text(" ")
+
+    def regex():
+        scraper.match_certificado(text)
+        scraper.match_ean(text)
+
+    durations = {
+        "soup_busca": measure(
+            lambda: BeautifulSoup(search_html, "html.parser"), repeat
+        ),
+        "busca": measure(
+            lambda: scraper.discover_product_urls(search_soup, meta["keyword"]), repeat
+        ),
+        "soup_anuncio": measure(
+            lambda: BeautifulSoup(product_html, "html.parser"), repeat
+        ),
+        "extracao": measure(lambda: scraper.extract_item_data(driver), repeat),
+        "regex": measure(regex, repeat),
+    }
+    outputs = {
+        "busca": stable(scraper.discover_product_urls(search_soup, meta["keyword"])),
+        "anuncio": stable(scraper.extract_item_data(driver)),
+    }
+    return durations, outputs
+
+
+def compare_golden(name: str, outputs: dict) -> list[str]:
+    golden_file = GOLDEN / f"{name}.json"
+    if not golden_file.is_file():
+        return [f"{name}: golden ausente, gere com --update-golden"]
+    golden = json.loads(golden_file.read_text(encoding="utf-8"))
+    outputs = json.loads(json.dumps(outputs, ensure_ascii=False))
+    errors = []
+    for page, expected in golden.items():
+        found = outputs.get(page, {})
+        for key in sorted(set(expected) | set(found)):
+            if expected.get(key) != found.get(key):
+                errors.append(
+                    f"{name}/{page}/{key}: esperado {expected.get(key)!r}, obtido {found.get(key)!r}"
+                )
+    return errors
+
+
+def compare_baseline(results: dict, tolerance: float) -> list[str]:
+    if not BASELINE.is_file():
+        return []
+    baseline = json.loads(BASELINE.read_text(encoding="utf-8")).get("minimos", {})
+    regressions = []
+    for name, stages in results.items():
+        for stage, seconds in stages.items():
+            if (reference := baseline.get(name, {}).get(stage)) is None:
+                continue
+            if seconds > reference * (1 + tolerance):
+                regressions.append(
+                    f"{name}/{stage}: {seconds * 1e3:.3f} ms, referência {reference * 1e3:.3f} ms (+{seconds / reference - 1:.0%})"
+                )
+    return regressions
+
+
+def record(name: str, url: str, page: str) -> None:
+    """Abre a página no navegador e salva o html como fixture do marketplace"""
+    scraper = SCRAPERS[name]()
+    with scraper.browser() as driver:
+        scraper.open_url(driver, url)
+        html = driver.get_page_source()
+    fixtures = FIXTURES / name
+    fixtures.mkdir(parents=True, exist_ok=True)
+    (fixtures / f"{page}.html").write_text(html, encoding="utf-8")
+    if page == "product":
+        meta_file = fixtures / "meta.json"
+        meta = (
+            json.loads(meta_file.read_text(encoding="utf-8"))
+            if meta_file.is_file()
+            else {}
+        )
+        meta.setdefault("keyword", "smartphone")
+        meta["url"] = url
+        meta_file.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    print(
+        f"Fixture {fixtures / page}.html gravada, atualize o golden com --update-golden"
+    )
+
+
+def main(
+    marketplace: str = None,
+    repeat: int = 50,
+    tolerance: float = 0.25,
+    update_golden: bool = False,
+    save_baseline: bool = False,
+    record_page: str = typer.Option(None, "--record"),
+    url: str = None,
+    page: str = "product",
+):
+    if record_page:
+        record(record_page, url, page)
+        return
+    names = [marketplace] if marketplace else list(SCRAPERS)
+    medians, minimums, errors = {}, {}, []
+    # O log de tempos do scraper não deve ir para a pasta de dados
+    with tempfile.TemporaryDirectory() as folder:
+        for name in names:
+            durations, outputs = run_marketplace(name, repeat, folder)
+            medians[name] = {s: statistics.median(durations[s]) for s in STAGES}
+            minimums[name] = {s: min(durations[s]) for s in STAGES}
+            if update_golden:
+                GOLDEN.mkdir(exist_ok=True)
+                (GOLDEN / f"{name}.json").write_text(
+                    json.dumps(outputs, ensure_ascii=False, indent=2) + "\n",
+                    encoding="utf-8",
+                )
+            else:
+                errors += compare_golden(name, outputs)
+
+    print(
+        f"{'marketplace':<12}"
+        + "".join(f"{s + ' (ms)':>18}" for s in STAGES)
+        + f"{'anúncios/s':>12}"
+    )
+    for name, stages in medians.items():
+        # Um único núcleo: construção do soup seguida da extração
+        rate = 1 / (stages["soup_anuncio"] + stages["extracao"])
+        print(
+            f"{name:<12}"
+            + "".join(f"{stages[s] * 1e3:>18.3f}" for s in STAGES)
+            + f"{rate:>12.1f}"
+        )
+
+    regressions = compare_baseline(minimums, tolerance)
+    if save_baseline:
+        BASELINE.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "maquina": platform.platform(),
+                    "processador": platform.processor() or platform.machine(),
+                    "repeticoes": repeat,
+                    "medianas": medians,
+                    "minimos": minimums,
+                },
+                ensure_ascii=False,
+                indent=2,
+            )
+            + "\n",
+            encoding="utf-8",
+        )
+        print(f"Referência gravada em {BASELINE}")
+    for message in errors:
+        print(f"Divergência - {message}")
+    for message in regressions:
+        print(f"Regressão - {message}")
+    if errors or (regressions and not save_baseline):
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,235 @@
+"""Marketplace local que serve as páginas de `benchmarks/fixtures` no lugar dos sites
+
+O navegador resolve todos os domínios para o servidor local (`--host-resolver-rules`)
+e aceita o certificado autoassinado, de modo que os scrapers seguem os mesmos
+caminhos dos sites reais: a página inicial com o campo de busca, as páginas de busca
+com o botão de próxima página e os anúncios. O marketplace é identificado pelo
+cabeçalho `Host`. A latência, o número de páginas de busca e a taxa de falhas dos
+anúncios são configuráveis.
+
+    python benchmarks/standin.py --port 8443 --latency 0.5 --pages 5 --failure-rate 0.1
+"""
+
+import random
+import re
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+import typer
+from fastcore.xtras import Path
+
+FIXTURES = Path(__file__).parent / "fixtures"
+DOMAINS = {
+    "amazon.com.br": "amazon",
+    "mercadolivre.com.br": "ml",
+    "magazineluiza.com.br": "magalu",
+    "americanas.com.br": "americanas",
+    "casasbahia.com.br": "casasbahia",
+    "carrefour.com.br": "carrefour",
+}
+# Campo de busca e botão de próxima página com os seletores usados por cada scraper
+CONTROLS = {
+    "amazon": (
+        (
+            '<input id="twotabsearchtextbox" name="q">'
+            '<input type="submit" id="nav-search-submit-button" value="Ir">'
+        ),
+        '<a class="s-pagination-item s-pagination-next s-pagination-button s-pagination-separator" href="{href}">Próximo</a>',
+    ),
+    "ml": (
+        (
+            '<button data-js="onboarding-cp-close" type="button">Fechar</button>'
+            '<button data-testid="action:understood-button" type="button">Entendi</button>'
+            '<input id="cb1-edit" name="q"><button class="nav-search-btn" type="submit">Buscar</button>'
+        ),
+        '<a title="Seguinte" href="{href}">Seguinte</a>',
+    ),
+    "magalu": (
+        '<input data-testid="input-search" name="q">',
+        '<button aria-label="Go to next page" onclick="location.href=\'{href}\'">›</button>',
+    ),
+    "americanas": (
+        '<input placeholder="busque aqui seu produto" name="q">',
+        (
+            '<a href="{href}"><svg class="src__ArrowRotate-sc-82ugau-2 hWXbQX" width="24" height="24">'
+            '<rect width="24" height="24"></rect></svg></a>'
+        ),
+    ),
+    "casasbahia": (
+        '<input id="search-form-input" name="q">',
+        '<button aria-label="Próxima página" onclick="location.href=\'{href}\'">›</button>',
+    ),
+    "carrefour": (
+        (
+            '<input placeholder="Pesquise por produtos ou marcas" name="q">'
+            '<button aria-label="Buscar produtos" type="submit">Buscar</button>'
+        ),
+        (
+            '<ul><li class="carrefourbr-carrefour-components-0-x-Pagination_NextButtonContainer">'
+            '<a href="{href}"><div>Próxima</div></a></li></ul>'
+        ),
+    ),
+}
+HOME = '<!DOCTYPE html><html><head><meta charset="utf-8"></head><body><form action="/busca" method="get">{}</form></body></html>'
+HREF = re.compile(r'href="(https?://[^/"]+)?(/[^"]*)"')
+IMAGES = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".svg", ".ico")
+# PNG transparente de 1x1 servido no lugar de todas as imagens
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6300010000000500010d0a2db40000000049454e44ae426082"
+)
+
+
+def self_signed(folder: Path) -> tuple[Path, Path]:
+    """Certificado autoassinado gerado pelo openssl, aceito pelo navegador do benchmark"""
+    cert, key = folder / "cert.pem", folder / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", str(key), "-out", str(cert), "-days", "1",
+            "-subj", "/CN=espatula-standin",
+        ],
+        check=True,
+        capture_output=True,
+    )  # fmt: skip
+    return cert, key
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, content_type, body = self.server.standin.respond(
+            self.headers.get("Host", ""), self.path
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@dataclass
+class StandIn:
+    """Servidor HTTPS local com as páginas gravadas de cada marketplace"""
+
+    port: int = 8443
+    latency: float = 0.0
+    pages: int = 3
+    failure_rate: float = 0.0
+    seed: int = 0
+    folder: Path = FIXTURES
+    requests: dict = field(default_factory=dict, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.folder = Path(self.folder)
+        self.random = random.Random(self.seed)
+        self.fixtures = {
+            name: {
+                page: (self.folder / name / f"{page}.html").read_text(encoding="utf-8")
+                for page in ("search", "product")
+            }
+            for name in CONTROLS
+            if (self.folder / name).is_dir()
+        }
+        self.server = None
+
+    @property
+    def host_resolver_rules(self) -> str:
+        return f"MAP * 127.0.0.1:{self.port}, EXCLUDE localhost"
+
+    @staticmethod
+    def marketplace(host: str) -> str | None:
+        host = host.split(":")[0]
+        return next((n for d, n in DOMAINS.items() if host.endswith(d)), None)
+
+    def count(self, name: str, kind: str) -> None:
+        with self.lock:
+            self.requests[(name, kind)] = self.requests.get((name, kind), 0) + 1
+
+    def search_page(self, name: str, query: str, page: int) -> str:
+        html = self.fixtures[name]["search"]
+        if page > 1:
+            # Os anúncios de cada página recebem links distintos
+            html = HREF.sub(lambda m: f'href="{m[1] or ""}/p{page}{m[2]}"', html)
+        pagination = ""
+        if page < self.pages:
+            href = f"/busca?q={quote_plus(query)}&amp;pagina={page + 1}"
+            pagination = CONTROLS[name][1].format(href=href)
+        pagination = f'<nav aria-label="Paginação">{pagination}</nav>'
+        if "</body>" in html:
+            return html.replace("</body>", f"{pagination}</body>")
+        return html + pagination
+
+    def respond(self, host: str, path: str) -> tuple[int, str, bytes]:
+        url = urlsplit(path)
+        if url.path.lower().endswith(IMAGES):
+            return 200, "image/png", PIXEL
+        if (name := self.marketplace(host)) not in self.fixtures:
+            return 404, "text/plain", b"Not Found"
+        if self.latency:
+            time.sleep(self.random.uniform(0.5, 1.5) * self.latency)
+        if url.path in ("", "/"):
+            self.count(name, "inicial")
+            html = HOME.format(CONTROLS[name][0])
+        elif url.path.startswith("/busca"):
+            self.count(name, "busca")
+            query = parse_qs(url.query)
+            page = int(query.get("pagina", ["1"])[0])
+            html = self.search_page(name, query.get("q", [""])[0], page)
+        elif self.random.random() < self.failure_rate:
+            self.count(name, "falha")
+            return 503, "text/html; charset=utf-8", "Serviço indisponível".encode()
+        else:
+            self.count(name, "anuncio")
+            html = self.fixtures[name]["product"]
+        return 200, "text/html; charset=utf-8", html.encode()
+
+    def start(self, cert: Path = None, key: Path = None) -> "StandIn":
+        if cert is None:
+            self.certificates = tempfile.TemporaryDirectory()
+            cert, key = self_signed(Path(self.certificates.name))
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), StandInHandler)
+        self.server.daemon_threads = True
+        self.server.standin = self
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def main(
+    port: int = 8443,
+    latency: float = 0.0,
+    pages: int = 3,
+    failure_rate: float = 0.0,
+    seed: int = 0,
+):
+    standin = StandIn(port, latency, pages, failure_rate, seed).start()
+    print(f"Marketplace local em https://127.0.0.1:{port}")
+    print(f'Chrome: --host-resolver-rules="{standin.host_resolver_rules}"')
+    print("         --ignore-certificate-errors")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    typer.run(main)
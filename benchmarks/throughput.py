@@ -0,0 +1,182 @@
+"""Benchmark de ponta a ponta: `search()` e `inspect_pages()` contra o marketplace local
+
+Cada scraper é executado em modo headless sobre `benchmarks/standin.py`, com a mesma
+latência, paginação e taxa de falhas, sem acesso aos sites reais. São exibidos os
+anúncios por minuto, os percentis das etapas do `StageTimer` e o pico de memória do
+processo e dos navegadores. Os números permitem comparar alterações de concorrência,
+cache ou dos tempos de espera (`--reconnect`) de forma reproduzível.
+
+    uv sync --extra benchmark
+    python benchmarks/throughput.py --latency 0.3 --pages 5 --failure-rate 0.1
+    python benchmarks/throughput.py --marketplace magalu --screenshot --reconnect 1
+"""
+
+import json
+import sys
+import tempfile
+import threading
+from time import perf_counter
+
+import psutil
+import typer
+from fastcore.xtras import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from parsers import SCRAPERS
+from standin import StandIn
+
+# Palavra fora dos departamentos de `CATEGORIES`, cujos links levam aos sites
+KEYWORD = "celular"
+
+
+class MemorySampler:
+    """Pico da memória residente do processo e dos seus filhos, ex.: o Chrome"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.peak = self.peak_children = 0
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def sample(self) -> None:
+        process = psutil.Process()
+        children = 0
+        for child in process.children(recursive=True):
+            try:
+                children += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak_children = max(self.peak_children, children)
+        self.peak = max(self.peak, process.memory_info().rss + children)
+
+    def run(self) -> None:
+        while not self.done.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.done.set()
+        self.thread.join()
+        self.sample()
+
+
+def run_marketplace(
+    name: str,
+    standin: StandIn,
+    folder: str,
+    keyword: str,
+    sample: int,
+    screenshot: bool,
+    reconnect: int | None,
+) -> dict:
+    options = {"reconnect": reconnect} if reconnect is not None else {}
+    scraper = SCRAPERS[name](
+        headless=True,
+        path=folder,
+        handle_captcha=False,
+        host_resolver_rules=standin.host_resolver_rules,
+        chromium_arg="--ignore-certificate-errors",
+        **options,
+    )
+    result = {"marketplace": name, "links": 0, "anuncios": 0}
+    with MemorySampler() as memory:
+        start = perf_counter()
+        for products in scraper.search(
+            keyword, max_pages=standin.pages, overwrite=True
+        ):
+            result["links"] += len(products)
+        result["busca"] = perf_counter() - start
+        result["etapas_busca"] = scraper.timings.summary()
+
+        start = perf_counter()
+        for _ in scraper.inspect_pages(keyword, screenshot=screenshot, sample=sample):
+            result["anuncios"] += 1
+        result["inspecao"] = perf_counter() - start
+        result["etapas"] = scraper.timings.summary()
+    result["memoria"] = memory.peak
+    result["memoria_navegador"] = memory.peak_children
+    result["por_minuto"] = result["anuncios"] * 60 / result["inspecao"]
+    return result
+
+
+def main(
+    marketplace: list[str] = typer.Option(None),
+    port: int = 8443,
+    latency: float = 0.2,
+    pages: int = 3,
+    failure_rate: float = 0.1,
+    seed: int = 0,
+    keyword: str = KEYWORD,
+    sample: int = 0,
+    screenshot: bool = False,
+    reconnect: int = None,
+    output: Path = None,
+):
+    names = marketplace or list(SCRAPERS)
+    standin = StandIn(port, latency, pages, failure_rate, seed).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            for name in names:
+                try:
+                    results.append(
+                        run_marketplace(
+                            name,
+                            standin,
+                            folder,
+                            keyword,
+                            sample,
+                            screenshot,
+                            reconnect,
+                        )
+                    )
+                except Exception as e:
+                    print(f"Erro no benchmark do marketplace {name}: {e}")
+    finally:
+        standin.stop()
+
+    print(
+        f"{'marketplace':<12}{'links':>7}{'anúncios':>10}{'busca (s)':>11}"
+        f"{'inspeção (s)':>14}{'anúncios/min':>14}{'memória (MB)':>14}{'chrome (MB)':>13}"
+    )
+    for r in results:
+        print(
+            f"{r['marketplace']:<12}{r['links']:>7}{r['anuncios']:>10}{r['busca']:>11.1f}"
+            f"{r['inspecao']:>14.1f}{r['por_minuto']:>14.1f}"
+            f"{r['memoria'] / 2**20:>14.0f}{r['memoria_navegador'] / 2**20:>13.0f}"
+        )
+    print(
+        f"\n{'marketplace':<12}{'fase':<10}{'etapa':<12}{'n':>6}{'erros':>7}"
+        f"{'p50 (s)':>10}{'p95 (s)':>10}"
+    )
+    for r in results:
+        for phase, stages in (("busca", r["etapas_busca"]), ("inspeção", r["etapas"])):
+            for stage, s in stages.items():
+                print(
+                    f"{r['marketplace']:<12}{phase:<10}{stage:<12}{s['n']:>6}"
+                    f"{s['erros']:>7}{s['p50']:>10.3f}{s['p95']:>10.3f}"
+                )
+    print(f"\nRequisições ao marketplace local: {sum(standin.requests.values())}")
+    if output:
+        Path(output).write_text(
+            json.dumps(
+                {
+                    "latencia": latency,
+                    "paginas": pages,
+                    "falhas": failure_rate,
+                    "reconnect": reconnect,
+                    "screenshot": screenshot,
+                    "resultados": results,
+                },
+                ensure_ascii=False,
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    typer.run(main)
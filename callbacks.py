@@ -1,15 +1,86 @@
 # callbacks.py
-from fastcore.xtras import Path
-import pandas as pd
-from gradio_client import Client
+from fastcore.xtras import Path, loads
+import streamlit as st
 
-from config import SCRAPERS, COLUNAS, CACHE
-from data_processing import process_data
+from config import SCRAPERS, CACHE
+from espatula.jobs import JobManager
+from espatula.metrics import serve
+from espatula.processing import LocalEngine
+from espatula.remote import RemoteClient
+from espatula.sch import SCHIndex
+from data_processing import edit_journal, process_data, processed_file, read_table
+
+
+@st.cache_resource
+def shared_client() -> RemoteClient:
+    # Um único pool de conexões atende todas as sessões do app
+    return RemoteClient()
+
+
+@st.cache_resource
+def shared_engine(folder: str) -> LocalEngine:
+    # O índice do SCH e os blocos do catálogo são montados uma única vez por pasta
+    return LocalEngine(sch=SCHIndex(Path(folder) / "sch"))
+
+
+@st.cache_resource
+def job_manager() -> JobManager:
+    # Os jobs de todas as sessões compartilham os mesmos processos de trabalho
+    # O endpoint de métricas é iniciado somente com a variável METRICS_PORT definida
+    serve()
+    return JobManager()
+
+
+@st.cache_resource
+def get_scraper(mkplc: str, folder: str):
+    return SCRAPERS[mkplc](path=folder)
+
+
+def file_signature(file: Path) -> tuple[int, int] | None:
+    # Tamanho e data de modificação identificam a versão do arquivo em disco
+    try:
+        stat = Path(file).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _load_json(file: str, signature: tuple[int, int]) -> dict:
+    return loads(Path(file).read_text(encoding="utf-8"))
+
+
+def load_json(file: Path) -> dict:
+    """Lê o json somente quando o arquivo foi alterado desde a última leitura
+
+    O mesmo objeto é compartilhado entre as reexecuções e não deve ser modificado.
+    """
+    if (signature := file_signature(file)) is None:
+        return {}
+    return _load_json(str(file), signature)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _load_table(file: str, signature: tuple[int, int]):
+    return read_table(Path(file))
+
+
+def load_table(file: Path):
+    # Cada chamada recebe uma cópia, pois a tabela é editada na sessão
+    return _load_table(str(file), file_signature(file))
 
 
 def _set_client(state):
-    if state.client is None:
-        state.client = Client("ronaldokun/ecomproc")
+    if state.local_processing:
+        engine = shared_engine(state.folder)
+        if engine.available:
+            state.engine = engine
+        else:
+            # Sem o classificador treinado, a coluna passível? não é gerada localmente
+            print("Processamento local sem classificador (CLASSIFIER), usando o remoto")
+            state.local_processing = False
+    if not state.local_processing and state.client is None:
+        state.client = shared_client()
 
 
 def _set_folder(state):
@@ -26,8 +97,8 @@ def _set_cloud(state):
 
 def _set_cached_links(state):
     # Callback function to save the keyword selection to Session state
-    scraper = SCRAPERS[state.mkplc](path=state.folder)
-    if cached_links := scraper.get_links(state.keyword):
+    scraper = get_scraper(state.mkplc, state.folder)
+    if cached_links := load_json(scraper.links_file(state.keyword)):
         state.cached_links = cached_links
         state.use_cache = CACHE[0]
     else:
@@ -36,8 +107,8 @@ def _set_cached_links(state):
 
 
 def _set_cached_pages(state):
-    scraper = SCRAPERS[state.mkplc](path=state.folder)
-    if cached_pages := scraper.get_pages(state.keyword):
+    scraper = get_scraper(state.mkplc, state.folder)
+    if cached_pages := load_json(scraper.pages_file(state.keyword)):
         state.cached_pages = cached_pages
         state["screenshots"] = Path(f"{scraper.folder}/screenshots")
     else:
@@ -45,29 +116,39 @@ def _set_cached_pages(state):
 
 
 def _set_processed_pages(state):
-    scraper = SCRAPERS[state.mkplc](path=state.folder)
+    scraper = get_scraper(state.mkplc, state.folder)
     json_file = scraper.pages_file(state.keyword)
-    excel_file = json_file.with_suffix(".xlsx")
-
-    state.processed_pages = None
-    need_processing = True
+    table_file = processed_file(scraper, state.keyword)
+    if not table_file.is_file():
+        # Tabelas salvas por versões anteriores, convertidas para parquet na leitura
+        table_file = json_file.with_suffix(".xlsx")
+
+    # A tabela da sessão já tem as colunas derivadas e as edições, só é relida se o
+    # arquivo mudou: salvamento, consolidação das edições ou outra palavra-chave
+    source = (str(table_file), file_signature(table_file))
+    if state.processed_pages is not None and state.processed_source == source:
+        need_processing = False
+    else:
+        state.processed_pages = None
+        state.processed_source = None
+        need_processing = True
 
-    if excel_file.is_file():
+    if need_processing and table_file.is_file():
         try:
-            df = pd.read_excel(excel_file, dtype="string")
-            df["passível?"] = df["passível?"].map(
-                {"True": True, "False": False, pd.NA: False}
-            )
-            df.sort_values(
-                by=["modelo_score", "nome_score", "passível?", "probabilidade"],
-                ascending=False,
-                inplace=True,
-                ignore_index=True,
-            )
-            state.processed_pages = df.astype(COLUNAS)
+            # Edições ainda não consolidadas quando o app foi encerrado
+            journal = edit_journal(state, scraper)
+            state.processed_pages = journal.apply(load_table(table_file))
+            if journal.entries():
+                journal.schedule()
+            if table_file.suffix == ".xlsx":
+                state.processed_pages.to_parquet(
+                    processed_file(scraper, state.keyword), index=False
+                )
+            else:
+                state.processed_source = source
             need_processing = False
         except Exception as e:
-            print(f"Erro ao ler o Excel em cache, os dados serão reprocessados: {e}")
+            print(f"Erro ao ler a tabela em cache, os dados serão reprocessados: {e}")
             need_processing = True
 
     if need_processing and json_file.is_file():
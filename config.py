@@ -36,6 +36,8 @@ COLUNAS = {
     "modelo_sch": "category",
     "modelo_score": "int8",
     "nome_score": "int8",
+    "sugestao_sch": "string",
+    "sugestao_score": "Int8",
     "probabilidade": "float",
     "passível?": "bool",
 }
@@ -69,6 +71,8 @@ SHUFFLE = "Amostrar Páginas Aleatoriamente"
 SCREENSHOT = "Capturar Tela do Anúncio"
 USER_PROFILE = "Criar/Carregar Perfil de Usuário no Chrome"
 SHOW_BROWSER = "Mostrar o Navegador?"
+LOCAL_PROCESSING = "Processar os Dados Localmente"
+PACK_SCREENSHOTS = "Agrupar os Screenshots por Sessão"
 START = "🚀 Iniciar 🚀"
 
 KEYS = {
@@ -81,6 +85,8 @@ KEYS = {
     "shuffle": SHUFFLE,
     "reconnect": RECONNECT,
     "timeout": TIMEOUT,
+    "local_processing": LOCAL_PROCESSING,
+    "pack_screenshots": PACK_SCREENSHOTS,
 }
 
 CONFIG_FILE = Path(__file__).parent / "config.json"
@@ -104,8 +110,17 @@ def init_session_state(STATE: dict, CONFIG: dict) -> None:
         "show_cache",
         "cached_pages",
         "processed_pages",
+        "processed_source",
         "use_cache",
         "client",
+        "local_processing",
+        "engine",
+        "pack_screenshots",
+        "job_id",
+        "processor",
+        "job_result",
+        "editor_version",
+        "group_decision",
     ]:
         if key not in STATE:
             match key:
@@ -1,14 +1,26 @@
-import shutil
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import SimpleNamespace
 import pandas as pd
 from gradio_client import handle_file
 from gradio_client.exceptions import AppError
 
 from fastcore.xtras import Path
-from config import COLUNAS, SCRAPERS
+from config import CLOUD_PATH, COLUNAS, SCRAPERS
+from espatula.entities import EntityIndex, get_entities
+from espatula.gtin import normalize_gtins
+from espatula.images import ImageCache, get_images
+from espatula.journal import EditJournal, get_journal
+from espatula.processing import record_hash
+from espatula.screenshots import REMOVIDO
+from espatula.sync import sync_screenshots
 
 
 def request_table(state, json_path: Path) -> pd.DataFrame | None:
+    if state.local_processing:
+        return state.engine.process(json_path.read_json())
     try:
         result = state.client.predict(
             json_file=handle_file(str(json_path)), api_name="/process_to_table"
@@ -17,77 +29,441 @@ def request_table(state, json_path: Path) -> pd.DataFrame | None:
 
     except AppError:
         return None
+    except Exception as e:
+        print(f"Erro no serviço remoto de processamento: {e}")
+        return None
+
+
+class ProcessingCache:
+    """Resultados do processamento indexados pelo hash de cada anúncio
+
+    Somente os anúncios novos ou alterados desde o último processamento são enviados,
+    o restante é reaproveitado do arquivo de cache da pasta do marketplace. O `salt`
+    identifica o processamento (revisão do serviço remoto ou versão do SCH e do
+    classificador locais). Os resultados de versões anteriores do mesmo modo são
+    descartados, os do outro modo são mantidos no arquivo.
+
+    Os novos resultados ficam em memória e o arquivo é regravado uma única vez, em
+    `save`, ao final do processamento.
+    """
+
+    def __init__(self, cache_file: Path, salt: str = "remote"):
+        self.cache_file = Path(cache_file)
+        self.salt = salt
+        self.stats = {"hits": 0, "misses": 0}
+        self.table = None
+        self.others = None
+        self.new = []
+
+    def load(self) -> pd.DataFrame:
+        if self.new:
+            table = pd.concat([self.table.astype("string"), *self.new])
+            self.table = table[~table.index.duplicated(keep="last")]
+            self.new = []
+        if self.table is None:
+            self.table = pd.DataFrame(index=pd.Index([], name="hash"))
+            self.others = self.table
+            if self.cache_file.is_file():
+                table = pd.read_parquet(self.cache_file)
+                salt = table.get("salt", pd.Series(pd.NA, index=table.index))
+                salt = salt.astype("string").fillna("")
+                mode = salt.str.split(":").str[0]
+                self.table = table.loc[salt == self.salt]
+                self.others = table.loc[mode != self.salt.split(":")[0]]
+        return self.table
+
+    def hashes(self, pages: dict) -> dict:
+        return {url: record_hash(page, self.salt) for url, page in pages.items()}
+
+    def split(self, pages: dict) -> tuple[pd.DataFrame, dict]:
+        """Separa os anúncios em resultados já processados e anúncios a processar"""
+        table = self.load()
+        hashes = self.hashes(pages)
+        hits = [h for h in hashes.values() if h in table.index]
+        missing = {url: pages[url] for url, h in hashes.items() if h not in table.index}
+        self.stats["hits"] += len(hits)
+        self.stats["misses"] += len(missing)
+        cached = table.loc[hits].reset_index(drop=True)
+        return cached.drop(columns="salt", errors="ignore"), missing
+
+    def store(self, pages: dict, df: pd.DataFrame) -> None:
+        self.load()
+        hashes = self.hashes(pages)
+        new = df.astype("string").assign(hash=df["url"].map(hashes), salt=self.salt)
+        self.new.append(new.dropna(subset="hash").set_index("hash"))
+
+    def save(self) -> None:
+        if not self.new:
+            return
+        table = self.load()
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Entradas de versões anteriores já foram descartadas em `load`
+        table = pd.concat([self.others.astype("string"), table])
+        table.to_parquet(self.cache_file)
+
+    def process(self, pages: dict, request) -> pd.DataFrame | None:
+        cached, missing = self.split(pages)
+        if missing:
+            if (df := request(missing)) is None:
+                return None
+            self.store(missing, df)
+            self.save()
+            cached = pd.concat([cached, df.astype("string")], ignore_index=True)
+        print(
+            f"Cache de processamento: {self.stats['hits']} reaproveitados, {self.stats['misses']} processados"
+        )
+        return cached
+
+
+def processing_cache(state, scraper) -> ProcessingCache:
+    # Os resultados do serviço remoto e do processamento local não se misturam
+    if state.local_processing:
+        state.engine.refresh()
+        salt = state.engine.signature
+    else:
+        salt = state.client.signature
+    return ProcessingCache(
+        scraper.folder / f"{scraper.name}_processamento.parquet", salt
+    )
+
+
+def request_pages(state, pages: dict) -> pd.DataFrame | None:
+    if state.local_processing:
+        return state.engine.process(pages)
+    # O serviço remoto recebe somente arquivos
+    with tempfile.TemporaryDirectory() as folder:
+        json_path = Path(folder) / "pages.json"
+        with json_path.open("w", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False)
+        return request_table(state, json_path)
+
+
+def sort_table(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(
+        by=["modelo_score", "nome_score", "passível?", "probabilidade"],
+        ascending=False,
+        ignore_index=True,
+    )
+
+
+def prepare_table(df: pd.DataFrame) -> pd.DataFrame:
+    df["probabilidade"] = df["probabilidade"].astype("float") * 100
+    df["ean_gtin"] = normalize_gtins(df["ean_gtin"])
+    df["passível?"] = (
+        df["passível?"]
+        .astype("string")
+        .map({"True": True, "False": False, pd.NA: False})
+    )
+    return conform_columns(sort_table(df))
+
+
+def merge_processed_pages(state, df: pd.DataFrame) -> None:
+    # Registros reprocessados substituem os anteriores com a mesma url
+    if state.processed_pages is not None:
+        df = pd.concat([state.processed_pages, df], ignore_index=True)
+        df = df.drop_duplicates(subset="url", keep="last")
+    state.processed_pages = conform_columns(sort_table(df))
+
+
+class StreamingProcessor:
+    """Envia os anúncios ao processamento em pequenos lotes enquanto a raspagem continua
+
+    Os lotes são processados em segundo plano e os resultados são mesclados em
+    `state.processed_pages` somente na thread do script, ao chamar `poll` ou `close`.
+    """
+
+    def __init__(
+        self, state, cache: ProcessingCache, batch_size: int = 10, max_workers: int = 2
+    ):
+        self.state = state
+        self.cache = cache
+        # As threads de processamento não acessam o session_state do Streamlit
+        self.backend = SimpleNamespace(
+            local_processing=state.local_processing,
+            engine=state.engine,
+            client=state.client,
+        )
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.buffer = {}
+        self.pending = []
+        self.failed = {}
+        self.processed = 0
+
+    def add(self, record: dict) -> None:
+        self.buffer[record["url"]] = record
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            batch, self.buffer = self.buffer, {}
+            future = self.executor.submit(request_pages, self.backend, batch)
+            self.pending.append((batch, future))
+
+    def poll(self, wait: bool = False) -> bool:
+        """Mescla os lotes concluídos e retorna se houve novos resultados"""
+        done = [(b, f) for b, f in self.pending if wait or f.done()]
+        self.pending = [(b, f) for b, f in self.pending if not (wait or f.done())]
+        merged = False
+        for batch, future in done:
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"Erro ao processar o lote de anúncios: {e}")
+                df = None
+            if df is None:
+                # Os anúncios do lote são reenviados ao final da raspagem
+                self.failed.update(batch)
+                continue
+            if len(df):
+                self.cache.store(batch, df)
+                merge_processed_pages(self.state, prepare_table(df))
+                self.processed += len(df)
+                merged = True
+        return merged
+
+    def close(self) -> bool:
+        """Processa os anúncios restantes, os que ainda falharem ficam em `failed`"""
+        self.flush()
+        merged = self.poll(wait=True)
+        if self.failed:
+            self.buffer, self.failed = self.failed, {}
+            self.flush()
+            merged = self.poll(wait=True) or merged
+        self.executor.shutdown()
+        self.cache.save()
+        return merged
+
+
+def conform_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Tabelas antigas e o serviço remoto não possuem todas as colunas de COLUNAS
+    for column in COLUNAS.keys() - set(df.columns):
+        df[column] = pd.NA
+    return df.astype(COLUNAS)
+
+
+def referenced_screenshots(scraper) -> set:
+    """Screenshots citados nas tabelas processadas, usado somente na migração ao manifesto"""
+    tables = scraper.folder.glob("*_pages.parquet")
+    legacy = scraper.folder.glob("*_pages.xlsx")
+    frames = [pd.read_parquet(f, columns=["screenshot"]) for f in tables] + [
+        pd.read_excel(f, usecols=["screenshot"])
+        for f in legacy
+        if not f.with_suffix(".parquet").is_file()
+    ]
+    if not frames:
+        return set()
+    return set(pd.concat(frames, ignore_index=True)["screenshot"].dropna())
 
 
-def manage_screenshots(scraper, state):
+# Colunas calculadas somente para exibição na tabela editável
+DERIVADAS = ["pdf", "modelo_match", "nome_match", "miniatura", "grupo"]
+
+
+def image_groups(
+    df: pd.DataFrame,
+    images: ImageCache,
+    entities: EntityIndex = None,
+    marketplace: str | None = None,
+) -> pd.Series:
+    """Grupo da imagem de cada anúncio, se repetida em qualquer marketplace"""
+    grupos = df["imagem"].map(images.cluster, na_action="ignore").astype("string")
+    ads = pd.DataFrame(
+        {"chave": f"{marketplace}|" + df["url"].astype("string"), "grupo": grupos}
+    )
+    if entities is not None and "imagem" in entities.table:
+        indexed = entities.table.loc[entities.table["imagem"].notna()]
+        indexed = pd.DataFrame(
+            {
+                "chave": indexed["chave"],
+                "grupo": indexed["imagem"].map(images.cluster).astype("string"),
+            }
+        )
+        ads = pd.concat([indexed, ads]).drop_duplicates("chave", keep="last")
+    # Somente grupos com mais de um anúncio são exibidos
+    repetidos = grupos.map(ads["grupo"].value_counts()) > 1
+    return grupos.where(repetidos.fillna(False))
+
+
+def derive_columns(
+    df: pd.DataFrame,
+    locate,
+    images: ImageCache = None,
+    entities: EntityIndex = None,
+    marketplace: str | None = None,
+) -> pd.DataFrame:
+    """Calcula as colunas derivadas somente das linhas novas
+
+    As miniaturas e os grupos das demais linhas são refeitos somente quando novas
+    imagens foram baixadas (`ImageCache.version`) ou outros marketplaces foram
+    indexados desde o último cálculo.
+    """
+    if "modelo_match" in df.columns:
+        rows = df["modelo_match"].isna()
+    else:
+        rows = pd.Series(True, index=df.index)
+    if rows.any():
+        new = df.loc[rows]
+        links = new["screenshot"].astype("string").map(locate, na_action="ignore")
+        df.loc[rows, "pdf"] = f"{CLOUD_PATH}/" + links
+        df.loc[rows, "modelo_match"] = new["modelo_score"] == 100
+        df.loc[rows, "nome_match"] = new["nome_score"] == 100
+        df["pdf"] = df["pdf"].astype("string")
+        df["modelo_match"] = df["modelo_match"].astype("bool")
+        df["nome_match"] = df["nome_match"].astype("bool")
+    if images is None:
+        return df
+    version = images.version, entities.loaded if entities is not None else None
+    stale = df.attrs.get("imagens") != version
+    if "miniatura" not in df.columns:
+        df["miniatura"] = pd.Series(pd.NA, index=df.index, dtype="string")
+    if rows.any():
+        images.prefetch(df.loc[rows, "imagem"].dropna())
+    # Imagens baixadas desde a última exibição substituem o link do marketplace
+    remote = rows
+    if stale:
+        remote = rows | ~df["miniatura"].fillna("").str.startswith("data:")
+    if remote.any():
+        imagens = df.loc[remote, "imagem"]
+        local = imagens.map(images.data_uri, na_action="ignore")
+        df.loc[remote, "miniatura"] = local.fillna(imagens).astype("string")
+    if stale or rows.any():
+        # Os grupos mudam à medida que novas imagens são baixadas
+        df["grupo"] = image_groups(df, images, entities, marketplace).str[:8]
+        df.attrs["imagens"] = version
+    return df
+
+
+def image_cache(state) -> ImageCache:
+    # Compartilhado entre os marketplaces, a mesma imagem é guardada uma única vez
+    return get_images(Path(state.folder) / "imagens")
+
+
+def image_members(state, imagem: str) -> pd.DataFrame:
+    """Anúncios de todos os marketplaces com imagem quase idêntica a `imagem`"""
+    images = image_cache(state)
+    columns = ["marketplace", "nome", "url"]
+    if (grupo := images.cluster(imagem)) is None:
+        return pd.DataFrame(columns=columns)
+    table = entity_index(state).table
+    current = state.processed_pages.assign(marketplace=state.mkplc)
+    ads = pd.concat(
+        [
+            table[columns + ["imagem"]] if "imagem" in table else None,
+            current[columns + ["imagem"]],
+        ]
+    ).drop_duplicates(["marketplace", "url"], keep="last")
+    same = ads["imagem"].map(images.cluster, na_action="ignore") == grupo
+    return ads.loc[same.fillna(False), columns]
+
+
+def entity_index(state) -> EntityIndex:
+    # Compartilhado entre os marketplaces para reunir os anúncios do mesmo produto
+    return get_entities(Path(state.folder))
+
+
+def manage_screenshots(scraper, state, progress=None):
     # Copy screenshots to cloud
     if (screenshots := scraper.folder / "screenshots").is_dir():
-        cloud = Path(f"{state.cloud}")
-        cloud.mkdir(parents=True, exist_ok=True)
-
-        # Sort Delete screenshots from local
-        files_in_session = pd.concat(
-            [
-                pd.read_excel(f, usecols=["screenshot"])
-                for f in scraper.folder.glob("*.xlsx")
-            ],
-            ignore_index=True,
-        )["screenshot"].to_list()
-
-        screenshots.ls().filter(lambda p: p.name not in files_in_session).map(
-            lambda p: p.unlink(missing_ok=True)
+        manifest = scraper.screenshots
+        # Os arquivos anteriores ao manifesto são incluídos mesmo que ele já exista
+        if manifest.untracked():
+            manifest.rebuild(referenced_screenshots(scraper))
+
+        # Screenshots sem anúncio gravado são excluídos, somente os desta palavra-chave
+        for name in (orphans := manifest.to_delete(state.keyword)):
+            (screenshots / name).unlink(missing_ok=True)
+            scraper.previews.delete(name)
+        manifest.mark(orphans, REMOVIDO)
+
+        stats = sync_screenshots(
+            manifest,
+            Path(f"{state.cloud}"),
+            progress=progress,
+            pack=bool(state.pack_screenshots),
+            prefix=scraper.name,
         )
-        for file in screenshots.ls().filter(lambda p: p.suffix == ".pdf"):
-            shutil.move(
-                str(file),
-                str(cloud / file.name),
+        if stats["erros"]:
+            print(
+                f"{stats['erros']} screenshots não foram sincronizados, serão reenviados no próximo salvamento"
             )
+        else:
+            # Descarta o histórico e os removidos, evitando reler todo o registro
+            manifest.compact()
+
+
+def processed_file(scraper, keyword: str) -> Path:
+    return scraper.pages_file(keyword).with_suffix(".parquet")
 
 
-def save_table(state: dict, subset_df: pd.DataFrame = None) -> bool:
+def read_table(table_file: Path) -> pd.DataFrame:
+    """Lê a tabela processada, em parquet ou no Excel legado"""
+    if table_file.suffix == ".parquet":
+        return conform_columns(pd.read_parquet(table_file))
+    df = pd.read_excel(table_file, dtype="string")
+    df["passível?"] = df["passível?"].map({"True": True, "False": False, pd.NA: False})
+    return conform_columns(sort_table(df))
+
+
+def export_excel(df: pd.DataFrame, output: Path) -> None:
+    # O Excel é gerado somente para exportação, a cópia local é mantida em parquet
+    df.to_excel(output, index=False)
+
+
+def export_cloud(df: pd.DataFrame, cloud: str, output_table: Path) -> None:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    export_excel(df, f"{cloud}/{output_table.stem}_{timestamp}.xlsx")
+
+
+def edit_journal(state, scraper) -> EditJournal:
+    """Registro das edições da tabela, consolidado e exportado em segundo plano"""
+    output_table = processed_file(scraper, state.keyword)
+    # A pasta de destino é informada a cada edição, o registro é único para todas as sessões
+    mkplc = state.mkplc
+    return get_journal(
+        output_table,
+        export=lambda df, cloud: export_cloud(
+            df.assign(marketplace=mkplc), cloud, output_table
+        ),
+    )
+
+
+def save_table(state: dict, progress=None) -> bool:
     scraper = SCRAPERS[state.mkplc](path=state.folder)
     try:
         if (df := state.processed_pages) is not None:
-            output_table = scraper.pages_file(state.keyword).with_suffix(".xlsx")
+            output_table = processed_file(scraper, state.keyword)
             df["marketplace"] = state.mkplc
-            df.to_excel(output_table, index=False)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            cloud_output = (
-                f"{state.cloud}/{output_table.stem}_{timestamp}{output_table.suffix}"
-            )
-            if subset_df is None:
-                shutil.copy(str(output_table), str(cloud_output))
-                manage_screenshots(scraper, state)
-            else:
-                subset_df["marketplace"] = state.mkplc
-                subset_df.to_excel(cloud_output, index=False)
+            # As colunas derivadas são refeitas na exibição, não são salvas
+            df = df.drop(columns=DERIVADAS, errors="ignore")
+            journal = edit_journal(state, scraper)
+            with journal.lock:
+                df.to_parquet(output_table, index=False)
+                # As edições pendentes já estão na tabela em memória
+                journal.clear()
+            export_cloud(df, state.cloud, output_table)
+            manage_screenshots(scraper, state, progress)
+            entity_index(state).add(df, state.keyword)
+            # Os links dos screenshots mudam se foram agrupados na sincronização
+            state.processed_pages = df
 
     except Exception as e:
         print(f"Erro ao salvar os dados processados: {e}")
 
 
-def process_data(state, pages_file: Path) -> None:
+def process_data(state, pages_file: Path, progress=None) -> None:
     state.processed_pages = None
-    if len(pages_file.read_json()) == 0:
+    if len(pages := pages_file.read_json()) == 0:
         state.cached_pages = None
         pages_file.unlink(missing_ok=True)
-    elif (df := request_table(state, pages_file)) is not None:
-        df["probabilidade"] = df["probabilidade"].astype("float") * 100
-        df["passível?"] = (
-            df["passível?"]
-            .astype("string")
-            .map({"True": True, "False": False, pd.NA: False})
-        )
-        df.sort_values(
-            by=["modelo_score", "nome_score", "passível?", "probabilidade"],
-            ascending=False,
-            inplace=True,
-            ignore_index=True,
-        )
-
-        state.processed_pages = df.astype(COLUNAS)
-        save_table(state)
+        return
+    scraper = SCRAPERS[state.mkplc](path=state.folder)
+    cache = processing_cache(state, scraper)
+    if (df := cache.process(pages, lambda p: request_pages(state, p))) is not None:
+        state.cache_stats = cache.stats
+        state.processed_pages = prepare_table(df)
+        save_table(state, progress)
 
 
 def update_processed_pages(state, output_df_key, edited_key):
@@ -95,6 +471,7 @@ def update_processed_pages(state, output_df_key, edited_key):
     df = state[output_df_key].reset_index(drop=True)
     index, row = edited.popitem()
     column, value = row.popitem()
+    old = df.at[index, column]
     df.at[index, column] = value
     # Sanity check
     assert (
@@ -104,4 +481,44 @@ def update_processed_pages(state, output_df_key, edited_key):
         "passível?"
     ].to_list()
     state[output_df_key] = df
-    save_table(state, state[output_df_key].loc[index].to_frame().T)
+    # Nova chave para as tabelas editáveis, pois a linha mudou de tabela
+    state.editor_version = (state.editor_version or 0) + 1
+    # A edição é aplicada em memória e registrada, a tabela é salva em segundo plano
+    scraper = SCRAPERS[state.mkplc](path=state.folder)
+    journal = edit_journal(state, scraper)
+    journal.record(
+        df.at[index, "url"],
+        column,
+        old.item() if hasattr(old, "item") else old,
+        value,
+        target=state.cloud,
+    )
+    # Os anúncios com a mesma imagem só são alterados após a confirmação, pois o
+    # agrupamento pode reunir produtos diferentes
+    table = state.processed_pages
+    state.group_decision = None
+    if column == "passível?" and "grupo" in table and pd.notna(df.at[index, "grupo"]):
+        same = (table["grupo"] == df.at[index, "grupo"]).fillna(False)
+        same &= table[column] != value
+        if same.any():
+            state.group_decision = {
+                "imagem": df.at[index, "imagem"],
+                "valor": value,
+                "urls": table.loc[same, "url"].to_list(),
+            }
+
+
+def apply_group_decision(state) -> None:
+    """Aplica a classificação confirmada aos anúncios desta tabela com a mesma imagem"""
+    if (decision := state.group_decision) is None:
+        return
+    state.group_decision = None
+    table = state.processed_pages
+    column, value = "passível?", decision["valor"]
+    same = table["url"].isin(decision["urls"]) & (table[column] != value)
+    scraper = SCRAPERS[state.mkplc](path=state.folder)
+    journal = edit_journal(state, scraper)
+    for url, previous in table.loc[same, ["url", column]].itertuples(index=False):
+        journal.record(url, column, bool(previous), value, target=state.cloud)
+    table.loc[same, column] = value
+    state.editor_version = (state.editor_version or 0) + 1
@@ -123,7 +123,7 @@ class AmazonScraper(BaseScraper):
         return table_data
 
     def extract_item_data(self, driver):
-        soup = driver.get_beautiful_soup()
+        soup = self.get_soup(driver)
 
         if categoria := self.get_selector(
             driver, soup, 'div[id="wayfinding-breadcrumbs_feature_div"]'
@@ -192,13 +192,8 @@ class AmazonScraper(BaseScraper):
             if hasattr(descrição_principal, "select"):
                 descrição = md(str(descrição_principal.select("span")))
 
-        try:
-            driver.click_visible_elements(
-                'a[class^="a-expander-header"]', timeout=self.timeout
-            )
-            self.highlight_element(driver, 'div[id="productDetails"]')
-        except Exception as e:
-            print(e)
+        self.click_visible(driver, 'a[class^="a-expander-header"]')
+        self.highlight_element(driver, 'div[id="productDetails"]')
 
         modelo, ean, certificado, asin = None, None, None, None
 
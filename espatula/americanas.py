@@ -66,7 +66,7 @@ class AmericanasScraper(BaseScraper):
         return results
 
     def extract_item_data(self, driver):
-        soup = driver.get_beautiful_soup()
+        soup = self.get_soup(driver)
 
         def get_selector(selector):
             self.highlight_element(driver, selector)
@@ -106,13 +106,7 @@ class AmericanasScraper(BaseScraper):
         if nota := get_selector('div[class*="Rating"]'):
             nota = nota.get_text().strip()
 
-        try:
-            driver.click_visible_elements(
-                'button[class*="accordion-box-expand-button"]',
-                timeout=self.timeout,
-            )
-        except Exception as e:
-            print(e)
+        self.click_visible(driver, 'button[class*="accordion-box-expand-button"]')
 
         if descrição := get_selector('div[data-testid="rich-content-container"]'):
             descrição = md(str(descrição))
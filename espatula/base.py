@@ -5,7 +5,8 @@ import platform
 import re
 import uuid
 from contextlib import contextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cached_property
 from io import BytesIO
 from typing import Generator
 from zoneinfo import ZoneInfo
@@ -21,6 +22,13 @@ from seleniumbase.common.exceptions import (
     NoSuchElementException,
 )
 
+from .compression import DEFAULT_PROFILE, PROFILES, compress_pdf
+from .gtin import find_gtins, first_valid_gtin
+from .metrics import REGISTRY
+from .previews import get_previews
+from .screenshots import get_manifest
+from .timing import VAZIO, StageTimer
+
 
 TIMEZONE = ZoneInfo("America/Sao_Paulo")
 CERTIFICADO2 = re.compile(
@@ -62,9 +70,9 @@ EAN = re.compile(
                 )
                 .*?                 # Non-greedy match of any characters
                 (                   # Capturing group for the actual code
-                    \d{14}|          # Match 8 digits (EAN-8)
+                    \d{14}|         # Match 14 digits (GTIN-14)
                     \d{13}|         # or 13 digits (EAN-13)
-                    \d{8}          # or 14 digits (GTIN-14)
+                    \d{8}           # or 8 digits (EAN-8)
                 )
             """,
     re.VERBOSE,
@@ -95,6 +103,10 @@ class BaseScraper:
     incognito: bool = False
     do_not_track: bool = True
     handle_captcha: bool = False
+    # Ex.: o marketplace local de `benchmarks/standin.py` no lugar dos sites
+    host_resolver_rules: str | None = None
+    chromium_arg: str | None = None
+    browser_failed: bool = field(default=False, init=False, repr=False)
 
     @property
     def name(self):
@@ -139,7 +151,12 @@ class BaseScraper:
             return {}
         return loads(pages_file.read_text(encoding="utf-8"))
 
+    @cached_property
+    def timings(self) -> StageTimer:
+        return StageTimer(self.folder / "timings.jsonl", self.name)
+
     def click_captcha(self, driver):
+        REGISTRY.inc("espatula_captcha_total", marketplace=self.name)
         driver.uc_gui_click_captcha(retry=True)
 
     @contextmanager
@@ -149,19 +166,30 @@ class BaseScraper:
             user_data_dir = CHROME_DATA_DIR
         else:
             user_data_dir = None
-        with SB(
-            uc=True,  # Always true
-            incognito=self.incognito,
-            headless2=self.headless,
-            guest_mode=self.guest_mode,
-            do_not_track=self.do_not_track,
-            user_data_dir=user_data_dir,
-        ) as sb:
-            sb.driver.maximize_window()
-            sb.uc_open_with_reconnect(self.url, reconnect_time=self.reconnect)
-            if self.handle_captcha:
-                self.click_captcha(sb)
-            yield sb
+        # A busca seguida da inspeção abre dois navegadores, só conta a reabertura
+        # após a falha do anterior
+        if self.browser_failed:
+            REGISTRY.inc("espatula_browser_restarts_total", marketplace=self.name)
+        self.browser_failed = False
+        try:
+            with SB(
+                uc=True,  # Always true
+                incognito=self.incognito,
+                headless2=self.headless,
+                guest_mode=self.guest_mode,
+                do_not_track=self.do_not_track,
+                user_data_dir=user_data_dir,
+                host_resolver_rules=self.host_resolver_rules,
+                chromium_arg=self.chromium_arg,
+            ) as sb:
+                sb.driver.maximize_window()
+                self.open_url(sb, self.url)
+                if self.handle_captcha:
+                    self.click_captcha(sb)
+                yield sb
+        except Exception:
+            self.browser_failed = True
+            raise
 
     @staticmethod
     # https://chromedevtools.github.io/devtools-protocol/tot/Page#method-printToPDF
@@ -235,21 +263,16 @@ class BaseScraper:
 
     @staticmethod
     def match_ean(string: str) -> str | None:
-        if match := re.search(EAN, string):
-            if match[1]:
-                # Remove all non-digit characters
-                return re.sub(r"\D", "", match[1])
-        return None
+        # Somente códigos com dígito verificador válido são aceitos
+        return first_valid_gtin(match[1] for match in re.finditer(EAN, string))
 
     @staticmethod
-    def extrair_ean(caracteristicas: dict) -> str:
-        return next(
-            (
-                caracteristicas.get(k, "")
-                for k in caracteristicas
-                if any(s in k.lower() for s in ("ean", "gtin", "digo de barras"))
-            ),
-            None,
+    def extrair_ean(caracteristicas: dict) -> str | None:
+        return first_valid_gtin(
+            code
+            for k in caracteristicas
+            if any(s in k.lower() for s in ("ean", "gtin", "digo de barras"))
+            for code in find_gtins(caracteristicas.get(k, ""))
         )
 
     def extract_item_data(self, driver):
@@ -277,60 +300,86 @@ class BaseScraper:
         self.highlight_element(driver, selector)
         if timeout is None:
             timeout = self.reconnect
-        try:
+        # A falha no clique é registrada no log de tempos e não interrompe a extração
+        with self.timings.stage("click", suppress=True):
             driver.uc_click(selector, timeout=timeout, reconnect_time=timeout)
-        except Exception as e:
-            print(e)
+
+    def click_visible(self, driver, selector):
+        with self.timings.stage("click", suppress=True):
+            driver.click_visible_elements(selector, timeout=self.timeout)
+
+    def get_soup(self, driver):
+        with self.timings.stage("soup"):
+            return driver.get_beautiful_soup()
+
+    def open_url(self, driver, url: str) -> None:
+        self.timings.page = url
+        with self.timings.stage("open"):
+            driver.uc_open_with_reconnect(url, reconnect_time=self.reconnect)
+
+    def extract_page(self, driver) -> dict:
+        with self.timings.stage("extract") as etapa:
+            if not (result_page := self.extract_item_data(driver)):
+                etapa["resultado"] = VAZIO
+        return result_page
 
     def _save_screenshot(self, driver: SB, filename: str):
         folder = self.folder / "screenshots"
         folder.mkdir(parents=True, exist_ok=True)
-        screenshot = self.capture_full_page_screenshot(driver)
-        screenshot = self.compress_images(BytesIO(screenshot))
+        with self.timings.stage("screenshot"):
+            screenshot = self.capture_full_page_screenshot(driver)
+        with self.timings.stage("compress"):
+            screenshot = self.compress_images(BytesIO(screenshot))
         with open(folder / filename, "wb") as f:
             f.write(screenshot)
-
-    @staticmethod
-    def compress_images(pdf_stream):
+        REGISTRY.inc(
+            "espatula_screenshot_bytes_total",
+            len(screenshot),
+            marketplace=self.name,
+            keyword=self.timings.keyword,
+        )
         try:
-            from pypdf import PdfReader, PdfWriter
-
-            reader = PdfReader(pdf_stream)
-            writer = PdfWriter()
-
-            for page in reader.pages:
-                writer.add_page(page)
+            # A miniatura usa a tela visível, as páginas são geradas em segundo plano
+            self.previews.submit(filename, screenshot, driver.get_screenshot_as_png())
+        except Exception as e:
+            print(f"Erro ao capturar a pré-visualização: {e}")
 
-            if reader.metadata is not None:
-                writer.add_metadata(reader.metadata)
+    @staticmethod
+    def compress_images(pdf_stream, profile: str = DEFAULT_PROFILE) -> bytes:
+        return compress_pdf(pdf_stream, PROFILES[profile])
 
-            for page in writer.pages:
-                for img in page.images:
-                    img.replace(img.image, quality=80)
-                page.compress_content_streams(level=9)
+    @property
+    def screenshots(self):
+        return get_manifest(self.folder / "screenshots")
 
-            bytes_stream = BytesIO()
-            writer.write(bytes_stream)
-            return bytes_stream.getvalue()
-        except ImportError:
-            print("pypdf not installed, skipping screenshot compression")
-            return pdf_stream
+    @property
+    def previews(self):
+        return get_previews(self.folder / "previews")
 
-    def save_screenshot(self, sb: SB, result_page: dict):
+    def save_screenshot(self, sb: SB, result_page: dict, keyword: str = None):
         filename = f"{uuid.uuid4()}.pdf"
+        # Registrado antes da gravação, o arquivo nunca é tomado por um da versão anterior
+        self.screenshots.add(filename, url=result_page.get("url"), sessao=keyword)
         self._save_screenshot(sb.driver, filename)
         result_page["screenshot"] = filename
 
     def save_sampled_pages(self, keyword: str, sampled_pages: dict):
-        json.dump(
-            self.get_pages(keyword) | sampled_pages,
-            self.pages_file(keyword).open("w", encoding="utf-8"),
-            ensure_ascii=False,
+        self.timings.page = None
+        with self.timings.stage("save"):
+            json.dump(
+                self.get_pages(keyword) | sampled_pages,
+                self.pages_file(keyword).open("w", encoding="utf-8"),
+                ensure_ascii=False,
+            )
+        self.screenshots.persisted(
+            page["screenshot"]
+            for page in sampled_pages.values()
+            if page.get("screenshot")
         )
 
     def process_url(self, driver: SB, url: str) -> dict:
-        driver.uc_open_with_reconnect(url, reconnect_time=self.reconnect)
-        if result_page := self.extract_item_data(driver):
+        self.open_url(driver, url)
+        if result_page := self.extract_page(driver):
             if not result_page.get("categoria"):
                 if not self.headless:
                     driver.post_message("Anúncio com dados sem categoria - 🚮")
@@ -338,6 +387,15 @@ class BaseScraper:
 
         return result_page
 
+    def queue_depth(
+        self, keyword: str, remaining: int, sample: int = 0, sampled: dict = None
+    ) -> None:
+        if sample:
+            remaining = min(remaining, sample - len(sampled or {}))
+        REGISTRY.set(
+            "espatula_queue_depth", remaining, marketplace=self.name, keyword=keyword
+        )
+
     def inspect_pages(
         self,
         keyword: str,
@@ -350,17 +408,21 @@ class BaseScraper:
         if shuffle:
             keys = keys.shuffle()
         sampled_pages = {}
+        self.timings.start(keyword)
 
         with self.browser() as driver:
             driver.set_messenger_theme(location="top_center")
             try:
-                for i, url in keys:
+                for position, (i, url) in enumerate(keys):
+                    self.queue_depth(
+                        keyword, len(keys) - position, sample, sampled_pages
+                    )
                     if not (result_page := self.process_url(driver, url)):
                         del links[url]
                         continue
 
                     if screenshot:
-                        self.save_screenshot(driver, result_page)
+                        self.save_screenshot(driver, result_page, keyword)
                     else:
                         result_page["screenshot"] = ""
 
@@ -372,12 +434,14 @@ class BaseScraper:
                     if sample and len(sampled_pages) >= sample:
                         break
             finally:
+                self.queue_depth(keyword, 0)
                 self.save_sampled_pages(keyword, sampled_pages)
                 json.dump(
                     links,
                     self.links_file(keyword).open("w", encoding="utf-8"),
                     ensure_ascii=False,
                 )
+                print(self.timings.report())
 
     def input_search_params(self, driver: SB, keyword: str):
         self.highlight_element(driver, self.input_field)
@@ -425,6 +489,7 @@ class BaseScraper:
         links = {} if overwrite else self.get_links(keyword)
         results = {}
         page = 1
+        self.timings.start(keyword)
         with self.browser() as driver:
             try:
                 self.input_search_params(driver, keyword)
@@ -432,7 +497,7 @@ class BaseScraper:
                 self.wait_for_pagination(driver)
                 driver.set_messenger_theme(location="top_center")
                 while True:
-                    soup = driver.get_beautiful_soup()
+                    soup = self.get_soup(driver)
                     products = self.discover_product_urls(soup, keyword)
                     if not self.headless:
                         driver.post_message(f"🕷️ Links da página {page} coletados! 🕸️")
@@ -456,3 +521,4 @@ class BaseScraper:
                     self.links_file(keyword).open("w", encoding="utf-8"),
                     ensure_ascii=False,
                 )
+                print(self.timings.report())
@@ -0,0 +1,41 @@
+import hashlib
+import json
+import zipfile
+
+from fastcore.xtras import Path
+
+INDEX = "index.json"
+
+
+def bundle_name(prefix: str, sessao: str | None, arquivos: list[str]) -> str:
+    """Nome determinístico, o mesmo conjunto de arquivos gera sempre o mesmo pacote"""
+    digest = hashlib.blake2b(
+        "\n".join(sorted(arquivos)).encode(), digest_size=6
+    ).hexdigest()
+    slug = (sessao or "sessao").lower().replace(" ", "_")
+    return f"{prefix}_{slug}_{digest}.zip"
+
+
+def pack(files: list[Path], target: Path, index: dict) -> None:
+    """Agrupa os screenshots num zip sem compressão, com o índice `index.json` embutido
+
+    Os pdfs já são comprimidos ao serem salvos. O diretório central do zip permite
+    extrair um único arquivo pelo nome sem ler o pacote inteiro.
+    """
+    target = Path(target)
+    partial = target.with_name(f"{target.name}.part")
+    with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_STORED) as bundle:
+        for file in files:
+            bundle.write(file, Path(file).name)
+        bundle.writestr(INDEX, json.dumps(index, ensure_ascii=False))
+    with zipfile.ZipFile(partial) as bundle:
+        if (corrupted := bundle.testzip()) is not None:
+            partial.unlink(missing_ok=True)
+            raise OSError(f"Arquivo {corrupted} corrompido no pacote {target.name}")
+    partial.replace(target)
+
+
+def extract(bundle: Path, arquivo: str) -> bytes:
+    """Lê um único screenshot do pacote"""
+    with zipfile.ZipFile(bundle) as z:
+        return z.read(arquivo)
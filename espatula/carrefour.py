@@ -38,9 +38,7 @@ class CarrefourScraper(BaseScraper):
         for attempt in range(self.retries):
             try:
                 if department := CATEGORIES.get(keyword):
-                    driver.uc_open_with_reconnect(
-                        department, reconnect_time=self.reconnect
-                    )
+                    self.open_url(driver, department)
                 self.highlight_element(driver, self.input_field)
                 driver.type(self.input_field, keyword, timeout=self.timeout)
                 self.uc_click(driver, 'button[aria-label="Buscar produtos"]')
@@ -89,7 +87,7 @@ class CarrefourScraper(BaseScraper):
         return results
 
     def extract_item_data(self, driver):
-        soup = driver.get_beautiful_soup()
+        soup = self.get_soup(driver)
 
         def get_selector(selector):
             self.highlight_element(driver, selector)
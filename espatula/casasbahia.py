@@ -67,7 +67,7 @@ class CasasBahiaScraper(BaseScraper):
         return results
 
     def extract_item_data(self, driver):
-        soup = driver.get_beautiful_soup()
+        soup = self.get_soup(driver)
 
         def get_selector(selector):
             self.highlight_element(driver, selector)
@@ -129,7 +129,7 @@ class CasasBahiaScraper(BaseScraper):
         try:
             tag = 'svg[data-testid="Características"]'
             self.uc_click(driver, tag, timeout=self.timeout)
-            soup = driver.get_beautiful_soup()
+            soup = self.get_soup(driver)
             características.update(self.parse_tables(soup, "Características"))
             self.uc_click(driver, 'button[aria-label="Fechar"]', timeout=self.timeout)
         except Exception as e:
@@ -138,7 +138,7 @@ class CasasBahiaScraper(BaseScraper):
         try:
             tag = 'svg[data-testid="Especificações-Técnicas"]'
             self.uc_click(driver, tag, timeout=self.timeout)
-            soup = driver.get_beautiful_soup()
+            soup = self.get_soup(driver)
             características.update(self.parse_tables(soup, "Especificações Técnicas"))
             self.uc_click(driver, 'button[aria-label="Fechar"]', timeout=self.timeout)
 
@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from io import BytesIO
+
+
+@dataclass(frozen=True)
+class CompressionProfile:
+    """Parâmetros da recompressão dos screenshots em pdf
+
+    `quality` é a qualidade JPEG das imagens recodificadas e `level` o nível zlib dos
+    content streams. Imagens com menos de `min_bytes` são mantidas como estão, as
+    mais largas que `max_width` pixels são reduzidas antes da recodificação.
+    """
+
+    quality: int = 80
+    level: int = 9
+    min_bytes: int = 0
+    max_width: int | None = None
+    deduplicate: bool = False
+
+
+# Perfis comparados em `benchmarks/compression.py`
+PROFILES = {
+    "original": CompressionProfile(),
+    "qualidade_60": CompressionProfile(quality=60),
+    "nivel_6": CompressionProfile(level=6),
+    "mantem_pequenas": CompressionProfile(min_bytes=16_384),
+    "reduz_grandes": CompressionProfile(max_width=1280),
+    "deduplica": CompressionProfile(deduplicate=True),
+    "reduz_qualidade_75": CompressionProfile(quality=75, max_width=1280),
+}
+# Qualidade 80 sem redução das imagens, até que o benchmark seja executado com
+# `--corpus` sobre screenshots reais; os resultados sintéticos não bastam para a troca
+DEFAULT_PROFILE = "original"
+
+
+def compress_pdf(
+    pdf_stream: BytesIO, profile: CompressionProfile = PROFILES[DEFAULT_PROFILE]
+) -> bytes:
+    """Recodifica as imagens e comprime os content streams do pdf"""
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        print("pypdf not installed, skipping screenshot compression")
+        return pdf_stream.getvalue()
+
+    reader = PdfReader(pdf_stream)
+    writer = PdfWriter()
+
+    for page in reader.pages:
+        writer.add_page(page)
+
+    if reader.metadata is not None:
+        writer.add_metadata(reader.metadata)
+
+    for page in writer.pages:
+        for img in page.images:
+            # Ícones e miniaturas costumam aumentar ao serem recodificados
+            if len(img.data) < profile.min_bytes:
+                continue
+            image = img.image
+            if profile.max_width and image.width > profile.max_width:
+                image.thumbnail((profile.max_width, image.height))
+            img.replace(image, quality=profile.quality)
+        page.compress_content_streams(level=profile.level)
+
+    # Logotipos e selos repetidos em várias páginas são gravados uma única vez
+    if profile.deduplicate and hasattr(writer, "compress_identical_objects"):
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+    bytes_stream = BytesIO()
+    writer.write(bytes_stream)
+    return bytes_stream.getvalue()
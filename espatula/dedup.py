@@ -0,0 +1,119 @@
+from io import BytesIO
+
+import numpy as np
+
+HASH_SIZE = 8
+IMAGE_SIZE = 32
+# Distância de Hamming máxima, em 64 bits, para considerar duas imagens iguais
+RADIUS = 6
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+DCT = _dct_matrix(IMAGE_SIZE)
+
+
+def phash(image_bytes: bytes) -> int:
+    """Hash perceptual de 64 bits: sinais das baixas frequências da DCT em relação à mediana"""
+    from PIL import Image
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        gray = image.convert("L").resize((IMAGE_SIZE, IMAGE_SIZE), Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.float64)
+    low = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # O termo constante só reflete o brilho médio
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Árvore BK sobre a distância de Hamming, busca por raio sem comparar todos os pares"""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value: int, item) -> None:
+        node = [value, [item], {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            if (distance := hamming(value, current[0])) == 0:
+                current[1].append(item)
+                return
+            if (child := current[2].get(distance)) is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value: int, radius: int = RADIUS) -> list[tuple[int, object]]:
+        if self.root is None:
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                found.extend((distance, item) for item in items)
+            # Desigualdade triangular: só os ramos a até `radius` da distância atual
+            for d in range(max(distance - radius, 1), distance + radius + 1):
+                if (child := children.get(d)) is not None:
+                    stack.append(child)
+        return found
+
+
+class UnionFind:
+    """Conjuntos disjuntos com raiz determinística, o identificador não depende da ordem"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def __contains__(self, item) -> bool:
+        return item in self.parent
+
+    def add(self, item) -> None:
+        self.parent.setdefault(item, item)
+
+    def find(self, item):
+        root = item
+        while (parent := self.parent[root]) != root:
+            root = parent
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b) -> None:
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            a, b = sorted((a, b))
+            self.parent[b] = a
+
+
+class ImageClusters(UnionFind):
+    """Agrupa incrementalmente as imagens quase idênticas (union-find sobre a BK-tree)"""
+
+    def __init__(self, radius: int = RADIUS):
+        super().__init__()
+        self.radius = radius
+        self.tree = BKTree()
+
+    def add(self, item, value: int) -> None:
+        if item in self.parent:
+            return
+        super().add(item)
+        for _, other in self.tree.search(value, self.radius):
+            self.union(item, other)
+        self.tree.add(value, item)
+
+    def cluster(self, item):
+        return self.find(item) if item in self.parent else None
@@ -0,0 +1,245 @@
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import pandas as pd
+from fastcore.xtras import Path
+
+from .dedup import UnionFind
+from .gtin import normalize_gtins
+from .matching import (
+    MAX_BLOCK,
+    manufacturer_key,
+    model_prefixes,
+    normalize_text,
+    partial_ratios,
+)
+from .sch import certificado_keys
+from .shared import file_lock
+
+INDEX = "entidades.parquet"
+# Score mínimo entre os modelos para ligar anúncios do mesmo certificado ou do mesmo bloco
+CERTIFICADO_SCORE = 80
+MODELO_SCORE = 95
+# Modelos curtos demais ("x1", "pro") não distinguem produtos
+MIN_MODELO = 4
+CAMPOS = [
+    "chave",
+    "marketplace",
+    "palavra_busca",
+    "url",
+    "nome",
+    "ean",
+    "certificado",
+    "fabricante",
+    "modelo",
+    "imagem",
+    "entidade",
+]
+
+
+def entity_records(df: pd.DataFrame, keyword: str | None = None) -> pd.DataFrame:
+    """Campos normalizados de cada anúncio, usados na blocagem e na comparação"""
+    marketplace = df["marketplace"].astype("string")
+    url = df["url"].astype("string")
+    eans = normalize_gtins(df["ean_gtin"].astype("string").fillna(""))
+    records = pd.DataFrame(
+        {
+            "chave": marketplace + "|" + url,
+            "marketplace": marketplace,
+            "palavra_busca": keyword,
+            "url": url,
+            "nome": df["nome"].astype("string"),
+            "ean": pd.array([e.zfill(14) if e else None for e in eans], "string"),
+            "certificado": certificado_keys(df["certificado"]).to_numpy(),
+            "fabricante": [
+                manufacturer_key(normalize_text(s)) for s in df["fabricante"]
+            ],
+            "modelo": [normalize_text(s) for s in df["modelo"]],
+            # Usada para reunir os anúncios com a mesma foto em todos os marketplaces
+            "imagem": df.get("imagem", pd.Series(pd.NA, index=df.index)).astype(
+                "string"
+            ),
+        },
+        index=df.index,
+    )
+    records = records.dropna(subset=["chave"])
+    return records.drop_duplicates("chave").reset_index(drop=True)
+
+
+@dataclass
+class EntityIndex:
+    """Índice persistente dos anúncios do mesmo produto em todos os marketplaces
+
+    Os anúncios são agrupados em blocos pelo EAN, pelo certificado e pelo fabricante
+    e prefixo dos tokens do modelo. Cada anúncio novo é comparado somente com os
+    membros dos seus blocos e ligado a eles por union-find quando o EAN coincide ou o
+    modelo é suficientemente parecido. A entidade de cada anúncio fica gravada em
+    `entidades.parquet`, as inclusões seguintes apenas complementam o índice. O
+    arquivo é relido quando alterado por outro processo.
+    """
+
+    folder: Path
+    max_block: int = MAX_BLOCK
+    table: pd.DataFrame = field(default=None, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.folder = Path(self.folder)
+        self.load()
+
+    @property
+    def index_file(self) -> Path:
+        return self.folder / INDEX
+
+    def signature(self) -> tuple[int, int] | None:
+        try:
+            stat = self.index_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def refresh(self) -> None:
+        """Relê o índice se outro processo o gravou desde a última leitura"""
+        with self.lock:
+            if self.signature() != self.loaded:
+                self.load()
+
+    def load(self) -> None:
+        self.entities = UnionFind()
+        self.blocks = defaultdict(list)
+        self.modelos = {}
+        self.loaded = self.signature()
+        if self.loaded is not None:
+            self.table = pd.read_parquet(self.index_file)
+        else:
+            self.table = pd.DataFrame(columns=CAMPOS)
+            return
+        for record in self.table.itertuples(index=False):
+            self.entities.parent[record.chave] = record.entidade
+            self.modelos[record.chave] = record.modelo.replace(" ", "")
+            for block in self.block_keys(record):
+                self.blocks[block].append(record.chave)
+
+    @staticmethod
+    def block_keys(record) -> list[tuple]:
+        keys = []
+        if pd.notna(record.ean):
+            keys.append(("ean", record.ean))
+        if record.certificado >= 0:
+            keys.append(("certificado", record.certificado))
+        # A forma compacta aproxima "sm a155m" de "sma155m"
+        modelo = record.modelo.replace(" ", "")
+        for prefix in model_prefixes(record.modelo) | model_prefixes(modelo):
+            keys.append(("modelo", record.fabricante, prefix))
+            keys.append(("modelo", "", prefix))
+        return keys
+
+    def link(self, records: pd.DataFrame) -> None:
+        pairs = {}
+        for record in records.itertuples(index=False):
+            self.entities.add(record.chave)
+            self.modelos[record.chave] = record.modelo.replace(" ", "")
+            for block in self.block_keys(record):
+                members = self.blocks[block]
+                # Blocos de modelo muito grandes não discriminam candidatos
+                if block[0] != "modelo" or len(members) <= self.max_block:
+                    for other in members:
+                        pairs.setdefault((record.chave, other), block[0])
+                members.append(record.chave)
+        # O EAN identifica o produto, os demais blocos dependem da semelhança do modelo
+        compare = []
+        for (a, b), kind in pairs.items():
+            if kind == "ean":
+                self.entities.union(a, b)
+            else:
+                compare.append((a, b, kind))
+        if not compare:
+            return
+        left = [self.modelos[a] for a, _, _ in compare]
+        right = [self.modelos[b] for _, b, _ in compare]
+        scores = partial_ratios(left, right, normalized=True)
+        for (a, b, kind), score, ma, mb in zip(compare, scores, left, right):
+            if kind == "certificado":
+                linked = score >= CERTIFICADO_SCORE
+            else:
+                linked = score >= MODELO_SCORE and min(len(ma), len(mb)) >= MIN_MODELO
+            if linked:
+                self.entities.union(a, b)
+
+    def save(self) -> None:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        partial = self.index_file.with_name(f"{INDEX}.part")
+        self.table.to_parquet(partial, index=False)
+        partial.replace(self.index_file)
+        self.loaded = self.signature()
+
+    def add(self, df: pd.DataFrame, keyword: str | None = None) -> int:
+        """Inclui os anúncios ainda não indexados, retorna quantos foram incluídos"""
+        records = entity_records(df, keyword)
+        with self.lock, file_lock(self.index_file):
+            # As inclusões de outros processos são mantidas
+            if self.signature() != self.loaded:
+                self.load()
+            records = records.loc[
+                ~records["chave"].isin(self.entities.parent)
+            ].reset_index(drop=True)
+            if records.empty:
+                return 0
+            self.link(records)
+            table = pd.concat(
+                [self.table.drop(columns="entidade", errors="ignore"), records],
+                ignore_index=True,
+            )
+            # Novas ligações podem unir entidades já gravadas
+            table["entidade"] = table["chave"].map(self.entities.find)
+            self.table = table
+            self.save()
+        return len(records)
+
+    def entity(self, marketplace: str, url: str) -> str | None:
+        chave = f"{marketplace}|{url}"
+        with self.lock:
+            return self.entities.find(chave) if chave in self.entities else None
+
+    def members(self, entidade: str | None) -> pd.DataFrame:
+        """Todos os anúncios da entidade, em qualquer marketplace"""
+        return self.table.loc[self.table["entidade"] == entidade]
+
+    def find_model(self, modelo: str, fabricante: str = "") -> pd.DataFrame:
+        """Anúncios de todos os produtos cujo modelo corresponde a `modelo`"""
+        modelo = normalize_text(modelo)
+        fabricante = manufacturer_key(normalize_text(fabricante))
+        with self.lock:
+            compact = modelo.replace(" ", "")
+            candidates = list(
+                {
+                    chave
+                    for prefix in model_prefixes(modelo) | model_prefixes(compact)
+                    for chave in self.blocks.get(("modelo", fabricante, prefix), [])
+                }
+            )
+            scores = partial_ratios(
+                [compact] * len(candidates),
+                [self.modelos[c] for c in candidates],
+                normalized=True,
+            )
+            entidades = {
+                self.entities.find(c)
+                for c, score in zip(candidates, scores)
+                if score >= MODELO_SCORE
+            }
+        return self.table.loc[self.table["entidade"].isin(entidades)]
+
+
+INDICES: dict[str, EntityIndex] = {}
+LOCK = threading.Lock()
+
+
+def get_entities(folder: Path) -> EntityIndex:
+    with LOCK:
+        if (index := INDICES.get(str(folder))) is None:
+            index = INDICES[str(folder)] = EntityIndex(folder)
+            return index
+    index.refresh()
+    return index
@@ -0,0 +1,83 @@
+import re
+from typing import Iterable
+
+import numpy as np
+
+# Comprimentos aceitos: EAN-8, UPC-A, EAN-13 e GTIN-14
+GTIN_LENGTHS = (8, 12, 13, 14)
+
+# Pesos do dígito verificador para o GTIN-14 (demais formatos são completados com zeros à esquerda)
+WEIGHTS = np.array([3, 1] * 6 + [3], dtype=np.int64)
+
+NON_DIGITS = re.compile(r"\D")
+CANDIDATES = re.compile(r"(?<!\d)(\d{14}|\d{13}|\d{12}|\d{8})(?!\d)")
+
+
+def clean_gtin(code) -> str:
+    """Remove espaços, hífens e demais caracteres não numéricos do código"""
+    if code is None:
+        return ""
+    return NON_DIGITS.sub("", str(code))
+
+
+def _digits_matrix(codes: list[str]) -> np.ndarray:
+    # Cada código é completado para 14 dígitos e convertido numa linha da matriz
+    buffer = "".join(c.zfill(14) for c in codes).encode("ascii")
+    return (np.frombuffer(buffer, dtype=np.uint8) - ord("0")).reshape(-1, 14)
+
+
+def validate_gtins(codes: Iterable) -> np.ndarray:
+    """Retorna uma máscara booleana indicando quais códigos são GTINs válidos"""
+    codes = [clean_gtin(c) for c in codes]
+    valid = np.zeros(len(codes), dtype=bool)
+    candidates = [
+        i
+        for i, c in enumerate(codes)
+        if len(c) in GTIN_LENGTHS and c.strip("0")  # Descarta códigos zerados
+    ]
+    if candidates:
+        digits = _digits_matrix([codes[i] for i in candidates])
+        check = (10 - (digits[:, :13] @ WEIGHTS) % 10) % 10
+        valid[candidates] = check == digits[:, 13]
+    return valid
+
+
+def normalize_gtins(codes: Iterable) -> list[str | None]:
+    """Normaliza os códigos válidos para somente dígitos e substitui os inválidos por None"""
+    codes = [clean_gtin(c) for c in codes]
+    valid = validate_gtins(codes)
+    return [c if v else None for c, v in zip(codes, valid)]
+
+
+def normalize_gtin(code) -> str | None:
+    return normalize_gtins([code])[0]
+
+
+def is_valid_gtin(code) -> bool:
+    return bool(validate_gtins([code])[0])
+
+
+def to_gtin14(code) -> str | None:
+    """Forma canônica de 14 dígitos, usada como chave em comparações entre anúncios"""
+    if code := normalize_gtin(code):
+        return code.zfill(14)
+    return None
+
+
+def first_valid_gtin(candidates: Iterable) -> str | None:
+    """Retorna o primeiro candidato válido, na ordem em que foram encontrados"""
+    candidates = list(candidates)
+    for code in normalize_gtins(candidates):
+        if code:
+            return code
+    return None
+
+
+def find_gtins(text: str) -> list[str]:
+    """Extrai todas as sequências de dígitos com comprimento de GTIN, ignorando separadores"""
+    if not text:
+        return []
+    candidates = CANDIDATES.findall(str(text))
+    if not candidates and (digits := clean_gtin(text)):
+        candidates = [digits]
+    return candidates
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+
+import requests
+from fastcore.xtras import Path
+from requests.adapters import HTTPAdapter, Retry
+
+from .dedup import ImageClusters, phash
+from .shared import JsonlTail, file_lock
+
+# Miniatura para as tabelas e cópia reduzida mantida como evidência do anúncio
+SIZES = {"thumb": 96, "full": 480}
+FORMAT = "webp"
+INDEX = "index.jsonl"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0 Safari/537.36"
+}
+
+
+def resized(image_bytes: bytes, width: int) -> bytes:
+    from PIL import Image
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        image.thumbnail((width, width))
+        output = BytesIO()
+        image.convert("RGB").save(output, FORMAT, quality=80)
+        return output.getvalue()
+
+
+@dataclass
+class ImageCache:
+    """Cache local das imagens dos produtos, indexadas pelo hash do conteúdo
+
+    As imagens são baixadas em paralelo por uma sessão HTTP com pool de conexões e
+    salvas somente nas versões reduzidas de `SIZES`, em `<pasta>/<hash[:2]>/`.
+    O índice `index.jsonl` associa cada url ao hash, de modo que a mesma imagem
+    publicada em vários anúncios ou marketplaces é guardada uma única vez. O índice
+    é gravado com a trava do arquivo e as inclusões de outros processos são relidas.
+    """
+
+    folder: Path
+    max_workers: int = 8
+    timeout: float = 10.0
+    urls: dict = field(default_factory=dict, repr=False)
+    pending: dict = field(default_factory=dict, repr=False)
+    failed: set = field(default_factory=set, repr=False)
+    clusters: ImageClusters = field(default_factory=ImageClusters, repr=False)
+    # Incrementada a cada imagem incluída, indica que as miniaturas e grupos mudaram
+    version: int = field(default=0, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.folder = Path(self.folder)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers,
+            pool_maxsize=self.max_workers,
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 503]),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.tail = JsonlTail(self.index_file)
+        self.load()
+
+    @property
+    def index_file(self) -> Path:
+        return self.folder / INDEX
+
+    def load(self) -> None:
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Inclui as imagens baixadas por outros processos desde a última leitura"""
+        with self.lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        entries, replaced = self.tail.read()
+        if replaced:
+            self.urls, self.clusters = {}, ImageClusters()
+        if replaced or entries:
+            self.version += 1
+        for entry in entries:
+            self.urls[entry["url"]] = entry["hash"]
+            if value := entry.get("phash"):
+                self.clusters.add(entry["hash"], int(value, 16))
+
+    def image_file(self, digest: str, size: str = "thumb") -> Path:
+        return self.folder / digest[:2] / f"{digest}_{size}.{FORMAT}"
+
+    def get(self, url: str, size: str = "thumb") -> Path | None:
+        if (digest := self.urls.get(url)) is None:
+            return None
+        return file if (file := self.image_file(digest, size)).is_file() else None
+
+    def data_uri(self, url: str) -> str | None:
+        """Miniatura embutida na tabela, sem requisições ao site do marketplace"""
+        if (file := self.get(url)) is None:
+            return None
+        encoded = base64.b64encode(file.read_bytes()).decode()
+        return f"data:image/{FORMAT};base64,{encoded}"
+
+    def download(self, url: str) -> str:
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        digest = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+        if not self.image_file(digest, "full").is_file():
+            self.image_file(digest).parent.mkdir(parents=True, exist_ok=True)
+            for size, width in SIZES.items():
+                self.image_file(digest, size).write_bytes(
+                    resized(response.content, width)
+                )
+        value = phash(response.content)
+        entry = {"url": url, "hash": digest, "phash": f"{value:016x}"}
+        with self.lock, file_lock(self.index_file):
+            self._refresh()
+            self.tail.append([entry])
+            self.urls[url] = digest
+            self.clusters.add(digest, value)
+            self.pending.pop(url, None)
+            self.version += 1
+        return digest
+
+    def cluster(self, url: str) -> str | None:
+        """Grupo de imagens quase idênticas, em qualquer anúncio ou marketplace"""
+        if (digest := self.urls.get(url)) is None:
+            return None
+        with self.lock:
+            return self.clusters.cluster(digest)
+
+    def _download(self, url: str) -> str | None:
+        try:
+            return self.download(url)
+        except Exception as e:
+            with self.lock:
+                self.pending.pop(url, None)
+                # Não é tentado novamente nas próximas exibições da tabela
+                self.failed.add(url)
+            print(f"Erro ao baixar a imagem {url}: {e}")
+            return None
+
+    def prefetch(self, urls) -> list[Future]:
+        """Agenda o download das imagens ainda não armazenadas, sem aguardar"""
+        futures = []
+        with self.lock:
+            for url in dict.fromkeys(urls):
+                if not url or any(
+                    url in c for c in (self.urls, self.pending, self.failed)
+                ):
+                    continue
+                self.pending[url] = future = self.executor.submit(self._download, url)
+                futures.append(future)
+        return futures
+
+
+CACHES: dict[str, ImageCache] = {}
+LOCK = threading.Lock()
+
+
+def get_images(folder: Path) -> ImageCache:
+    with LOCK:
+        if (cache := CACHES.get(str(folder))) is None:
+            cache = CACHES[str(folder)] = ImageCache(folder)
+            return cache
+    cache.refresh()
+    return cache
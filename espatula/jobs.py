@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from .metrics import REGISTRY
+
+# Situação dos jobs
+NA_FILA = "na fila"
+EXECUTANDO = "em execução"
+CONCLUIDO = "concluído"
+ERRO = "erro"
+
+
+@dataclass
+class JobSpec:
+    """Parâmetros de uma raspagem, enviados ao processo de trabalho"""
+
+    marketplace: str
+    scraper: type
+    keyword: str
+    options: dict = field(default_factory=dict)
+    search: bool = False
+    max_search: int = 10
+    max_pages: int = 50
+    shuffle: bool = True
+    screenshot: bool = True
+
+
+@dataclass
+class Job:
+    id: str
+    spec: JobSpec
+    status: str = NA_FILA
+    stage: str | None = None
+    step: int = 0
+    total: int = 0
+    message: str | None = None
+    submitted: datetime = field(default_factory=datetime.now)
+    finished: datetime | None = None
+    results: list = field(default_factory=list, repr=False)
+    future: Future | None = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in (CONCLUIDO, ERRO)
+
+    @property
+    def progress(self) -> float:
+        return min(self.step / self.total, 1.0) if self.total else 0.0
+
+    def take_results(self) -> list[dict]:
+        """Anúncios recebidos desde a última chamada"""
+        results, self.results = self.results, []
+        return results
+
+
+def run_job(job_id: str, spec: JobSpec, progress) -> None:
+    """Executada no processo de trabalho, envia o andamento pela fila `progress`"""
+
+    def send(kind: str, **data):
+        # As métricas do processo de trabalho são agregadas às do app
+        metrics = {"pid": os.getpid(), "metrics": REGISTRY.snapshot()}
+        progress.put({"job": job_id, "kind": kind, **metrics, **data})
+
+    try:
+        scraper = spec.scraper(**spec.options)
+        if spec.search:
+            for step, _ in enumerate(
+                scraper.search(keyword=spec.keyword, max_pages=spec.max_search), 1
+            ):
+                send("progress", stage="busca", step=step, total=spec.max_search)
+        if scraper.get_links(spec.keyword):
+            for step, result in enumerate(
+                scraper.inspect_pages(
+                    keyword=spec.keyword,
+                    screenshot=spec.screenshot,
+                    sample=spec.max_pages,
+                    shuffle=spec.shuffle,
+                ),
+                1,
+            ):
+                send(
+                    "result",
+                    stage="anúncios",
+                    step=step,
+                    total=spec.max_pages,
+                    data=result,
+                )
+        send("done")
+    except Exception as e:
+        send("error", message=f"{type(e).__name__}: {e}")
+
+
+class JobManager:
+    """Executa as raspagens em processos separados do script do Streamlit
+
+    Cada job recebe um identificador e reporta o andamento por uma fila compartilhada,
+    consumida em `poll`. Até `max_workers` jobs rodam simultaneamente, os demais
+    aguardam na fila. Uma única instância atende todas as sessões do app.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        # spawn: o navegador não se dá bem com processos criados por fork
+        context = multiprocessing.get_context("spawn")
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        self.manager = context.Manager()
+        self.queue = self.manager.Queue()
+        self.jobs: dict[str, Job] = {}
+        self.lock = threading.Lock()
+
+    def find(self, marketplace: str, keyword: str) -> Job | None:
+        """Job ativo para o marketplace e a palavra-chave, ex.: após recarregar a página"""
+        for job in self.jobs.values():
+            if (
+                not job.done
+                and job.spec.marketplace == marketplace
+                and job.spec.keyword == keyword
+            ):
+                return job
+        return None
+
+    def submit(self, spec: JobSpec) -> str:
+        with self.lock:
+            # Dois jobs na mesma palavra-chave sobrescreveriam os mesmos arquivos
+            if job := self.find(spec.marketplace, spec.keyword):
+                return job.id
+            job = Job(id=uuid.uuid4().hex[:8], spec=spec)
+            job.future = self.executor.submit(run_job, job.id, spec, self.queue)
+            self.jobs[job.id] = job
+        return job.id
+
+    def get(self, job_id: str | None) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def poll(self) -> list[Job]:
+        """Consome as mensagens pendentes e atualiza a situação dos jobs"""
+        with self.lock:
+            while True:
+                try:
+                    message = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if "metrics" in message:
+                    REGISTRY.merge(message["pid"], message["metrics"])
+                if (job := self.jobs.get(message["job"])) is None:
+                    continue
+                match message["kind"]:
+                    case "progress" | "result":
+                        job.status = EXECUTANDO
+                        job.stage = message["stage"]
+                        job.step = message["step"]
+                        job.total = message["total"]
+                        if message["kind"] == "result":
+                            job.results.append(message["data"])
+                    case "done":
+                        job.status = CONCLUIDO
+                        job.finished = datetime.now()
+                    case "error":
+                        job.status = ERRO
+                        job.message = message["message"]
+                        job.finished = datetime.now()
+            for job in self.jobs.values():
+                if job.done or job.future is None:
+                    continue
+                if job.future.running() and job.status == NA_FILA:
+                    job.status = EXECUTANDO
+                # O processo terminou sem reportar, ex.: foi encerrado pelo sistema
+                if job.future.done() and (error := job.future.exception()):
+                    job.status = ERRO
+                    job.message = f"{type(error).__name__}: {error}"
+                    job.finished = datetime.now()
+            REGISTRY.set(
+                "espatula_queue_depth",
+                sum(job.status == NA_FILA for job in self.jobs.values()),
+                marketplace="jobs",
+            )
+            return list(self.jobs.values())
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
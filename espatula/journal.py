@@ -0,0 +1,119 @@
+import atexit
+import json
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+import pandas as pd
+from fastcore.xtras import Path
+
+from .base import TIMEZONE
+
+DEBOUNCE = 30.0
+
+
+@dataclass
+class EditJournal:
+    """Registro das edições da tabela processada, aplicadas na memória imediatamente
+
+    Cada edição é anexada ao arquivo `.jsonl` (chave da linha, coluna, valor anterior,
+    valor novo, horário e destino da exportação). Após `debounce` segundos sem novas
+    edições, ou ao encerrar o app, o registro é consolidado na tabela parquet,
+    exportado para os destinos das edições e esvaziado.
+    """
+
+    journal_file: Path
+    table_file: Path
+    export: Callable[[pd.DataFrame, str], None] | None = None
+    debounce: float = DEBOUNCE
+    key: str = "url"
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+    timer: threading.Timer | None = field(default=None, repr=False)
+
+    def record(self, key, column: str, old, new, target: str | None = None) -> None:
+        # O destino é gravado com a edição, pois cada sessão pode exportar para outra pasta
+        entry = {
+            "key": key,
+            "column": column,
+            "old": old,
+            "new": new,
+            "timestamp": datetime.now().astimezone(TIMEZONE).isoformat(),
+            "target": target,
+        }
+        with self.lock:
+            with Path(self.journal_file).open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self.schedule()
+
+    def entries(self) -> list[dict]:
+        if not Path(self.journal_file).is_file():
+            return []
+        with self.lock:
+            lines = Path(self.journal_file).read_text(encoding="utf-8").splitlines()
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Reaplica as edições pendentes, ex.: após o app ser encerrado antes da consolidação"""
+        if not (entries := self.entries()):
+            return df
+        # Somente a última edição de cada célula importa
+        last = {(e["key"], e["column"]): e["new"] for e in entries}
+        positions = pd.Series(df.index, index=df[self.key].to_numpy())
+        positions = positions[~positions.index.duplicated()]
+        for (key, column), value in last.items():
+            if key in positions.index and column in df.columns:
+                df.at[positions[key], column] = value
+        return df
+
+    def schedule(self) -> None:
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.debounce, self.compact)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def clear(self) -> None:
+        """Descarta o registro, quando a tabela completa acabou de ser salva"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            Path(self.journal_file).unlink(missing_ok=True)
+
+    def compact(self) -> None:
+        with self.lock:
+            self.timer = None
+            if not self.entries() or not Path(self.table_file).is_file():
+                return
+            try:
+                targets = {e["target"] for e in self.entries() if e.get("target")}
+                df = self.apply(pd.read_parquet(self.table_file))
+                df.to_parquet(self.table_file, index=False)
+                if self.export is not None:
+                    for target in sorted(targets):
+                        self.export(df, target)
+                Path(self.journal_file).unlink(missing_ok=True)
+            except Exception as e:
+                print(f"Erro ao consolidar as edições em {self.table_file}: {e}")
+
+
+JOURNALS: dict[str, EditJournal] = {}
+
+
+def get_journal(table_file: Path, **kwargs) -> EditJournal:
+    """Um registro por tabela, compartilhado entre as reexecuções e sessões do app"""
+    table_file = Path(table_file)
+    if (journal := JOURNALS.get(str(table_file))) is None:
+        journal = EditJournal(
+            table_file.with_name(f"{table_file.stem}_edits.jsonl"), table_file, **kwargs
+        )
+        JOURNALS[str(table_file)] = journal
+    return journal
+
+
+@atexit.register
+def compact_all() -> None:
+    for journal in JOURNALS.values():
+        journal.compact()
@@ -79,7 +79,7 @@ class MagaluScraper(BaseScraper):
         return variant_data
 
     def extract_item_data(self, driver):
-        soup = driver.get_beautiful_soup()
+        soup = self.get_soup(driver)
 
         def get_selector(selector):
             self.highlight_element(driver, selector)
@@ -0,0 +1,212 @@
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+BATCH_SIZE = 4096
+# Blocagem: tamanho do prefixo, tamanho mínimo do token e nº máximo de registros por bloco
+PREFIX_SIZE = 4
+MIN_TOKEN = 3
+MAX_BLOCK = 500
+
+
+def normalize_text(text) -> str:
+    """Minúsculas, sem acentos e somente caracteres alfanuméricos separados por espaço"""
+    try:
+        if text is None or text != text:  # None ou NaN
+            return ""
+    except TypeError:  # pd.NA
+        return ""
+    text = str(text)
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return NON_ALNUM.sub(" ", text).strip()
+
+
+def _encode(strings: list[str], width: int, pad: int) -> np.ndarray:
+    codes = np.full((len(strings), width), pad, dtype=np.int32)
+    for i, s in enumerate(strings):
+        codes[i, : len(s)] = [ord(c) for c in s]
+    return codes
+
+
+def _substring_distance(short: list[str], long: list[str]) -> np.ndarray:
+    """Menor distância de Levenshtein entre cada string curta e qualquer trecho da longa
+
+    A programação dinâmica é vetorizada entre os pares e ao longo da string longa:
+    a dependência da inserção é resolvida com um mínimo acumulado.
+    """
+    n = len(short)
+    len_s = np.fromiter((len(s) for s in short), dtype=np.int32, count=n)
+    len_l = np.fromiter((len(s) for s in long), dtype=np.int32, count=n)
+    m, k = int(len_s.max()), int(len_l.max())
+    S = _encode(short, m, -1)
+    L = _encode(long, k, -2)
+    offsets = np.arange(k + 1, dtype=np.int32)
+    outside = offsets[None, :] > len_l[:, None]
+    best = np.zeros(n, dtype=np.int32)
+    prev = np.zeros((n, k + 1), dtype=np.int32)  # Início livre na string longa
+    for i in range(1, m + 1):
+        cur = np.empty_like(prev)
+        cur[:, 0] = i
+        cur[:, 1:] = np.minimum(
+            prev[:, :-1] + (S[:, i - 1, None] != L),  # substituição
+            prev[:, 1:] + 1,  # remoção
+        )
+        # inserção: cur[j] = min_t(cur[t] + j - t)
+        cur = np.minimum.accumulate(cur - offsets, axis=1) + offsets
+        if (done := len_s == i).any():
+            # Fim livre na string longa, restrito ao seu comprimento real
+            best[done] = np.where(outside[done], i, cur[done]).min(axis=1)
+        prev = cur
+    return best
+
+
+def partial_ratios(
+    left: Iterable, right: Iterable, normalized: bool = False
+) -> np.ndarray:
+    """Percentual de sobreposição (0 a 100) entre cada par de strings
+
+    100 indica que a menor string do par está contida na maior.
+    """
+    if not normalized:
+        left = [normalize_text(s) for s in left]
+        right = [normalize_text(s) for s in right]
+    left, right = list(left), list(right)
+    # Pares repetidos (ex.: o mesmo modelo em vários anúncios) são calculados uma única vez
+    unique = {}
+    positions = np.fromiter(
+        (
+            unique.setdefault(tuple(sorted((a, b), key=len)), len(unique))
+            if a and b
+            else -1
+            for a, b in zip(left, right)
+        ),
+        dtype=np.int64,
+        count=len(left),
+    )
+    pairs = sorted(
+        ((i, short, long) for (short, long), i in unique.items()),
+        # Pares de tamanhos próximos no mesmo lote reduzem o preenchimento das matrizes
+        key=lambda p: (len(p[1]), len(p[2])),
+    )
+    unique_scores = np.zeros(len(unique) + 1, dtype=np.int8)  # -1 -> score 0
+    for start in range(0, len(pairs), BATCH_SIZE):
+        batch = pairs[start : start + BATCH_SIZE]
+        index, short, long = map(list, zip(*batch))
+        lengths = np.fromiter((len(s) for s in short), dtype=np.float64)
+        distance = _substring_distance(short, long)
+        ratio = np.rint(100 * (1 - distance / lengths))
+        unique_scores[index] = np.clip(ratio, 0, 100).astype(np.int8)
+    return unique_scores[positions]
+
+
+def model_prefixes(text: str, size: int = PREFIX_SIZE) -> set[str]:
+    """Prefixos dos tokens com cara de código de modelo (contêm dígitos)"""
+    return {
+        token[:size]
+        for token in text.split()
+        if len(token) >= MIN_TOKEN and any(c.isdigit() for c in token)
+    }
+
+
+def manufacturer_key(text: str) -> str:
+    """Primeiro token do fabricante: 'Samsung Eletrônica da Amazônia' -> 'samsung'"""
+    return text.split(" ", 1)[0] if text else ""
+
+
+@dataclass
+class CatalogMatcher:
+    """Compara anúncios com o catálogo do SCH somente dentro de blocos
+
+    Os blocos agrupam os registros do catálogo por fabricante e prefixo dos tokens do
+    modelo, de modo que cada anúncio é comparado apenas com candidatos plausíveis.
+    """
+
+    catalog: pd.DataFrame
+    max_block: int = MAX_BLOCK
+    blocks: dict = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.certificados = self.catalog.index.to_numpy()
+        self.modelos = [normalize_text(s) for s in self.catalog["modelo"]]
+        self.nomes = [normalize_text(s) for s in self.catalog["nome"]]
+        if self.blocks is None:
+            self.blocks = self.build_blocks()
+
+    def build_blocks(self) -> dict:
+        blocks = defaultdict(list)
+        fabricantes = (normalize_text(s) for s in self.catalog["fabricante"])
+        for position, (fabricante, modelo) in enumerate(zip(fabricantes, self.modelos)):
+            fabricante = manufacturer_key(fabricante)
+            for prefix in model_prefixes(modelo):
+                blocks[(fabricante, prefix)].append(position)
+                blocks[("", prefix)].append(position)
+        # Blocos muito grandes não discriminam candidatos e são descartados
+        return {
+            key: np.array(positions, dtype=np.int64)
+            for key, positions in blocks.items()
+            if len(positions) <= self.max_block
+        }
+
+    def candidates(self, fabricante: str, modelo: str, nome: str) -> np.ndarray:
+        prefixes = model_prefixes(modelo) or model_prefixes(nome)
+        fabricante = manufacturer_key(fabricante)
+        found = [
+            self.blocks[k] for p in prefixes if (k := (fabricante, p)) in self.blocks
+        ]
+        if not found:
+            found = [self.blocks[k] for p in prefixes if (k := ("", p)) in self.blocks]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def match(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Melhor candidato do catálogo para cada anúncio, com os respectivos scores"""
+        fabricantes = [normalize_text(s) for s in df["fabricante"]]
+        modelos = [normalize_text(s) for s in df["modelo"]]
+        nomes = [normalize_text(s) for s in df["nome"]]
+        rows, cols = [], []
+        for row, (fabricante, modelo, nome) in enumerate(
+            zip(fabricantes, modelos, nomes)
+        ):
+            candidates = self.candidates(fabricante, modelo, nome)
+            rows.append(np.full(len(candidates), row, dtype=np.int64))
+            cols.append(candidates)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+
+        modelo_score = partial_ratios(
+            [modelos[r] or nomes[r] for r in rows],
+            [self.modelos[c] for c in cols],
+            normalized=True,
+        )
+        nome_score = partial_ratios(
+            [nomes[r] for r in rows], [self.nomes[c] for c in cols], normalized=True
+        )
+        pairs = pd.DataFrame(
+            {
+                "row": rows,
+                "col": cols,
+                "modelo_score": modelo_score,
+                "nome_score": nome_score,
+            }
+        ).sort_values(["row", "modelo_score", "nome_score"], ascending=False)
+        best = pairs.drop_duplicates("row").set_index("row")
+
+        result = pd.DataFrame(index=df.index)
+        positions = best.reindex(range(len(df)))
+        found = positions["col"].notna().to_numpy()
+        certificados = np.full(len(df), pd.NA, dtype=object)
+        certificados[found] = self.certificados[positions["col"][found].astype("int64")]
+        result["sugestao_sch"] = pd.Series(
+            certificados, index=df.index, dtype="string"
+        ).str.zfill(12)
+        result["sugestao_score"] = positions["modelo_score"].to_numpy()
+        result["sugestao_score"] = result["sugestao_score"].astype("Int8")
+        return result
@@ -148,8 +148,8 @@ class MercadoLivreScraper(BaseScraper):
 
     def process_url(self, driver, url: str) -> dict:
         self.dismiss_dialogs(driver)
-        driver.uc_open_with_reconnect(url, reconnect_time=self.reconnect)
-        if result_page := self.extract_item_data(driver):
+        self.open_url(driver, url)
+        if result_page := self.extract_page(driver):
             if not result_page.get("categoria"):
                 if not self.headless:
                     driver.post_message("Anúncio com dados incompletos - 🚮")
@@ -157,7 +157,7 @@ class MercadoLivreScraper(BaseScraper):
         return result_page
 
     def extract_item_data(self, driver):
-        soup = driver.get_beautiful_soup()
+        soup = self.get_soup(driver)
 
         def get_selector(selector):
             self.highlight_element(driver, selector)
@@ -217,13 +217,7 @@ class MercadoLivreScraper(BaseScraper):
             if vendedor := vendedor_element.find_next_sibling("span"):
                 vendedor = vendedor.get_text().strip()
 
-        try:
-            driver.click_visible_elements(
-                "[data-testid=action-collapsable-target]",
-                timeout=self.timeout,
-            )
-        except Exception:
-            pass
+        self.click_visible(driver, "[data-testid=action-collapsable-target]")
 
         características, marca, modelo, ean, certificado = None, None, None, None, None
         if características_element := get_selector(
@@ -280,14 +274,12 @@ class MercadoLivreScraper(BaseScraper):
         driver.assert_element('nav[aria-label="Paginação"]')
 
     def input_search_params(self, driver, keyword):
-        driver.uc_open_with_reconnect(self.url, reconnect_time=self.reconnect)
+        self.open_url(driver, self.url)
         self.dismiss_dialogs(driver)
         for attempt in range(self.retries):
             try:
                 if department := CATEGORIES.get(keyword):
-                    driver.uc_open_with_reconnect(
-                        department, reconnect_time=self.reconnect
-                    )
+                    self.open_url(driver, department)
                 self.highlight_element(driver, self.input_field)
                 driver.type(self.input_field, keyword, timeout=self.timeout)
                 self.uc_click(driver, 'button[class="nav-search-btn"]')
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Porta do endpoint de métricas, desativado quando ausente
+METRICS_PORT = os.environ.get("METRICS_PORT")
+# Janela da taxa de anúncios por minuto, em segundos
+RATE_WINDOW = 300
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+METRICS = {
+    "espatula_pages_total": (
+        "counter",
+        "Anúncios processados por resultado (ok, vazio, erro)",
+    ),
+    "espatula_pages_per_minute": (
+        "gauge",
+        f"Anúncios processados com sucesso por minuto, nos últimos {RATE_WINDOW}s",
+    ),
+    "espatula_captcha_total": ("counter", "Captchas encontrados"),
+    "espatula_browser_restarts_total": (
+        "counter",
+        "Navegadores abertos novamente após a falha do anterior",
+    ),
+    "espatula_queue_depth": (
+        "gauge",
+        "Links ainda não inspecionados, ou jobs na fila no app",
+    ),
+    "espatula_screenshot_bytes_total": (
+        "counter",
+        "Bytes dos screenshots gravados, após a compressão",
+    ),
+    "espatula_stage_seconds": ("histogram", "Duração de cada etapa do scraping"),
+}
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(name: str, labels: tuple, value: float, **extra) -> str:
+    labels = labels + tuple(extra.items())
+    text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    value = f"{value:g}" if isinstance(value, float) else value
+    return f"{name}{{{text}}} {value}" if text else f"{name} {value}"
+
+
+@dataclass
+class Registry:
+    """Métricas do processo no formato texto do Prometheus, sem dependências
+
+    Os processos de trabalho dos jobs do app enviam `snapshot()` junto com o
+    andamento, agregado em `merge` às métricas do processo que serve o endpoint.
+    """
+
+    counters: dict = field(default_factory=lambda: defaultdict(float))
+    gauges: dict = field(default_factory=dict)
+    histograms: dict = field(default_factory=dict)
+    events: dict = field(default_factory=lambda: defaultdict(deque), repr=False)
+    remote: dict = field(default_factory=dict, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        with self.lock:
+            self.counters[(name, _labels(labels))] += value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self.lock:
+            # Contagem por faixa, incluindo +Inf, seguida da soma das observações
+            if (histogram := self.histograms.get(key)) is None:
+                histogram = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+            histogram[bisect_left(BUCKETS, value)] += 1
+            histogram[-1] += value
+
+    def page(self, marketplace: str, keyword: str | None, result: str) -> None:
+        self.inc(
+            "espatula_pages_total",
+            marketplace=marketplace,
+            keyword=keyword,
+            result=result,
+        )
+        if result == "ok":
+            with self.lock:
+                self.events[
+                    _labels(dict(marketplace=marketplace, keyword=keyword))
+                ].append(time.monotonic())
+
+    def rates(self) -> dict:
+        now = time.monotonic()
+        rates = {}
+        with self.lock:
+            for labels, events in self.events.items():
+                while events and now - events[0] > RATE_WINDOW:
+                    events.popleft()
+                rates[("espatula_pages_per_minute", labels)] = (
+                    len(events) * 60 / RATE_WINDOW
+                )
+        return rates
+
+    def snapshot(self) -> dict:
+        gauges = self.rates()
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": self.gauges | gauges,
+                "histograms": {k: list(v) for k, v in self.histograms.items()},
+            }
+
+    def merge(self, source, snapshot: dict) -> None:
+        """Substitui as métricas recebidas de `source`, ex.: o pid de um processo"""
+        with self.lock:
+            self.remote[source] = (time.monotonic(), snapshot)
+
+    def collect(self) -> dict:
+        """Métricas locais somadas às dos demais processos
+
+        Os medidores de um processo sem atualização há mais de `RATE_WINDOW` segundos,
+        ex.: já encerrado, são descartados, os contadores continuam somados.
+        """
+        total = self.snapshot()
+        now = time.monotonic()
+        with self.lock:
+            remotes = list(self.remote.values())
+        for updated, snapshot in remotes:
+            stale = now - updated > RATE_WINDOW
+            for kind in ("counters",) if stale else ("counters", "gauges"):
+                for key, value in snapshot[kind].items():
+                    total[kind][key] = total[kind].get(key, 0) + value
+            for key, values in snapshot["histograms"].items():
+                current = total["histograms"].get(key, [0] * len(values))
+                total["histograms"][key] = [a + b for a, b in zip(current, values)]
+        return total
+
+    def render(self) -> str:
+        metrics = self.collect()
+        samples = defaultdict(list)
+        for kind in ("counters", "gauges"):
+            for (name, labels), value in sorted(metrics[kind].items()):
+                samples[name].append(_format(name, labels, value))
+        for (name, labels), values in sorted(metrics["histograms"].items()):
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, "+Inf"), values[:-1]):
+                cumulative += count
+                samples[name].append(
+                    _format(f"{name}_bucket", labels, cumulative, le=bound)
+                )
+            samples[name].append(_format(f"{name}_sum", labels, float(values[-1])))
+            samples[name].append(_format(f"{name}_count", labels, cumulative))
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            if name in samples:
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+                lines += samples[name]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+SERVERS: dict[int, ThreadingHTTPServer] = {}
+LOCK = threading.Lock()
+
+
+def serve(port: int | str | None = METRICS_PORT) -> ThreadingHTTPServer | None:
+    """Inicia o endpoint `/metrics` numa thread, uma única vez por porta"""
+    if not port:
+        return None
+    port = int(port)
+    with LOCK:
+        if (server := SERVERS.get(port)) is None:
+            try:
+                server = ThreadingHTTPServer(("", port), MetricsHandler)
+            except OSError as e:
+                print(f"Erro ao iniciar o endpoint de métricas na porta {port}: {e}")
+                return None
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            SERVERS[port] = server
+    return server
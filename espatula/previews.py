@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+
+from fastcore.xtras import Path
+
+THUMBNAIL_WIDTH = 320
+PAGE_WIDTH = 900
+FORMAT = "webp"
+
+
+def resize(image_bytes: bytes, width: int) -> bytes:
+    from PIL import Image
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)))
+        output = BytesIO()
+        image.convert("RGB").save(output, FORMAT, quality=75)
+        return output.getvalue()
+
+
+def render_pages(pdf_bytes: bytes, width: int = PAGE_WIDTH) -> list[bytes]:
+    """Imagens das páginas do pdf, requer o pymupdf, opcional"""
+    try:
+        import pymupdf
+    except ImportError:
+        return []
+    pages = []
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as document:
+        for page in document:
+            zoom = width / page.rect.width
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom))
+            pages.append(resize(pixmap.tobytes("png"), width))
+    return pages
+
+
+@dataclass
+class PreviewService:
+    """Miniaturas e imagens das páginas dos screenshots, geradas em segundo plano
+
+    A miniatura é feita a partir da captura da tela visível no momento em que o pdf é
+    salvo, as imagens de cada página a partir do próprio pdf, quando o pymupdf está
+    instalado. Os arquivos ficam em `<pasta do marketplace>/previews`, com o nome do pdf.
+    """
+
+    folder: Path
+    thumbnail_width: int = THUMBNAIL_WIDTH
+    page_width: int = PAGE_WIDTH
+    max_workers: int = 2
+    executor: ThreadPoolExecutor = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.folder = Path(self.folder)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def thumbnail_file(self, arquivo: str) -> Path:
+        return self.folder / f"{Path(arquivo).stem}_thumb.{FORMAT}"
+
+    def page_file(self, arquivo: str, page: int) -> Path:
+        return self.folder / f"{Path(arquivo).stem}_p{page:03d}.{FORMAT}"
+
+    def thumbnail(self, arquivo: str) -> Path | None:
+        return file if (file := self.thumbnail_file(arquivo)).is_file() else None
+
+    def pages(self, arquivo: str) -> list[Path]:
+        return sorted(self.folder.glob(f"{Path(arquivo).stem}_p*.{FORMAT}"))
+
+    def generate(self, arquivo: str, pdf_bytes: bytes, png: bytes | None = None):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        pages = render_pages(pdf_bytes, self.page_width)
+        for i, page in enumerate(pages):
+            self.page_file(arquivo, i).write_bytes(page)
+        if source := png or (pages[0] if pages else None):
+            self.thumbnail_file(arquivo).write_bytes(
+                resize(source, self.thumbnail_width)
+            )
+
+    def submit(
+        self, arquivo: str, pdf_bytes: bytes, png: bytes | None = None
+    ) -> Future:
+        def report(future: Future):
+            if error := future.exception():
+                print(f"Erro ao gerar a pré-visualização de {arquivo}: {error}")
+
+        future = self.executor.submit(self.generate, arquivo, pdf_bytes, png)
+        future.add_done_callback(report)
+        return future
+
+    def delete(self, arquivo: str) -> None:
+        for file in [self.thumbnail_file(arquivo), *self.pages(arquivo)]:
+            file.unlink(missing_ok=True)
+
+
+SERVICES: dict[str, PreviewService] = {}
+LOCK = threading.Lock()
+
+
+def get_previews(folder: Path) -> PreviewService:
+    with LOCK:
+        if (service := SERVICES.get(str(folder))) is None:
+            service = SERVICES[str(folder)] = PreviewService(folder)
+    return service
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import pickle
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from fastcore.xtras import Path
+
+from .matching import CatalogMatcher, partial_ratios
+from .sch import SCHIndex
+
+# Colunas retornadas pelo processamento, na mesma ordem do serviço remoto
+COLUNAS_SAIDA = [
+    "url",
+    "imagem",
+    "subcategoria",
+    "nome",
+    "fabricante",
+    "modelo",
+    "certificado",
+    "ean_gtin",
+    "nome_sch",
+    "tipo_sch",
+    "fabricante_sch",
+    "modelo_sch",
+    "modelo_score",
+    "nome_score",
+    "sugestao_sch",
+    "sugestao_score",
+    "probabilidade",
+    "passível?",
+    "screenshot",
+    "data",
+]
+# Campos dos anúncios utilizados no processamento
+COLUNAS_ENTRADA = [
+    "url",
+    "imagem",
+    "subcategoria",
+    "nome",
+    "fabricante",
+    "modelo",
+    "certificado",
+    "ean_gtin",
+    "screenshot",
+    "data",
+]
+
+# Modelo serializado do classificador, sem ele o processamento local não é habilitado
+CLASSIFIER = os.environ.get("CLASSIFIER")
+
+
+# Campos dos anúncios que influenciam o resultado do processamento
+CAMPOS_HASH = (
+    "url",
+    "nome",
+    "marca",
+    "modelo",
+    "certificado",
+    "ean_gtin",
+    "categoria",
+    "imagem",
+    "imagens",
+    "screenshot",
+    "data",
+)
+
+
+def record_hash(page: dict, salt: str = "") -> str:
+    """Hash do anúncio normalizado, usado como chave do cache de processamento"""
+    record = {
+        k: v.strip() if isinstance(v := page.get(k), str) else v for k in CAMPOS_HASH
+    }
+    payload = json.dumps(record, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(f"{salt}{payload}".encode(), digest_size=16).hexdigest()
+
+
+def pages_to_frame(pages: dict) -> pd.DataFrame:
+    """Seleciona os campos dos anúncios utilizados no processamento"""
+    records = []
+    for page in pages.values():
+        imagem = page.get("imagem")
+        if imagens := page.get("imagens"):
+            imagem = imagens[0]
+        categorias = [c for c in (page.get("categoria") or "").split("|") if c.strip()]
+        records.append(
+            {
+                "url": page.get("url"),
+                "imagem": imagem,
+                "subcategoria": categorias[-1].strip() if categorias else None,
+                "nome": page.get("nome"),
+                "fabricante": page.get("marca"),
+                "modelo": page.get("modelo"),
+                "certificado": page.get("certificado"),
+                "ean_gtin": page.get("ean_gtin"),
+                "screenshot": page.get("screenshot"),
+                "data": page.get("data"),
+            }
+        )
+    # As colunas são fixas para que um lote vazio gere um DataFrame com o mesmo esquema
+    df = pd.DataFrame.from_records(records, columns=COLUNAS_ENTRADA)
+    return df.astype("string")
+
+
+def has_classifier(model_file: Path | None = CLASSIFIER) -> bool:
+    return bool(model_file) and Path(model_file).is_file()
+
+
+@dataclass
+class Classifier:
+    """Classificador binário de homologação compulsória, executado em lotes
+
+    O modelo é um objeto serializado com pickle (ex.: pipeline do scikit-learn) que
+    implementa `predict_proba` sobre uma lista de textos. Não há classificação sem o
+    modelo: `passível?` não é inventado a partir de palavras-chave.
+    """
+
+    model_file: Path | None = CLASSIFIER
+    batch_size: int = 512
+    model: object = field(default=None, repr=False)
+    identity: str = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.model is None and has_classifier(self.model_file):
+            model = Path(self.model_file).read_bytes()
+            self.model = pickle.loads(model)
+            self.identity = hashlib.blake2b(model, digest_size=8).hexdigest()
+        if self.identity is None and self.model is not None:
+            # Modelos passados diretamente não possuem arquivo para o hash
+            self.identity = type(self.model).__name__
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    @staticmethod
+    def texts(df: pd.DataFrame) -> list[str]:
+        return (
+            df["nome"].fillna("") + " | " + df["subcategoria"].fillna("")
+        ).to_list()
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        if self.model is None:
+            raise RuntimeError(
+                "Classificador indisponível: defina CLASSIFIER com o modelo serializado"
+            )
+        texts = self.texts(df)
+        return np.concatenate(
+            [
+                self.model.predict_proba(texts[i : i + self.batch_size])[:, 1]
+                for i in range(0, len(texts), self.batch_size)
+            ]
+            or [np.empty(0)]
+        )
+
+
+@dataclass
+class LocalEngine:
+    """Substitui o serviço remoto `/process_to_table`, gerando as mesmas colunas localmente"""
+
+    sch: SCHIndex = field(default_factory=SCHIndex)
+    classifier: Classifier = field(default_factory=Classifier)
+    threshold: float = 0.5
+    matcher: CatalogMatcher = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.sch.refresh()
+        if self.matcher is None:
+            self.matcher = CatalogMatcher(self.sch.table)
+
+    @property
+    def available(self) -> bool:
+        """O processamento local exige o classificador treinado"""
+        return self.classifier.available
+
+    def refresh(self) -> bool:
+        """Incorpora um novo arquivo de dados abertos do SCH, caso exista"""
+        if refreshed := self.sch.refresh():
+            self.matcher = CatalogMatcher(self.sch.table)
+        return refreshed
+
+    @property
+    def signature(self) -> str:
+        """Versão do SCH e do classificador, usada como salt do cache de processamento"""
+        return f"local:{self.sch.signature}:{self.classifier.identity}"
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        df["modelo_score"] = partial_ratios(df["modelo"], df["modelo_sch"])
+        df["nome_score"] = partial_ratios(df["nome"], df["nome_sch"])
+        # Anúncios sem certificado válido recebem o candidato mais provável do catálogo
+        return df.join(self.matcher.match(df.loc[df["tipo_sch"].isna()]))
+
+    def process(self, pages: dict) -> pd.DataFrame:
+        df = pages_to_frame(pages)
+        df = self.sch.enrich(df)
+        df = self.score(df)
+        df["probabilidade"] = self.classifier.predict(df)
+        df["passível?"] = df["probabilidade"] >= self.threshold
+        return df[COLUNAS_SAIDA].astype("string")
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from gradio_client import Client
+from gradio_client.exceptions import AppError
+from huggingface_hub import HfApi
+
+SPACE = os.environ.get("ECOMPROC", "ronaldokun/ecomproc")
+# Intervalo de consulta do estado dos jobs enviados, em segundos
+POLL_INTERVAL = 0.05
+# Validade da revisão consultada do Space, em segundos
+REVISION_TTL = 300
+
+
+class CircuitOpenError(RuntimeError):
+    """O serviço remoto falhou repetidamente e as chamadas estão suspensas"""
+
+
+class PoolTimeoutError(TimeoutError):
+    """Nenhum cliente do pool foi liberado dentro do prazo da chamada"""
+
+
+@dataclass
+class CircuitBreaker:
+    """Suspende as chamadas após falhas consecutivas e libera uma tentativa após `reset_after`"""
+
+    failure_threshold: int = 5
+    reset_after: float = 60.0
+    failures: int = 0
+    opened_at: float | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def check(self):
+        with self.lock:
+            match self.state:
+                case "open":
+                    raise CircuitOpenError(
+                        f"Serviço remoto indisponível após {self.failures} falhas consecutivas"
+                    )
+                case "half-open":
+                    # Somente uma chamada de teste passa, as demais aguardam o resultado
+                    self.opened_at = time.monotonic()
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+@dataclass
+class RemoteClient:
+    """Cliente do serviço de processamento compartilhado entre as sessões do app
+
+    Mantém um pool de `gradio_client.Client`, envia os jobs com `submit` e aplica
+    prazo por chamada, novas tentativas com backoff exponencial e circuit breaker.
+    """
+
+    space: str = SPACE
+    pool_size: int = 4
+    retries: int = 3
+    backoff: float = 1.0
+    timeout: float = 300.0
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+
+    def __post_init__(self):
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._revision = None
+
+    def _new_client(self) -> Client:
+        return Client(self.space, verbose=False)
+
+    def _space_revision(self) -> str:
+        return HfApi().space_info(self.space).sha
+
+    def revision(self) -> str | None:
+        """Commit atual do Space, que identifica a versão do modelo remoto"""
+        with self._lock:
+            if self._revision and time.monotonic() - self._revision[0] < REVISION_TTL:
+                return self._revision[1]
+        try:
+            revision = self._space_revision()
+        except Exception as e:
+            print(f"Erro ao consultar a revisão do serviço remoto {self.space}: {e}")
+            revision = None
+        with self._lock:
+            self._revision = (time.monotonic(), revision)
+        return revision
+
+    @property
+    def signature(self) -> str:
+        """Identifica os resultados do serviço remoto no cache de processamento"""
+        return f"remote:{self.space}:{self.revision()}"
+
+    @asynccontextmanager
+    async def connection(self, timeout: float):
+        """Empresta um cliente do pool, criando-o sob demanda até `pool_size`"""
+        try:
+            client = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    client = self._new_client()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                # Aguarda fora do event loop para não bloquear as demais chamadas
+                try:
+                    client = await asyncio.to_thread(self._pool.get, timeout=timeout)
+                except queue.Empty:
+                    raise PoolTimeoutError(
+                        f"Todos os {self.pool_size} clientes ocupados por {timeout:.0f}s"
+                    ) from None
+        discard = False
+        try:
+            yield client
+        except TimeoutError:
+            # O job cancelado pode seguir em execução no cliente, que não volta ao pool
+            discard = True
+            raise
+        finally:
+            if discard:
+                with self._lock:
+                    self._created -= 1
+            else:
+                self._pool.put(client)
+
+    async def _call(self, deadline: float, *args, **kwargs):
+        remaining = deadline - time.monotonic()
+        async with self.connection(timeout=max(remaining, 0)) as client:
+            job = client.submit(*args, **kwargs)
+            # Consulta o job sem ocupar uma thread, o prazo vale mesmo com o job travado
+            while not job.done():
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    job.cancel()
+                    raise TimeoutError("Prazo da chamada ao serviço remoto esgotado")
+                await asyncio.sleep(min(POLL_INTERVAL, remaining))
+            return job.result()
+
+    async def apredict(self, *args, timeout: float | None = None, **kwargs):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        for attempt in range(self.retries):
+            self.breaker.check()
+            try:
+                result = await self._call(deadline, *args, **kwargs)
+            except AppError:
+                # Erro da aplicação remota (ex.: arquivo inválido), não adianta repetir
+                raise
+            except PoolTimeoutError:
+                # Saturação local, o serviço remoto não foi chamado e não conta como falha
+                raise
+            except Exception as e:
+                self.breaker.failure()
+                wait = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+                if attempt == self.retries - 1 or time.monotonic() + wait >= deadline:
+                    raise
+                print(
+                    f"Falha na chamada ao serviço remoto ({e}), nova tentativa em {wait:.1f}s"
+                )
+                await asyncio.sleep(wait)
+            else:
+                self.breaker.success()
+                return result
+
+    def predict(self, *args, **kwargs):
+        """Interface síncrona, compatível com `gradio_client.Client.predict`"""
+        return asyncio.run(self.apredict(*args, **kwargs))
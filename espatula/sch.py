@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+
+import pandas as pd
+from fastcore.xtras import Path
+
+# Dados abertos: https://dados.gov.br/dados/conjuntos-dados/produtos-de-telecomunicacoes-homologados-pela-anatel
+SCH_FOLDER = Path(os.environ.get("FOLDER", f"{Path(__file__).parent}/data")) / "sch"
+SCH_DUMPS = ("produtos_certificados*.csv", "produtos_certificados*.zip")
+
+# Colunas do arquivo de dados abertos -> colunas do índice
+SCH_COLUMNS = {
+    "Número de Homologação": "certificado",
+    "Nome do Fabricante": "fabricante",
+    "Modelo": "modelo",
+    "Nome Comercial": "nome",
+    "Tipo do Produto": "tipo",
+}
+
+CAMPOS = ["fabricante", "modelo", "nome", "tipo"]
+
+
+def certificado_keys(certificados) -> pd.Index:
+    """Converte os certificados para chaves inteiras, -1 quando ausentes ou inválidos"""
+    digits = pd.Series(certificados, dtype="string").str.replace(r"\D", "", regex=True)
+    keys = pd.to_numeric(digits.where(digits.str.len().between(1, 12)), errors="coerce")
+    return pd.Index(keys.fillna(-1).astype("int64"))
+
+
+def read_dump(dump_file: Path) -> pd.DataFrame:
+    """Lê o arquivo de produtos homologados e agrega os modelos de cada certificado"""
+    kwargs = dict(sep=";", dtype="string", usecols=list(SCH_COLUMNS))
+    try:
+        df = pd.read_csv(dump_file, encoding="utf-8", **kwargs)
+    except UnicodeDecodeError:
+        df = pd.read_csv(dump_file, encoding="latin-1", **kwargs)
+    df = df.rename(columns=SCH_COLUMNS)
+    df["certificado"] = certificado_keys(df["certificado"])
+    df = df.loc[df["certificado"] >= 0]
+    for column in CAMPOS:
+        df[column] = df[column].str.strip()
+    # Um certificado pode abranger vários modelos e nomes comerciais
+    df = df.groupby("certificado", sort=True)[CAMPOS].agg(
+        lambda s: " | ".join(dict.fromkeys(s.dropna())) or pd.NA
+    )
+    return df.astype("category")
+
+
+@dataclass
+class SCHIndex:
+    """Índice local dos produtos homologados, indexado pelo nº do certificado"""
+
+    folder: Path = SCH_FOLDER
+    table: pd.DataFrame = field(default=None, repr=False)
+    sources: dict = field(default_factory=dict)
+
+    @property
+    def index_file(self) -> Path:
+        return Path(self.folder) / "sch.parquet"
+
+    @property
+    def meta_file(self) -> Path:
+        return Path(self.folder) / "sch.json"
+
+    def __post_init__(self):
+        if self.table is None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __contains__(self, certificado) -> bool:
+        return self.lookup(certificado) is not None
+
+    def load(self):
+        if self.index_file.is_file():
+            self.table = pd.read_parquet(self.index_file)
+            if self.meta_file.is_file():
+                self.sources = self.meta_file.read_json()
+        else:
+            self.table = pd.DataFrame(
+                columns=CAMPOS, index=pd.Index([], dtype="int64", name="certificado")
+            ).astype("category")
+        return self
+
+    def save(self):
+        Path(self.folder).mkdir(parents=True, exist_ok=True)
+        self.table.to_parquet(self.index_file)
+        self.meta_file.write_text(json.dumps(self.sources, indent=4), encoding="utf-8")
+
+    @property
+    def signature(self) -> str:
+        """Identifica a versão do índice, muda a cada arquivo de dados abertos incorporado"""
+        sources = json.dumps(self.sources, sort_keys=True).encode()
+        return hashlib.blake2b(sources, digest_size=8).hexdigest()
+
+    @staticmethod
+    def _signature(dump_file: Path) -> list:
+        stat = Path(dump_file).stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_stale(self, dump_file: Path) -> bool:
+        return self.sources.get(Path(dump_file).name) != self._signature(dump_file)
+
+    def refresh(self, dump_file: Path | None = None) -> bool:
+        """Incorpora um novo arquivo de dados abertos, caso ainda não tenha sido lido
+
+        Os certificados presentes no novo arquivo substituem os anteriores e os demais são mantidos.
+        """
+        if dump_file is None and (dump_file := self.latest_dump()) is None:
+            return False
+        if not self.is_stale(dump_file):
+            return False
+        new = read_dump(dump_file)
+        if len(self.table):
+            old = self.table.loc[self.table.index.difference(new.index)]
+            new = pd.concat([old.astype("string"), new.astype("string")]).sort_index()
+        self.table = new.astype("category")
+        self.sources[Path(dump_file).name] = self._signature(dump_file)
+        self.save()
+        return True
+
+    def latest_dump(self) -> Path | None:
+        dumps = [f for pattern in SCH_DUMPS for f in Path(self.folder).glob(pattern)]
+        return max(dumps, key=lambda f: f.stat().st_mtime, default=None)
+
+    def lookup(self, certificado) -> dict | None:
+        keys = certificado_keys([certificado])
+        position = self.table.index.get_indexer(keys)[0]
+        if position < 0:
+            return None
+        return self.table.iloc[position].to_dict()
+
+    def enrich(self, df: pd.DataFrame, column: str = "certificado") -> pd.DataFrame:
+        """Adiciona as colunas *_sch ao DataFrame a partir do certificado de cada linha"""
+        positions = self.table.index.get_indexer(certificado_keys(df[column]))
+        found = positions >= 0
+        for campo in CAMPOS:
+            values = pd.Series(pd.NA, index=df.index, dtype="object")
+            values[found] = self.table[campo].to_numpy()[positions[found]]
+            df[f"{campo}_sch"] = values.astype("category")
+        return df
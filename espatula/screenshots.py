@@ -0,0 +1,186 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from fastcore.xtras import Path
+
+from .shared import JsonlTail, file_lock
+
+# Situação de cada screenshot no manifesto
+CAPTURADO = "capturado"  # arquivo salvo, anúncio ainda não gravado nos dados raspados
+PENDENTE = "pendente"  # anúncio gravado, aguardando envio à nuvem
+SINCRONIZADO = "sincronizado"  # arquivo enviado à nuvem
+REMOVIDO = "removido"  # arquivo órfão excluído
+
+MANIFEST = "manifest.jsonl"
+
+
+@dataclass
+class ScreenshotManifest:
+    """Manifesto persistente dos screenshots de um marketplace
+
+    Associa cada arquivo ao anúncio (`url`), à sessão (palavra de busca) e à situação
+    da sincronização. As alterações são anexadas ao arquivo `manifest.jsonl` e os
+    arquivos são indexados por situação, de modo que as consultas do que enviar e do
+    que excluir não dependem do histórico acumulado na pasta.
+
+    Os processos dos jobs e o app gravam no mesmo arquivo: as gravações são feitas
+    com a trava do arquivo e as alterações dos outros processos são lidas antes.
+    """
+
+    folder: Path
+    entries: dict = field(default_factory=dict, repr=False)
+    status: defaultdict = field(default_factory=lambda: defaultdict(set), repr=False)
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+
+    def __post_init__(self):
+        self.folder = Path(self.folder)
+        self.tail = JsonlTail(self.manifest_file)
+        self.depth = 0
+        self.load()
+
+    @property
+    def manifest_file(self) -> Path:
+        return self.folder / MANIFEST
+
+    def exists(self) -> bool:
+        return self.manifest_file.is_file()
+
+    def load(self) -> None:
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Aplica as alterações gravadas por outros processos desde a última leitura"""
+        with self.lock:
+            changes, replaced = self.tail.read()
+            if replaced:
+                self.entries, self.status = {}, defaultdict(set)
+            for change in changes:
+                self._apply(change)
+
+    @contextmanager
+    def locked(self):
+        """Trava o manifesto entre threads e processos, com o estado atualizado"""
+        with self.lock:
+            self.depth += 1
+            try:
+                if self.depth > 1:
+                    yield
+                else:
+                    with file_lock(self.manifest_file):
+                        self.refresh()
+                        yield
+            finally:
+                self.depth -= 1
+
+    def _apply(self, change: dict) -> None:
+        entry = self.entries.setdefault(change["arquivo"], {})
+        if (previous := entry.get("situacao")) is not None:
+            self.status[previous].discard(change["arquivo"])
+        entry.update(change)
+        self.status[entry["situacao"]].add(change["arquivo"])
+
+    def _write(self, changes: list[dict]) -> None:
+        if not changes:
+            return
+        timestamp = datetime.now().astimezone().isoformat()
+        with self.locked():
+            for change in changes:
+                change["atualizado"] = timestamp
+            self.tail.append(changes)
+            for change in changes:
+                self._apply(change)
+
+    def add(self, arquivo: str, url: str | None = None, sessao: str | None = None):
+        self._write(
+            [{"arquivo": arquivo, "url": url, "sessao": sessao, "situacao": CAPTURADO}]
+        )
+
+    def mark(self, arquivos, situacao: str, **extra) -> None:
+        with self.locked():
+            self._write(
+                [
+                    {"arquivo": arquivo, "situacao": situacao, **extra}
+                    for arquivo in arquivos
+                    if arquivo in self.entries
+                    and self.entries[arquivo]["situacao"] != situacao
+                ]
+            )
+
+    def persisted(self, arquivos) -> None:
+        """Screenshots cujos anúncios foram gravados passam a aguardar o envio"""
+        with self.locked():
+            self.mark([a for a in arquivos if a in self.status[CAPTURADO]], PENDENTE)
+
+    def locate(self, arquivo: str) -> str:
+        """Arquivo na nuvem que contém o screenshot, o próprio pdf ou o seu pacote"""
+        return self.entries.get(arquivo, {}).get("pacote") or arquivo
+
+    def to_upload(self) -> list[str]:
+        return sorted(self.status[PENDENTE])
+
+    def to_delete(self, sessao: str | None) -> list[str]:
+        """Screenshots de anúncios descartados ou de execuções interrompidas da sessão
+
+        Os de outras sessões podem pertencer a um job ainda em execução. Os arquivos
+        sem sessão, de versões anteriores do manifesto, são excluídos por qualquer uma.
+        """
+        return sorted(
+            a
+            for a in self.status[CAPTURADO]
+            if self.entries[a].get("sessao") in (sessao, None)
+        )
+
+    def untracked(self) -> list[str]:
+        """Arquivos da pasta ausentes do manifesto, ex.: capturados por versões anteriores"""
+        with self.lock:
+            self.refresh()
+            return sorted(
+                file.name
+                for file in self.folder.glob("*.pdf")
+                if file.name not in self.entries
+            )
+
+    def rebuild(self, referenced: set) -> None:
+        """Inclui no manifesto os arquivos da pasta que ainda não constam nele"""
+        with self.locked():
+            self._write(
+                [
+                    {
+                        "arquivo": arquivo,
+                        "url": None,
+                        "sessao": None,
+                        "situacao": PENDENTE if arquivo in referenced else CAPTURADO,
+                    }
+                    for arquivo in self.untracked()
+                ]
+            )
+
+    def compact(self) -> None:
+        """Reescreve o manifesto somente com a situação atual de cada arquivo"""
+        with self.locked():
+            entries = {
+                a: e for a, e in self.entries.items() if e["situacao"] != REMOVIDO
+            }
+            try:
+                self.tail.rewrite(list(entries.values()))
+            except OSError as e:
+                # No Windows, a substituição falha se outro processo estiver lendo
+                print(f"Erro ao compactar o manifesto {self.manifest_file}: {e}")
+                return
+            self.entries = entries
+            self.status.pop(REMOVIDO, None)
+
+
+MANIFESTS: dict[str, ScreenshotManifest] = {}
+
+
+def get_manifest(folder: Path) -> ScreenshotManifest:
+    """Um manifesto por pasta, somente as alterações de outros processos são relidas"""
+    if (manifest := MANIFESTS.get(str(folder))) is None:
+        manifest = MANIFESTS[str(folder)] = ScreenshotManifest(folder)
+    else:
+        manifest.refresh()
+    return manifest
@@ -0,0 +1,102 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from fastcore.xtras import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Trava exclusiva entre processos e threads, no arquivo `<path>.lock`
+
+    Protege os arquivos gravados tanto pelo app quanto pelos processos dos jobs.
+    """
+    lock_file = Path(f"{path}.lock")
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@dataclass
+class JsonlTail:
+    """Leitura incremental de um registro `.jsonl` anexado por vários processos
+
+    Guarda a posição já lida e a identidade do arquivo. Se ele for substituído (ex.:
+    compactação) ou truncado, a leitura recomeça do início.
+    """
+
+    file: Path
+    offset: int = 0
+    identity: tuple | None = None
+
+    def read(self) -> tuple[list[dict], bool]:
+        """Registros anexados desde a última leitura e se o arquivo foi substituído"""
+        try:
+            stat = os.stat(self.file)
+        except FileNotFoundError:
+            replaced = self.identity is not None
+            self.offset, self.identity = 0, None
+            return [], replaced
+        identity = (stat.st_dev, stat.st_ino)
+        replaced = self.identity is not None and (
+            identity != self.identity or stat.st_size < self.offset
+        )
+        if replaced:
+            self.offset = 0
+        self.identity = identity
+        if stat.st_size == self.offset:
+            return [], replaced
+        with open(self.file, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # Uma linha ainda incompleta é lida na próxima chamada
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        lines = data[:end].decode("utf-8").splitlines()
+        return [json.loads(line) for line in lines if line.strip()], replaced
+
+    @staticmethod
+    def encode(records: list[dict]) -> bytes:
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        return lines.encode("utf-8")
+
+    def append(self, records: list[dict]) -> None:
+        """Anexa os registros, com a trava do arquivo e logo após `read`"""
+        with open(self.file, "ab") as f:
+            f.write(self.encode(records))
+            self.offset = f.tell()
+            stat = os.fstat(f.fileno())
+        self.identity = (stat.st_dev, stat.st_ino)
+
+    def rewrite(self, records: list[dict]) -> None:
+        """Substitui o arquivo pelos registros, com a trava do arquivo"""
+        tmp = Path(self.file).with_suffix(".tmp")
+        tmp.write_bytes(self.encode(records))
+        tmp.replace(self.file)
+        stat = os.stat(self.file)
+        self.offset, self.identity = stat.st_size, (stat.st_dev, stat.st_ino)
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable
+
+from fastcore.xtras import Path
+
+from .bundle import bundle_name, pack
+from .screenshots import REMOVIDO, SINCRONIZADO, ScreenshotManifest
+from .shared import file_lock
+
+CHUNK = 1 << 20
+TRANSFER_LOG = "sync.jsonl"
+
+
+def checksum(file: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, "rb") as f:
+        while chunk := f.read(CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_with_checksum(source: Path, target: Path) -> str:
+    """Copia o arquivo calculando o hash durante a leitura"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        while chunk := src.read(CHUNK):
+            digest.update(chunk)
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    return digest.hexdigest()
+
+
+@dataclass
+class ScreenshotSync:
+    """Envia os screenshots pendentes do manifesto para a pasta sincronizada com a nuvem
+
+    As cópias são feitas em paralelo para um arquivo temporário `.part`, conferidas
+    pelo hash e renomeadas. Cada etapa é anexada ao registro de transferências, de
+    modo que uma sincronização interrompida é retomada sem repetir as cópias
+    já verificadas. O arquivo local só é excluído após a verificação.
+
+    Com `pack`, os screenshots de cada sessão são enviados num único pacote zip.
+    Sincronizações da mesma pasta em outras sessões ou processos aguardam a atual.
+    """
+
+    manifest: ScreenshotManifest
+    target: Path
+    max_workers: int = 8
+    pack: bool = False
+    prefix: str = "screenshots"
+    verified: dict = field(default_factory=dict, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.target = Path(self.target)
+
+    @property
+    def source(self) -> Path:
+        return self.manifest.folder
+
+    @property
+    def log_file(self) -> Path:
+        return self.source / TRANSFER_LOG
+
+    def load(self) -> None:
+        self.verified.clear()
+        if not self.log_file.is_file():
+            return
+        for line in self.log_file.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self.verified[entry["arquivo"]] = entry["checksum"]
+
+    def log(self, arquivo: str, digest: str) -> None:
+        with self.lock:
+            with self.log_file.open("a", encoding="utf-8") as f:
+                f.write(json.dumps({"arquivo": arquivo, "checksum": digest}) + "\n")
+            self.verified[arquivo] = digest
+
+    def transfer(self, arquivo: str) -> str:
+        """Retorna a nova situação do arquivo no manifesto"""
+        source, target = self.source / arquivo, self.target / arquivo
+        if not source.is_file():
+            # Interrompido após a verificação e antes da exclusão do original
+            if target.is_file() and arquivo in self.verified:
+                return SINCRONIZADO
+            return REMOVIDO
+        if (digest := self.verified.get(arquivo)) is None or not target.is_file():
+            partial = target.with_name(f"{arquivo}.part")
+            digest = copy_with_checksum(source, partial)
+            if checksum(partial) != digest:
+                partial.unlink(missing_ok=True)
+                raise OSError(f"Cópia de {arquivo} não confere com o original")
+            partial.replace(target)
+            self.log(arquivo, digest)
+        elif checksum(target) != digest:
+            # Arquivo de destino alterado ou corrompido, refaz a cópia
+            with self.lock:
+                self.verified.pop(arquivo, None)
+            return self.transfer(arquivo)
+        source.unlink()
+        return SINCRONIZADO
+
+    def pack_session(self, sessao: str | None, arquivos: list[str]) -> tuple:
+        """Retorna o nome do pacote, os arquivos incluídos e os ausentes"""
+        present = [a for a in arquivos if (self.source / a).is_file()]
+        missing = [a for a in arquivos if a not in present]
+        if not present:
+            return None, present, missing
+        name = bundle_name(self.prefix, sessao, present)
+        target = self.target / name
+        if not (target.is_file() and self.verified.get(name) == checksum(target)):
+            index = {a: self.manifest.entries[a] for a in present}
+            pack([self.source / a for a in present], target, index)
+            self.log(name, checksum(target))
+        for arquivo in present:
+            (self.source / arquivo).unlink()
+        return name, present, missing
+
+    def jobs(self, pending: list[str]) -> dict:
+        """Tarefas a executar: um arquivo por tarefa ou um pacote por sessão"""
+        if not self.pack:
+            return {(a,): (self.transfer, a) for a in pending}
+        sessions = defaultdict(list)
+        for arquivo in pending:
+            sessions[self.manifest.entries[arquivo].get("sessao")].append(arquivo)
+        return {
+            tuple(arquivos): (self.pack_session, sessao, arquivos)
+            for sessao, arquivos in sessions.items()
+        }
+
+    def finish(self, arquivos: tuple, result, stats: dict) -> None:
+        if not self.pack:
+            self.manifest.mark(arquivos, result)
+            stats[result] += 1
+            return
+        name, present, missing = result
+        self.manifest.mark(present, SINCRONIZADO, pacote=name)
+        self.manifest.mark(missing, REMOVIDO)
+        stats[SINCRONIZADO] += len(present)
+        stats[REMOVIDO] += len(missing)
+
+    def run(self, progress: Callable[[int, int], None] | None = None) -> dict:
+        """Sincroniza os pendentes, chamando `progress(concluídos, total)` nesta thread"""
+        with file_lock(self.log_file):
+            self.manifest.refresh()
+            self.load()
+            return self._run(progress)
+
+    def _run(self, progress: Callable[[int, int], None] | None = None) -> dict:
+        pending = self.manifest.to_upload()
+        stats = {SINCRONIZADO: 0, REMOVIDO: 0, "erros": 0}
+        if not pending:
+            return stats
+        self.target.mkdir(parents=True, exist_ok=True)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(*job): arquivos
+                for arquivos, job in self.jobs(pending).items()
+            }
+            for future in as_completed(futures):
+                arquivos = futures[future]
+                try:
+                    self.finish(arquivos, future.result(), stats)
+                except Exception as e:
+                    print(
+                        f"Erro ao sincronizar os screenshots {', '.join(arquivos)}: {e}"
+                    )
+                    stats["erros"] += len(arquivos)
+                done += len(arquivos)
+                if progress is not None:
+                    progress(done, len(pending))
+        if not stats["erros"]:
+            # Todos os pendentes foram concluídos, o registro pode ser descartado
+            self.log_file.unlink(missing_ok=True)
+            self.verified.clear()
+        return stats
+
+
+def sync_screenshots(
+    manifest: ScreenshotManifest,
+    target: Path,
+    progress=None,
+    max_workers: int = 8,
+    pack: bool = False,
+    prefix: str = "screenshots",
+) -> dict:
+    return ScreenshotSync(
+        manifest, target, max_workers=max_workers, pack=pack, prefix=prefix
+    ).run(progress)
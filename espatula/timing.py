@@ -0,0 +1,127 @@
+import json
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+from fastcore.xtras import Path
+
+from .metrics import REGISTRY
+
+# Etapas instrumentadas do scraping, `extract` inclui o tempo de `soup` e `click`
+STAGES = ("open", "soup", "extract", "click", "screenshot", "compress", "save")
+OK = "ok"
+VAZIO = "vazio"
+ERRO = "erro"
+
+
+@dataclass
+class StageTimer:
+    """Duração e resultado de cada etapa por anúncio, gravados em JSON Lines
+
+    Cada linha do log traz a execução, o marketplace, a etapa, o anúncio em
+    processamento, a duração e o resultado. As durações da execução corrente ficam
+    em memória para o resumo com as medianas e o percentil 95 de cada etapa.
+    """
+
+    log_file: Path
+    marketplace: str
+    run: str = None
+    keyword: str | None = None
+    page: str | None = None
+    durations: dict = field(default_factory=lambda: defaultdict(list), repr=False)
+    outcomes: dict = field(default_factory=lambda: defaultdict(int), repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.log_file = Path(self.log_file)
+        if self.run is None:
+            self.start()
+
+    def start(self, keyword: str | None = None) -> str:
+        """Inicia uma nova execução, o resumo passa a considerar somente ela"""
+        with self.lock:
+            self.run = uuid.uuid4().hex[:8]
+            self.keyword = keyword
+            self.page = None
+            self.durations.clear()
+            self.outcomes.clear()
+        return self.run
+
+    def record(
+        self, stage: str, seconds: float, outcome: str = OK, error: str | None = None
+    ) -> None:
+        entry = {
+            "execucao": self.run,
+            "marketplace": self.marketplace,
+            "palavra_busca": self.keyword,
+            "etapa": stage,
+            "pagina": self.page,
+            "segundos": round(seconds, 6),
+            "resultado": outcome,
+            "registro": datetime.now().astimezone().isoformat(),
+        }
+        if error:
+            entry["erro"] = error
+        with self.lock:
+            self.durations[stage].append(seconds)
+            self.outcomes[(stage, outcome)] += 1
+            with self.log_file.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        labels = dict(marketplace=self.marketplace, keyword=self.keyword)
+        REGISTRY.observe("espatula_stage_seconds", seconds, stage=stage, **labels)
+        if stage == "extract":
+            REGISTRY.page(result=outcome, **labels)
+
+    @contextmanager
+    def stage(self, name: str, suppress: bool = False):
+        """Mede o bloco, com `suppress` a exceção é registrada no log e descartada
+
+        O bloco pode alterar o resultado registrado: `etapa["resultado"] = VAZIO`.
+        """
+        etapa = {"resultado": OK}
+        start = perf_counter()
+        try:
+            yield etapa
+        except Exception as e:
+            self.record(name, perf_counter() - start, ERRO, f"{type(e).__name__}: {e}")
+            if not suppress:
+                raise
+        else:
+            self.record(name, perf_counter() - start, etapa["resultado"])
+
+    def summary(self) -> dict[str, dict]:
+        """Nº de medições, vazios, falhas, mediana, p95 e total em segundos de cada etapa"""
+        with self.lock:
+            summary = {}
+            for stage in sorted(self.durations, key=self._order):
+                seconds = np.array(self.durations[stage])
+                p50, p95 = np.percentile(seconds, [50, 95])
+                summary[stage] = {
+                    "n": len(seconds),
+                    "vazios": self.outcomes[(stage, VAZIO)],
+                    "erros": self.outcomes[(stage, ERRO)],
+                    "p50": round(float(p50), 3),
+                    "p95": round(float(p95), 3),
+                    "total": round(float(seconds.sum()), 3),
+                }
+            return summary
+
+    def report(self) -> str:
+        lines = [f"Tempos por etapa - {self.marketplace} ({self.run})"]
+        lines.append(
+            f"{'etapa':<12}{'n':>6}{'vazios':>7}{'erros':>7}{'p50 (s)':>10}{'p95 (s)':>10}{'total (s)':>11}"
+        )
+        for stage, s in self.summary().items():
+            lines.append(
+                f"{stage:<12}{s['n']:>6}{s['vazios']:>7}{s['erros']:>7}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['total']:>11.1f}"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _order(stage: str) -> int:
+        return STAGES.index(stage) if stage in STAGES else len(STAGES)
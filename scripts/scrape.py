@@ -6,8 +6,7 @@ import pandas as pd
 
 
 sys.path.append(str(Path(__file__).parent.parent))
-from espatula.constantes import KEYWORDS
-from espatula.spiders import (
+from espatula import (
     AmazonScraper,
     MercadoLivreScraper,
     MagaluScraper,
@@ -16,7 +15,11 @@ from espatula.spiders import (
     CarrefourScraper,
 )
 
-from espatula.spiders.base import FOLDER, TODAY
+from espatula.base import BaseScraper
+from espatula.metrics import METRICS_PORT, serve
+
+FOLDER = Path(BaseScraper.path)
+KEYWORD = "smartphone"
 
 PREFIX = "https://anatel365.sharepoint.com/sites/Desenvolvimentodeappfiscalizaoe-commerce/Documentos%20Compartilhados/General/Resultados/screenshots/"
 
@@ -460,10 +463,16 @@ def process_shopee(output_file, category="Celulares e Smartphones"):
     write_excel(df, output_file.with_suffix(".xlsx"), "casasbahia-smartphone")
 
 
+def run_search(scraper, keyword, headless):
+    for _ in SCRAPER[scraper](headless=headless).search(keyword):
+        pass
+
+
 def run_inspection(scraper, keyword, headless, screenshot, sample):
     site = SCRAPER[scraper](headless=headless)
-    site.inspect_pages(keyword=keyword, screenshot=screenshot, sample=sample)
-    output_file = Path(FOLDER / scraper / f"{scraper}_{TODAY}_{keyword}.json")
+    for _ in site.inspect_pages(keyword=keyword, screenshot=screenshot, sample=sample):
+        pass
+    output_file = site.pages_file(keyword)
     if scraper == "amazon":
         process_amazon(output_file)
     elif scraper == "ml":
@@ -484,7 +493,7 @@ if __name__ == "__main__":
 
     def main(
         scraper: str = None,
-        keyword: str = KEYWORDS[0],
+        keyword: str = KEYWORD,
         search: bool = False,
         path: str = None,
         reconnect: int = 10,
@@ -492,16 +501,19 @@ if __name__ == "__main__":
         headless: bool = True,
         screenshot: bool = True,
         sample: int = 100,
+        metrics_port: int = None,
     ):
+        # Endpoint Prometheus em http://localhost:<porta>/metrics durante a execução
+        serve(metrics_port or METRICS_PORT)
         if not scraper:
             for scraper in SCRAPER:
                 if search:
-                    SCRAPER[scraper](headless=headless).search(keyword)
+                    run_search(scraper, keyword, headless)
                 else:
                     run_inspection(scraper, keyword, headless, screenshot, sample)
         else:
             if search:
-                SCRAPER[scraper](headless=headless).search(keyword)
+                run_search(scraper, keyword, headless)
             else:
                 run_inspection(scraper, keyword, headless, screenshot, sample)
 
@@ -0,0 +1,53 @@
+import json
+import zipfile
+
+import pytest
+
+from espatula.bundle import INDEX, bundle_name, extract, pack
+from espatula.screenshots import SINCRONIZADO, ScreenshotManifest
+from espatula.sync import sync_screenshots
+
+
+def test_bundle_name_is_deterministic():
+    name = bundle_name("ml", "Fone Bluetooth", ["b.pdf", "a.pdf"])
+    assert name == bundle_name("ml", "Fone Bluetooth", ["a.pdf", "b.pdf"])
+    assert name.startswith("ml_fone_bluetooth_") and name.endswith(".zip")
+    assert name != bundle_name("ml", "Fone Bluetooth", ["a.pdf"])
+    assert bundle_name("ml", None, ["a.pdf"]).startswith("ml_sessao_")
+
+
+def test_pack_and_extract(tmp_path):
+    files = []
+    for name in ("a.pdf", "b.pdf"):
+        (file := tmp_path / name).write_bytes(f"%PDF {name}".encode())
+        files.append(file)
+    target = tmp_path / "pacote.zip"
+    pack(files, target, {"a.pdf": {"url": "https://a"}})
+    assert extract(target, "b.pdf") == b"%PDF b.pdf"
+    with zipfile.ZipFile(target) as z:
+        assert json.loads(z.read(INDEX)) == {"a.pdf": {"url": "https://a"}}
+        assert {i.compress_type for i in z.infolist()} == {zipfile.ZIP_STORED}
+    assert not (tmp_path / "pacote.zip.part").exists()
+    with pytest.raises(KeyError):
+        extract(target, "c.pdf")
+
+
+def test_packed_sync_locates_bundle(tmp_path):
+    source, target = tmp_path / "local", tmp_path / "nuvem"
+    source.mkdir()
+    manifest = ScreenshotManifest(source)
+    sessions = {"a.pdf": "fone", "b.pdf": "fone", "c.pdf": "drone"}
+    for name, sessao in sessions.items():
+        (source / name).write_bytes(f"%PDF {name}".encode())
+        manifest.add(name, url=f"https://{name}", sessao=sessao)
+    manifest.persisted(sessions)
+
+    stats = sync_screenshots(manifest, target, pack=True, prefix="ml")
+    assert stats[SINCRONIZADO] == 3
+    assert len(list(target.glob("*.zip"))) == 2
+    assert not list(source.glob("*.pdf"))
+    for name in sessions:
+        bundle = manifest.locate(name)
+        assert bundle.startswith(f"ml_{sessions[name]}_") and bundle.endswith(".zip")
+        assert extract(target / bundle, name) == f"%PDF {name}".encode()
+    assert manifest.locate("x.pdf") == "x.pdf"
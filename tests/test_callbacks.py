@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("gradio_client")
+
+from callbacks import _set_client, _set_processed_pages, get_scraper  # noqa: E402
+from config import COLUNAS  # noqa: E402
+from data_processing import conform_columns, processed_file  # noqa: E402
+from espatula.processing import Classifier, LocalEngine  # noqa: E402
+from espatula.sch import SCHIndex  # noqa: E402
+
+
+class State(dict):
+    """Substitui o `st.session_state`, com acesso por atributo"""
+
+    __getattr__ = dict.get
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+def write_table(state, urls):
+    scraper = get_scraper(state.mkplc, state.folder)
+    df = pd.DataFrame(
+        {
+            "url": urls,
+            "nome": [f"Anúncio {u}" for u in urls],
+            "modelo_score": 0,
+            "nome_score": 0,
+            "probabilidade": 0.0,
+            "passível?": False,
+        }
+    )
+    table_file = processed_file(scraper, state.keyword)
+    conform_columns(df).to_parquet(table_file, index=False)
+    return table_file
+
+
+@pytest.fixture
+def state(tmp_path):
+    return State(mkplc="Amazon", keyword="fone", folder=str(tmp_path), cloud="")
+
+
+def test_session_table_is_kept_while_the_file_is_unchanged(state):
+    write_table(state, ["a", "b"])
+    _set_processed_pages(state)
+    df = state.processed_pages
+    assert df["url"].tolist() == ["a", "b"]
+    assert set(COLUNAS) <= set(df.columns)
+
+    # Colunas derivadas calculadas na exibição são mantidas entre as reexecuções
+    df["pdf"] = "link"
+    _set_processed_pages(state)
+    assert state.processed_pages is df
+
+    write_table(state, ["a", "b", "c"])
+    _set_processed_pages(state)
+    assert state.processed_pages is not df
+    assert state.processed_pages["url"].tolist() == ["a", "b", "c"]
+    assert "pdf" not in state.processed_pages.columns
+
+
+def test_other_keyword_reloads(state):
+    write_table(state, ["a"])
+    _set_processed_pages(state)
+    state.keyword = "drone"
+    write_table(state, ["x"])
+    _set_processed_pages(state)
+    assert state.processed_pages["url"].tolist() == ["x"]
+
+
+def test_local_processing_requires_a_classifier(state, tmp_path, monkeypatch):
+    engine = LocalEngine(
+        sch=SCHIndex(tmp_path / "sch"), classifier=Classifier(model_file=None)
+    )
+    monkeypatch.setattr("callbacks.shared_engine", lambda folder: engine)
+    state.local_processing = True
+    _set_client(state)
+    # Sem o modelo treinado, os dados são enviados ao serviço remoto
+    assert state.local_processing is False
+    assert state.engine is None
+    assert state.client is not None
@@ -0,0 +1,33 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pypdf")
+
+from benchmarks.compression import images, psnr, synthetic_image
+from espatula.compression import PROFILES, compress_pdf
+
+
+def photo_pdf(side: int = 1600) -> bytes:
+    image = synthetic_image(np.random.default_rng(0), side, side)
+    stream = BytesIO()
+    image.save(stream, "PDF", quality=95)
+    return stream.getvalue()
+
+
+def test_default_profile_keeps_resolution():
+    pdf = photo_pdf()
+    output = compress_pdf(BytesIO(pdf))
+    assert [i.size for i in images(output)] == [(1600, 1600)]
+    assert psnr([pdf], [output]) > 30
+
+
+def test_psnr_penalizes_downscaling():
+    pdf = photo_pdf()
+    quality = compress_pdf(BytesIO(pdf), PROFILES["original"])
+    reduced = compress_pdf(BytesIO(pdf), PROFILES["reduz_grandes"])
+    assert [i.size for i in images(reduced)] == [(1280, 1280)]
+    # A comparação é feita na resolução original
+    assert psnr([pdf], [reduced]) < psnr([pdf], [quality])
+    assert psnr([pdf], [pdf]) == float("inf")
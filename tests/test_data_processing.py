@@ -0,0 +1,299 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from espatula.processing import Classifier, LocalEngine
+from espatula.sch import SCHIndex
+
+pytest.importorskip("gradio_client")
+
+from data_processing import (  # noqa: E402
+    ProcessingCache,
+    StreamingProcessor,
+    apply_group_decision,
+    derive_columns,
+    edit_journal,
+    image_groups,
+    manage_screenshots,
+    request_pages,
+    update_processed_pages,
+)
+from config import SCRAPERS  # noqa: E402
+from espatula.entities import EntityIndex  # noqa: E402
+from espatula.screenshots import SINCRONIZADO, ScreenshotManifest  # noqa: E402
+
+
+class Constant:
+    def predict_proba(self, texts):
+        return np.array([[0.1, 0.9]] * len(texts))
+
+
+def engine(folder):
+    return LocalEngine(sch=SCHIndex(folder), classifier=Classifier(model=Constant()))
+
+
+class FlakyEngine:
+    """Falha `attempts` vezes nos lotes que contêm alguma das urls de `fail`"""
+
+    def __init__(self, folder, fail=(), attempts=1):
+        self.engine = engine(folder)
+        self.fail = set(fail)
+        self.attempts = attempts
+        self.calls = []
+
+    def process(self, pages):
+        self.calls.append(sorted(pages))
+        if self.attempts and self.fail & set(pages):
+            self.attempts -= 1
+            raise ConnectionError("falha simulada")
+        return self.engine.process(pages)
+
+
+def pages(n, start=0):
+    return {
+        f"u{i}": {"url": f"u{i}", "nome": f"Fone bluetooth {i}", "marca": "ACME"}
+        for i in range(start, start + n)
+    }
+
+
+def state(engine):
+    return SimpleNamespace(
+        local_processing=True, engine=engine, client=None, processed_pages=None
+    )
+
+
+def test_cache_reuses_results(tmp_path):
+    engine = FlakyEngine(tmp_path)
+    cache = ProcessingCache(tmp_path / "cache.parquet", "local")
+    request = lambda p: request_pages(state(engine), p)  # noqa: E731
+    assert len(cache.process(pages(3), request)) == 3
+
+    cache = ProcessingCache(tmp_path / "cache.parquet", "local")
+    df = cache.process(pages(4), request)
+    assert sorted(df["url"]) == ["u0", "u1", "u2", "u3"]
+    assert engine.calls[-1] == ["u3"]
+    assert cache.stats == {"hits": 3, "misses": 1}
+
+
+def test_streaming_requeues_failed_batches(tmp_path):
+    engine = FlakyEngine(tmp_path, fail={"u2"})
+    session = state(engine)
+    processor = StreamingProcessor(
+        session, ProcessingCache(tmp_path / "cache.parquet", "local"), batch_size=2
+    )
+    for record in pages(5).values():
+        processor.add(record)
+    processor.poll(wait=True)
+    # O cache é gravado uma única vez, ao final da raspagem
+    assert not (tmp_path / "cache.parquet").is_file()
+    processor.close()
+    assert len(pd.read_parquet(tmp_path / "cache.parquet")) == 5
+    assert not processor.failed
+    assert processor.processed == 5
+    assert sorted(session.processed_pages["url"]) == [f"u{i}" for i in range(5)]
+
+
+def test_streaming_keeps_persistent_failures(tmp_path):
+    engine = FlakyEngine(tmp_path, fail={"u0"}, attempts=2)
+    processor = StreamingProcessor(
+        state(engine),
+        ProcessingCache(tmp_path / "cache.parquet", "local"),
+        batch_size=2,
+    )
+    for record in pages(3).values():
+        processor.add(record)
+    processor.close()
+    assert sorted(processor.failed) == ["u0", "u1"]
+    assert processor.processed == 1
+
+
+def test_cache_prunes_other_versions(tmp_path):
+    engine = FlakyEngine(tmp_path)
+    request = lambda p: request_pages(state(engine), p)  # noqa: E731
+    cache_file = tmp_path / "cache.parquet"
+    ProcessingCache(cache_file, "local:sch1:Constant").process(pages(2), request)
+    ProcessingCache(cache_file, "remote").process(pages(1, 5), request)
+
+    cache = ProcessingCache(cache_file, "local:sch2:Constant")
+    cache.process(pages(1), request)
+    assert cache.stats == {"hits": 0, "misses": 1}
+    stored = pd.read_parquet(cache_file)
+    assert sorted(stored["salt"]) == ["local:sch2:Constant", "remote"]
+
+
+def test_engine_signature(tmp_path):
+    local = engine(tmp_path)
+    before = local.signature
+    assert before.endswith(":Constant")
+    (tmp_path / "produtos_certificados.csv").write_text(
+        "Número de Homologação;Nome do Fabricante;Modelo;Nome Comercial;Tipo do Produto\n"
+        "00001-20-00001;ACME;XR100;Roteador XR;Roteador\n",
+        encoding="utf-8",
+    )
+    assert local.refresh()
+    assert local.signature != before
+    assert local.matcher.blocks
+
+
+def test_manage_screenshots_migrates_old_files(tmp_path):
+    folder = tmp_path / "ml"
+    (screenshots := folder / "screenshots").mkdir(parents=True)
+    manifest = ScreenshotManifest(screenshots)
+    # Captura da nova versão, feita antes da primeira sincronização
+    manifest.add("novo.pdf", sessao="fone")
+    manifest.persisted(["novo.pdf"])
+    for name in ("novo.pdf", "citado.pdf", "orfao.pdf"):
+        (screenshots / name).write_bytes(b"%PDF")
+    pd.DataFrame({"screenshot": ["citado.pdf"]}).to_parquet(
+        folder / "ml_drone_pages.parquet"
+    )
+    scraper = SimpleNamespace(
+        name="ml",
+        folder=folder,
+        screenshots=manifest,
+        previews=SimpleNamespace(delete=lambda arquivo: None),
+    )
+    session = SimpleNamespace(
+        keyword="fone", cloud=tmp_path / "nuvem", pack_screenshots=False
+    )
+    manage_screenshots(scraper, session)
+    assert sorted(f.name for f in (tmp_path / "nuvem").iterdir()) == [
+        "citado.pdf",
+        "novo.pdf",
+    ]
+    assert not list(screenshots.glob("*.pdf"))
+    assert manifest.status[SINCRONIZADO] == {"citado.pdf", "novo.pdf"}
+    assert "orfao.pdf" not in manifest.entries
+
+
+class FakeImages:
+    """Mesma interface do `ImageCache` usada em `derive_columns`, contando as consultas"""
+
+    def __init__(self):
+        self.version = 0
+        self.local = {}
+        self.prefetched = []
+        self.lookups = 0
+
+    def prefetch(self, urls):
+        self.prefetched += list(urls)
+
+    def data_uri(self, url):
+        self.lookups += 1
+        return self.local.get(url)
+
+    def cluster(self, url):
+        return "g" + url[-1] if url in self.local else None
+
+    def downloaded(self, url):
+        self.local[url] = f"data:{url}"
+        self.version += 1
+
+
+def test_derive_columns_only_recomputes_new_rows_and_new_images():
+    images = FakeImages()
+    df = pd.DataFrame(
+        {
+            "url": ["a", "b", "c"],
+            "screenshot": ["a.pdf", None, "c.pdf"],
+            "imagem": ["img1", "img1", "img2"],
+            "modelo_score": [100, 0, 0],
+            "nome_score": [0, 0, 100],
+        }
+    )
+    derive_columns(df, str, images)
+    assert images.prefetched == ["img1", "img1", "img2"]
+    assert df["miniatura"].tolist() == ["img1", "img1", "img2"]
+    assert df["modelo_match"].tolist() == [True, False, False]
+    assert df["grupo"].isna().all()
+
+    # Sem linhas novas nem imagens baixadas, nada é recalculado
+    images.lookups = 0
+    derive_columns(df, str, images)
+    assert images.lookups == 0
+    assert len(images.prefetched) == 3
+
+    images.downloaded("img1")
+    derive_columns(df, str, images)
+    assert df["miniatura"].tolist() == ["data:img1", "data:img1", "img2"]
+    assert df["grupo"].tolist()[:2] == ["g1", "g1"]
+    assert pd.isna(df.at[2, "grupo"])
+    # As miniaturas locais não são consultadas novamente
+    images.lookups = 0
+    images.downloaded("img2")
+    derive_columns(df, str, images)
+    assert images.lookups == 1
+
+
+def listings(urls, imagens, passivel=False):
+    return pd.DataFrame(
+        {
+            "url": urls,
+            "nome": urls,
+            "imagem": imagens,
+            "ean_gtin": None,
+            "certificado": None,
+            "fabricante": None,
+            "modelo": None,
+            "passível?": passivel,
+        }
+    )
+
+
+def test_image_groups_across_marketplaces(tmp_path):
+    images = FakeImages()
+    for url in ("img1", "img2", "img3"):
+        images.downloaded(url)
+    entities = EntityIndex(tmp_path)
+    entities.add(listings(["m1"], ["img1"]).assign(marketplace="Magalu"))
+    df = listings(["a1", "a2", "a3"], ["img1", "img2", "img2"])
+    # A imagem repetida em outro marketplace também forma um grupo
+    assert image_groups(df, images, entities, "Amazon").tolist() == [
+        "g1",
+        "g2",
+        "g2",
+    ]
+    assert image_groups(df, images).isna().tolist() == [True, False, False]
+    # O próprio anúncio já indexado não é contado duas vezes
+    entities.add(df.assign(marketplace="Amazon"))
+    assert image_groups(df.iloc[:1], images, entities, "Amazon").tolist() == ["g1"]
+    assert image_groups(df.iloc[1:2], images, entities, "Amazon").tolist() == ["g2"]
+    alone = listings(["a4"], ["img3"])
+    assert image_groups(alone, images, entities, "Amazon").isna().all()
+
+
+class State(dict):
+    __getattr__ = dict.get
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+def test_group_decision_requires_confirmation(tmp_path):
+    table = listings(["a", "b", "c"], ["i1", "i1", "i2"], passivel=True)
+    table["grupo"] = pd.array(["g1", "g1", None], dtype="string")
+    state = State(
+        mkplc="Amazon",
+        folder=str(tmp_path),
+        keyword="fone",
+        cloud=str(tmp_path / "nuvem"),
+        processed_pages=table,
+        df_positive=table.copy(),
+        editor={"edited_rows": {0: {"passível?": False}}},
+    )
+    update_processed_pages(state, "df_positive", "editor")
+    # Somente o anúncio editado muda até a confirmação
+    assert table["passível?"].tolist() == [False, True, True]
+    assert state.group_decision == {"imagem": "i1", "valor": False, "urls": ["b"]}
+
+    apply_group_decision(state)
+    assert table["passível?"].tolist() == [False, False, True]
+    assert state.group_decision is None
+    journal = edit_journal(state, SCRAPERS[state.mkplc](path=state.folder))
+    assert [(e["key"], e["new"]) for e in journal.entries()] == [
+        ("a", False),
+        ("b", False),
+    ]
+    journal.clear()
@@ -0,0 +1,91 @@
+import random
+from io import BytesIO
+
+import numpy as np
+
+from espatula.dedup import BKTree, ImageClusters, UnionFind, hamming, phash
+
+
+def png(seed: int, noise: float = 0, size: int = 128) -> bytes:
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (4, 4, 3)).astype(np.uint8)
+    image = Image.fromarray(coarse).resize((size, size), Image.BICUBIC)
+    pixels = np.asarray(image, dtype=np.float64)
+    pixels += np.random.default_rng(99).normal(0, noise, pixels.shape)
+    output = BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(output, "PNG")
+    return output.getvalue()
+
+
+def test_phash():
+    value = phash(png(1))
+    assert 0 <= value < 2**64
+    # Ruído leve e mudança de escala mantêm o hash próximo
+    assert hamming(value, phash(png(1, noise=2))) <= 6
+    assert hamming(value, phash(png(1, size=300))) <= 6
+    assert hamming(value, phash(png(2))) > 6
+
+
+def test_hamming():
+    assert hamming(0b1011, 0b1011) == 0
+    assert hamming(0b1011, 0b0010) == 2
+    assert hamming(0, 2**64 - 1) == 64
+
+
+def test_bktree_matches_brute_force():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Valores próximos de alguns dos anteriores, com poucos bits trocados
+    for value in values[:50]:
+        for _ in range(3):
+            value ^= 1 << rng.randrange(64)
+        values.append(value)
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, i)
+    for query in values[:20] + [rng.getrandbits(64)]:
+        expected = sorted(
+            (hamming(query, v), i)
+            for i, v in enumerate(values)
+            if hamming(query, v) <= 6
+        )
+        assert sorted(tree.search(query, 6)) == expected
+    assert BKTree().search(0) == []
+
+
+def test_bktree_keeps_identical_values():
+    tree = BKTree()
+    tree.add(5, "a")
+    tree.add(5, "b")
+    assert sorted(tree.search(5, 0)) == [(0, "a"), (0, "b")]
+
+
+def test_union_find_root_is_deterministic():
+    sets = UnionFind()
+    for item in "dcba":
+        sets.add(item)
+    sets.union("d", "c")
+    sets.union("b", "a")
+    assert sets.find("d") == sets.find("c") == "c"
+    sets.union("c", "b")
+    assert {sets.find(i) for i in "abcd"} == {"a"}
+    assert "a" in sets and "e" not in sets
+
+
+def test_image_clusters_are_transitive():
+    clusters = ImageClusters(radius=2)
+    # "c" só é próxima de "a" por meio de "b"
+    clusters.add("c", 0b1111)
+    clusters.add("a", 0b0000)
+    clusters.add("x", 2**64 - 1)
+    assert clusters.cluster("a") != clusters.cluster("c")
+    clusters.add("b", 0b0011)
+    assert clusters.cluster("a") == clusters.cluster("b") == clusters.cluster("c")
+    assert clusters.cluster("a") == "a"
+    assert clusters.cluster("x") == "x"
+    assert clusters.cluster("y") is None
+    # Um item já agrupado não é adicionado novamente
+    clusters.add("x", 0)
+    assert clusters.cluster("x") == "x"
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from espatula.entities import EntityIndex, get_entities
+
+
+def listings(marketplace, rows):
+    return pd.DataFrame(
+        rows, columns=["url", "nome", "ean_gtin", "certificado", "fabricante", "modelo"]
+    ).assign(marketplace=marketplace)
+
+
+AMAZON = listings(
+    "Amazon",
+    [
+        ("a1", "Galaxy A15", "7891234567895", None, "Samsung", "SM-A155M"),
+        ("a2", "Fone BT", None, "00002-21-00002", "Beta", "BT20X"),
+        ("a3", "Caneca", None, None, "Casa", None),
+    ],
+)
+MAGALU = listings(
+    "Magalu",
+    [
+        ("m1", "Smartphone A15", "7891234567895", None, "Samsung", "A155M"),
+        ("m2", "Fone Bluetooth", None, "000022100002", "Beta", "BT-20X"),
+        ("m3", "Galaxy", None, None, "Samsung Eletrônica", "SM A155M/DS"),
+    ],
+)
+
+
+def test_links_listings_of_the_same_product(tmp_path):
+    index = EntityIndex(tmp_path)
+    assert index.add(AMAZON, "celular") == 3
+    assert index.add(MAGALU, "celular") == 3
+    assert index.add(MAGALU) == 0  # já indexados
+    a15 = index.entity("Amazon", "a1")
+    assert index.entity("Magalu", "m1") == a15  # mesmo EAN
+    assert index.entity("Magalu", "m3") == a15  # mesmo fabricante e modelo
+    assert index.entity("Magalu", "m2") == index.entity("Amazon", "a2")  # certificado
+    assert index.entity("Amazon", "a3") not in (a15, index.entity("Amazon", "a2"))
+    assert index.entity("Amazon", "x") is None
+    assert set(index.members(a15)["url"]) == {"a1", "m1", "m3"}
+    assert set(index.find_model("SM-A155M", "Samsung")["url"]) == {"a1", "m1", "m3"}
+
+
+def test_reloads_changes_from_other_instances(tmp_path):
+    first = get_entities(tmp_path)
+    second = EntityIndex(tmp_path)  # ex.: outro processo do app
+    first.add(AMAZON)
+    # A inclusão do outro processo é lida antes de gravar, nada é perdido
+    second.add(MAGALU)
+    assert len(second.table) == 6
+    assert get_entities(tmp_path) is first
+    assert len(first.table) == 6
+    assert first.entity("Magalu", "m1") == first.entity("Amazon", "a1")
+    assert len(EntityIndex(tmp_path).table) == 6
@@ -0,0 +1,41 @@
+from espatula.gtin import (
+    find_gtins,
+    first_valid_gtin,
+    is_valid_gtin,
+    normalize_gtin,
+    normalize_gtins,
+    to_gtin14,
+    validate_gtins,
+)
+
+
+def test_validate_gtins_lengths():
+    codes = ["7891234567895", "96385074", "036000291452", "17891234567892"]
+    assert validate_gtins(codes).tolist() == [True, True, True, True]
+
+
+def test_validate_gtins_invalid():
+    codes = ["7891234567890", "0000000000000", "123", "", None, "abc"]
+    assert not validate_gtins(codes).any()
+
+
+def test_normalize_gtins_removes_separators():
+    assert normalize_gtins(["789-1234 56789.5", "7891234567890"]) == [
+        "7891234567895",
+        None,
+    ]
+    assert normalize_gtin(" 9638-5074 ") == "96385074"
+
+
+def test_is_valid_and_gtin14():
+    assert is_valid_gtin(7891234567895)
+    assert to_gtin14("96385074") == "00000096385074"
+    assert to_gtin14("96385070") is None
+
+
+def test_first_valid_and_find():
+    text = "Código 7891234567890, EAN 7891234567895 e outro 96385074"
+    assert find_gtins(text) == ["7891234567890", "7891234567895", "96385074"]
+    assert first_valid_gtin(find_gtins(text)) == "7891234567895"
+    assert first_valid_gtin([]) is None
+    assert find_gtins("789-1234-56789-5") == ["7891234567895"]
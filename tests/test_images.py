@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from espatula.images import ImageCache, get_images
+
+
+def png(seed: int, noise: float = 0) -> bytes:
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (4, 4, 3)).astype(np.uint8)
+    image = Image.fromarray(coarse).resize((128, 128), Image.BICUBIC)
+    pixels = np.asarray(image, dtype=np.float64)
+    pixels += np.random.default_rng(99).normal(0, noise, pixels.shape)
+    output = BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(output, "PNG")
+    return output.getvalue()
+
+
+IMAGES = {"/a.png": png(1), "/b.png": png(2), "/a_ruido.png": png(1, noise=2)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if (body := IMAGES.get(self.path)) is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_prefetch_and_data_uri(tmp_path, server):
+    cache = ImageCache(tmp_path)
+    urls = [f"{server}/a.png", f"{server}/b.png", f"{server}/x.png"]
+    wait(cache.prefetch(urls + urls))
+    assert cache.data_uri(urls[0]).startswith("data:image/webp;base64,")
+    assert cache.get(urls[1], "full").is_file()
+    assert cache.get(urls[2]) is None
+    assert urls[2] in cache.failed
+    assert cache.prefetch(urls) == []
+
+
+def test_clusters_near_duplicates(tmp_path, server):
+    cache = ImageCache(tmp_path)
+    a, b, noisy = (f"{server}/{n}" for n in ("a.png", "b.png", "a_ruido.png"))
+    wait(cache.prefetch([a, b, noisy]))
+    assert cache.cluster(a) == cache.cluster(noisy)
+    assert cache.cluster(a) != cache.cluster(b)
+    assert cache.cluster("https://outra") is None
+
+
+def test_reads_downloads_from_other_instances(tmp_path, server):
+    first = get_images(tmp_path)
+    second = ImageCache(tmp_path)  # ex.: outro processo do app
+    wait(second.prefetch([f"{server}/a.png"]))
+    wait(first.prefetch([f"{server}/b.png"]))
+    assert set(first.urls) == {f"{server}/a.png", f"{server}/b.png"}
+    version = second.version
+    second.refresh()
+    assert set(second.urls) == set(first.urls)
+    # As miniaturas e grupos são recalculados após as inclusões de outros processos
+    assert second.version == version + 1
+    second.refresh()
+    assert second.version == version + 1
+    assert len((tmp_path / "index.jsonl").read_text().splitlines()) == 2
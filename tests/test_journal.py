@@ -0,0 +1,73 @@
+import time
+
+import pandas as pd
+
+from espatula.journal import EditJournal, get_journal
+
+
+def table(tmp_path):
+    df = pd.DataFrame({"url": ["a", "b", "c"], "passível?": [True, False, True]})
+    df.to_parquet(table_file := tmp_path / "ml_tabela.parquet", index=False)
+    return table_file
+
+
+def journal(tmp_path, exports, **kwargs):
+    table_file = table(tmp_path)
+    return EditJournal(
+        tmp_path / "ml_tabela_edits.jsonl",
+        table_file,
+        export=lambda df, target: exports.append((target, df.copy())),
+        **kwargs,
+    )
+
+
+def test_record_and_apply(tmp_path):
+    edits = journal(tmp_path, [], debounce=60)
+    edits.record("a", "passível?", True, False)
+    edits.record("b", "passível?", False, True)
+    edits.record("a", "passível?", False, True)
+    edits.record("x", "passível?", False, True)  # linha inexistente
+    edits.clear()
+    assert edits.entries() == []
+
+    edits.record("a", "passível?", True, False)
+    edits.record("b", "passível?", False, True)
+    df = edits.apply(pd.read_parquet(edits.table_file))
+    assert df["passível?"].tolist() == [False, True, True]
+    edits.clear()
+
+
+def test_compact_exports_to_each_target(tmp_path):
+    exports = []
+    edits = journal(tmp_path, exports, debounce=60)
+    edits.record("a", "passível?", True, False, target="nuvem_1")
+    edits.record("c", "passível?", True, False, target="nuvem_2")
+    edits.record("b", "passível?", False, True, target="nuvem_1")
+    edits.compact()
+    assert [target for target, _ in exports] == ["nuvem_1", "nuvem_2"]
+    assert exports[0][1]["passível?"].tolist() == [False, True, False]
+    assert pd.read_parquet(edits.table_file)["passível?"].tolist() == [
+        False,
+        True,
+        False,
+    ]
+    assert not edits.journal_file.exists()
+
+
+def test_debounce(tmp_path):
+    exports = []
+    edits = journal(tmp_path, exports, debounce=0.1)
+    edits.record("a", "passível?", True, False, target="nuvem")
+    time.sleep(0.05)
+    edits.record("b", "passível?", False, True, target="nuvem")
+    time.sleep(0.07)
+    assert not exports  # o prazo recomeça a cada edição
+    time.sleep(0.2)
+    assert [target for target, _ in exports] == ["nuvem"]
+
+
+def test_get_journal_is_shared(tmp_path):
+    table_file = table(tmp_path)
+    first = get_journal(table_file, export=lambda df, target: None, debounce=60)
+    assert get_journal(table_file) is first
+    assert first.journal_file == tmp_path / "ml_tabela_edits.jsonl"
@@ -0,0 +1,70 @@
+import pandas as pd
+
+from espatula.matching import (
+    CatalogMatcher,
+    manufacturer_key,
+    model_prefixes,
+    normalize_text,
+    partial_ratios,
+)
+
+
+def test_normalize_text():
+    assert normalize_text("Câmera  Wi-Fi/4K") == "camera wi fi 4k"
+    assert normalize_text(None) == ""
+    assert normalize_text(float("nan")) == ""
+    assert normalize_text(pd.NA) == ""
+
+
+def test_partial_ratios():
+    scores = partial_ratios(
+        ["XR100", "Fone BT", "abc", None, "SM-A155M"],
+        ["Roteador XR100 Dual", "fone", "xyz", "X", "SM A155M/DS"],
+    )
+    assert scores.tolist() == [100, 100, 0, 0, 100]
+
+
+def test_partial_ratios_typo():
+    score = partial_ratios(["galaxy a15"], ["Galaxi A15 128GB"])[0]
+    assert 80 <= score < 100
+
+
+def test_prefixes_and_manufacturer():
+    assert model_prefixes("sm a155m ds x1") == {"a155"}
+    assert manufacturer_key("samsung eletronica da amazonia") == "samsung"
+    assert manufacturer_key("") == ""
+
+
+def test_catalog_matcher():
+    catalog = pd.DataFrame(
+        {
+            "fabricante": ["Samsung Eletrônica", "Samsung Eletrônica", "Beta"],
+            "modelo": ["SM-A155M", "SM-S921B", "BT20"],
+            "nome": ["Galaxy A15", "Galaxy S24", "Fone BT"],
+        },
+        index=pd.Index([1234567, 7654321, 42], name="certificado"),
+    )
+    matcher = CatalogMatcher(catalog)
+    ads = pd.DataFrame(
+        {
+            "fabricante": ["Samsung", "Outra", None],
+            "modelo": ["SM-A155M/DS", None, "ZZ99"],
+            "nome": ["Smartphone Galaxy A15", "Fone sem fio BT20", "Caneca"],
+        },
+        index=["a", "b", "c"],
+    )
+    result = matcher.match(ads)
+    assert result["sugestao_sch"].tolist()[:2] == ["000001234567", "000000000042"]
+    assert pd.isna(result.loc["c", "sugestao_sch"])
+    assert result.loc["a", "sugestao_score"] == 100
+
+
+def test_catalog_matcher_empty():
+    catalog = pd.DataFrame(
+        columns=["fabricante", "modelo", "nome"], index=pd.Index([], name="certificado")
+    )
+    result = CatalogMatcher(catalog).match(
+        pd.DataFrame(columns=["fabricante", "modelo", "nome"])
+    )
+    assert result.empty
+    assert list(result.columns) == ["sugestao_sch", "sugestao_score"]
@@ -0,0 +1,131 @@
+import socket
+from contextlib import contextmanager
+from types import SimpleNamespace
+from urllib.request import urlopen
+
+import pytest
+
+from espatula.metrics import RATE_WINDOW, REGISTRY, SERVERS, Registry, serve
+
+
+def test_render_counters_and_gauges():
+    registry = Registry()
+    registry.inc("espatula_captcha_total", marketplace="ml")
+    registry.inc("espatula_captcha_total", marketplace="ml")
+    registry.set("espatula_queue_depth", 7, marketplace="amazon", keyword=None)
+    text = registry.render()
+    assert "# TYPE espatula_captcha_total counter" in text
+    assert 'espatula_captcha_total{marketplace="ml"} 2' in text
+    # Rótulos ausentes não são exibidos
+    assert 'espatula_queue_depth{marketplace="amazon"} 7' in text
+    assert "espatula_pages_total" not in text
+    assert text.endswith("\n")
+
+
+def test_label_escape():
+    registry = Registry()
+    registry.inc("espatula_pages_total", keyword='celular "5g"\nnovo', result="ok")
+    assert 'keyword="celular \\"5g\\"\\nnovo"' in registry.render()
+
+
+def test_histogram_is_cumulative():
+    registry = Registry()
+    for value in (0.01, 0.3, 0.3, 100, 500):
+        registry.observe("espatula_stage_seconds", value, stage="pagina")
+    lines = registry.render().splitlines()
+    assert "# TYPE espatula_stage_seconds histogram" in lines
+    assert 'espatula_stage_seconds_bucket{stage="pagina",le="0.05"} 1' in lines
+    assert 'espatula_stage_seconds_bucket{stage="pagina",le="0.5"} 3' in lines
+    assert 'espatula_stage_seconds_bucket{stage="pagina",le="120"} 4' in lines
+    assert 'espatula_stage_seconds_bucket{stage="pagina",le="+Inf"} 5' in lines
+    assert 'espatula_stage_seconds_count{stage="pagina"} 5' in lines
+    assert 'espatula_stage_seconds_sum{stage="pagina"} 600.61' in lines
+
+
+def test_page_rate():
+    registry = Registry()
+    for result in ("ok", "ok", "erro"):
+        registry.page("ml", "celular", result)
+    snapshot = registry.snapshot()
+    labels = (("keyword", "celular"), ("marketplace", "ml"))
+    assert snapshot["gauges"][("espatula_pages_per_minute", labels)] == (
+        2 * 60 / RATE_WINDOW
+    )
+    key = ("espatula_pages_total", labels + (("result", "erro"),))
+    assert snapshot["counters"][key] == 1
+
+
+def test_merge_replaces_each_source():
+    registry, worker = Registry(), Registry()
+    registry.inc("espatula_captcha_total", marketplace="ml")
+    worker.inc("espatula_captcha_total", marketplace="ml")
+    worker.observe("espatula_stage_seconds", 1, stage="pagina")
+    registry.merge(123, worker.snapshot())
+    # Um novo snapshot do mesmo processo substitui o anterior
+    worker.inc("espatula_captcha_total", marketplace="ml")
+    registry.merge(123, worker.snapshot())
+    text = registry.render()
+    assert 'espatula_captcha_total{marketplace="ml"} 3' in text
+    assert 'espatula_stage_seconds_count{stage="pagina"} 1' in text
+    # O registro local não é alterado pelos snapshots recebidos
+    assert registry.snapshot()["histograms"] == {}
+
+
+def test_merge_discards_stale_gauges():
+    registry, worker = Registry(), Registry()
+    worker.inc("espatula_captcha_total", marketplace="ml")
+    worker.set("espatula_queue_depth", 7, marketplace="ml", keyword="celular")
+    registry.merge(123, worker.snapshot())
+    assert "espatula_queue_depth" in registry.render()
+    # Processo sem atualização dentro da janela, ex.: encerrado
+    updated, snapshot = registry.remote[123]
+    registry.remote[123] = (updated - RATE_WINDOW - 1, snapshot)
+    text = registry.render()
+    assert "espatula_queue_depth" not in text
+    assert 'espatula_captcha_total{marketplace="ml"} 1' in text
+
+
+def test_browser_restarts_only_after_failure(tmp_path, monkeypatch):
+    base = pytest.importorskip("espatula.base")
+    from espatula.mercadolivre import MercadoLivreScraper
+
+    @contextmanager
+    def fake_sb(**kwargs):
+        yield SimpleNamespace(driver=SimpleNamespace(maximize_window=lambda: None))
+
+    monkeypatch.setattr(base, "SB", fake_sb)
+    scraper = MercadoLivreScraper(path=tmp_path)
+    scraper.open_url = lambda driver, url: None
+    key = ("espatula_browser_restarts_total", (("marketplace", scraper.name),))
+
+    def restarts():
+        return REGISTRY.snapshot()["counters"].get(key, 0)
+
+    before = restarts()
+    # Busca seguida da inspeção: dois navegadores, nenhuma reabertura
+    for _ in range(2):
+        with scraper.browser():
+            pass
+    assert restarts() == before
+    with pytest.raises(RuntimeError), scraper.browser():
+        raise RuntimeError("navegador fechado")
+    with scraper.browser():
+        pass
+    assert restarts() == before + 1
+
+
+def test_serve():
+    assert serve(None) is None
+    with socket.socket() as s:
+        s.bind(("", 0))
+        port = s.getsockname()[1]
+    server = serve(port)
+    try:
+        assert serve(str(port)) is server
+        with urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+        SERVERS.pop(port)
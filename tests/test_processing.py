@@ -0,0 +1,97 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from espatula.processing import COLUNAS_SAIDA, Classifier, LocalEngine, record_hash
+from espatula.sch import SCHIndex
+
+HEADER = (
+    "Número de Homologação;Nome do Fabricante;Modelo;Nome Comercial;Tipo do Produto\n"
+)
+
+
+class Keyword:
+    """Modelo de teste: positivo quando o texto contém a palavra"""
+
+    def __init__(self, word):
+        self.word = word
+
+    def predict_proba(self, texts):
+        positive = np.array([float(self.word in t.lower()) for t in texts])
+        return np.column_stack([1 - positive, positive])
+
+
+def engine(folder):
+    (folder / "produtos_certificados.csv").write_text(
+        HEADER
+        + "00001-20-00001;ACME;XR100;Roteador XR;Roteador\n"
+        + "00002-21-00002;Beta;BT20;Fone BT;Fone\n",
+        encoding="utf-8",
+    )
+    return LocalEngine(
+        sch=SCHIndex(folder), classifier=Classifier(model=Keyword("roteador"))
+    )
+
+
+def test_process_empty(tmp_path):
+    df = engine(tmp_path).process({})
+    assert df.empty
+    assert list(df.columns) == COLUNAS_SAIDA
+    assert (df.dtypes == "string").all()
+
+
+def test_process_pages(tmp_path):
+    pages = {
+        "a": {
+            "url": "a",
+            "nome": "Roteador XR Wi-Fi",
+            "marca": "ACME",
+            "modelo": "XR100",
+            "certificado": "00001-20-00001",
+            "categoria": "Informática | Redes",
+        },
+        "b": {"url": "b", "nome": "Caneca de porcelana", "marca": "Casa"},
+    }
+    df = engine(tmp_path).process(pages).set_index("url")
+    assert list(df.columns) == [c for c in COLUNAS_SAIDA if c != "url"]
+    assert df.loc["a", "modelo_sch"] == "XR100"
+    assert float(df.loc["a", "modelo_score"]) == 100
+    assert df.loc["a", "subcategoria"] == "Redes"
+    assert df.loc["a", "passível?"] == "True"
+    assert df.loc["b", "passível?"] == "False"
+    assert pd.isna(df.loc["b", "tipo_sch"])
+
+
+def test_record_hash():
+    page = {"url": "a", "nome": "Fone", "outro": 1}
+    assert record_hash(page) == record_hash({"url": "a", "nome": " Fone ", "outro": 2})
+    assert record_hash(page) != record_hash({**page, "modelo": "X"})
+    assert record_hash(page, "local") != record_hash(page, "remoto")
+
+
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def predict_proba(self, texts):
+        return np.array([[1 - self.value, self.value]] * len(texts))
+
+
+def test_classifier_identity(tmp_path):
+    missing = Classifier(model_file=None)
+    assert missing.identity is None and not missing.available
+    assert not LocalEngine(sch=SCHIndex(tmp_path), classifier=missing).available
+    with pytest.raises(RuntimeError):
+        missing.predict(pd.DataFrame({"nome": ["a"], "subcategoria": [None]}))
+    identities = set()
+    for value in (0.2, 0.9):
+        (model_file := tmp_path / f"modelo_{value}.pkl").write_bytes(
+            pickle.dumps(Constant(value))
+        )
+        classifier = Classifier(model_file=model_file)
+        identities.add(classifier.identity)
+    assert len(identities) == 2
+    df = pd.DataFrame({"nome": ["a", "b"], "subcategoria": [None, "c"]})
+    assert classifier.predict(df).tolist() == [0.9, 0.9]
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pytest
+
+pytest.importorskip("gradio_client")
+
+from gradio_client.exceptions import AppError  # noqa: E402
+
+from espatula.remote import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpenError,
+    PoolTimeoutError,
+    RemoteClient,
+)
+
+EXECUTOR = ThreadPoolExecutor(16)
+
+
+class FakeServer:
+    """Endpoint local que executa `handler` em cada chamada e conta a concorrência"""
+
+    def __init__(self, handler=None):
+        self.handler = handler or (lambda *args, **kwargs: kwargs)
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+    def run(self, args, kwargs):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            return self.handler(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class FakeJob:
+    """Executado numa thread, como o `gradio_client.Job`"""
+
+    def __init__(self, server, args, kwargs):
+        self.server = server
+        self.future = EXECUTOR.submit(server.run, args, kwargs)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def cancel(self):
+        self.server.cancelled += 1
+
+
+class FakeClient:
+    """Mesma interface de `gradio_client.Client` usada pelo `RemoteClient`"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def submit(self, *args, **kwargs):
+        return FakeJob(self.server, args, kwargs)
+
+
+@dataclass
+class LocalRemote(RemoteClient):
+    server: FakeServer = field(default_factory=FakeServer)
+    backoff: float = 0.01
+    created: list = field(default_factory=list)
+    revisions: list = field(default_factory=lambda: ["abc"])
+
+    def _new_client(self):
+        self.created.append(client := FakeClient(self.server))
+        return client
+
+    def _space_revision(self):
+        if not self.revisions:
+            raise ConnectionError("falha simulada")
+        return self.revisions.pop(0)
+
+
+def sleeping(seconds):
+    def handler(*args, **kwargs):
+        time.sleep(seconds)
+        return kwargs
+
+    return handler
+
+
+def failing(times, error=ConnectionError):
+    state = {"n": 0}
+
+    def handler(*args, **kwargs):
+        state["n"] += 1
+        if state["n"] <= times:
+            raise error("falha simulada")
+        return kwargs
+
+    return handler
+
+
+async def gather(client, n, **kwargs):
+    return await asyncio.gather(
+        *(client.apredict(i=i, **kwargs) for i in range(n)), return_exceptions=True
+    )
+
+
+def test_predict():
+    client = LocalRemote()
+    assert client.predict(json_file="a.json", api_name="/x") == {
+        "json_file": "a.json",
+        "api_name": "/x",
+    }
+
+
+def test_pool_limits_clients_and_concurrency():
+    server = FakeServer(sleeping(0.05))
+    client = LocalRemote(server=server, pool_size=2)
+    results = asyncio.run(gather(client, 6))
+    assert results == [{"i": i} for i in range(6)]
+    assert len(client.created) == 2
+    assert server.max_active == 2
+    # Os clientes são reutilizados nas chamadas seguintes
+    asyncio.run(gather(client, 3))
+    assert len(client.created) == 2
+
+
+def test_retry_with_backoff():
+    server = FakeServer(failing(2))
+    client = LocalRemote(server=server, retries=3)
+    start = time.monotonic()
+    assert client.predict(i=1) == {"i": 1}
+    assert server.calls == 3
+    # Esperas de 0.01 e 0.02, com variação de +-50%
+    assert time.monotonic() - start >= 0.015
+    assert client.breaker.failures == 0
+
+
+def test_retries_exhausted():
+    server = FakeServer(failing(5))
+    client = LocalRemote(server=server, retries=3)
+    with pytest.raises(ConnectionError):
+        client.predict(i=1)
+    assert server.calls == 3
+    assert client.breaker.failures == 3
+
+
+def test_app_error_is_not_retried():
+    server = FakeServer(failing(1, AppError))
+    client = LocalRemote(server=server, retries=3)
+    with pytest.raises(AppError):
+        client.predict(i=1)
+    assert server.calls == 1
+    assert client.breaker.failures == 0
+
+
+def test_timeout_cancels_job():
+    server = FakeServer(sleeping(2))
+    client = LocalRemote(server=server, retries=1, pool_size=1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.predict(i=1, timeout=0.1)
+    # O prazo não depende do término do job
+    assert time.monotonic() - start < 0.2
+    assert server.cancelled == 1
+    # O cliente do job em execução é descartado, a próxima chamada usa um novo
+    assert client.predict(i=2) == {"i": 2}
+    assert len(client.created) == 2
+
+
+def test_breaker_open_and_half_open():
+    server = FakeServer(failing(2))
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=0.1)
+    client = LocalRemote(server=server, retries=1, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            client.predict(i=1)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.predict(i=1)
+    assert server.calls == 2  # O serviço não é chamado com o circuito aberto
+
+    time.sleep(0.1)
+    assert breaker.state == "half-open"
+    assert client.predict(i=1) == {"i": 1}
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.05)
+    breaker.failure()
+    time.sleep(0.05)
+    breaker.check()  # Chamada de teste
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.failure()
+    assert breaker.state == "open"
+
+
+def test_pool_wait_timeout_is_not_a_failure():
+    server = FakeServer(sleeping(0.2))
+    breaker = CircuitBreaker(failure_threshold=1)
+    client = LocalRemote(server=server, pool_size=1, retries=3, breaker=breaker)
+
+    async def saturated():
+        slow = asyncio.create_task(client.apredict(i=0, timeout=5))
+        await asyncio.sleep(0.02)
+        with pytest.raises(PoolTimeoutError):
+            await client.apredict(i=1, timeout=0.05)
+        return await slow
+
+    assert asyncio.run(saturated()) == {"i": 0}
+    assert server.calls == 1
+    assert breaker.failures == 0
+    assert breaker.state == "closed"
+
+
+def test_signature_follows_space_revision(monkeypatch):
+    client = LocalRemote(space="org/space", revisions=["abc", "def"])
+    assert client.signature == "remote:org/space:abc"
+    # A revisão é consultada novamente somente após REVISION_TTL
+    assert client.signature == "remote:org/space:abc"
+    monkeypatch.setattr("espatula.remote.REVISION_TTL", 0)
+    assert client.signature == "remote:org/space:def"
+    assert client.signature == "remote:org/space:None"
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+
+from espatula.sch import SCHIndex, certificado_keys
+
+HEADER = (
+    "Número de Homologação;Nome do Fabricante;Modelo;Nome Comercial;Tipo do Produto\n"
+)
+
+
+def write_dump(path, rows):
+    path.write_text(
+        HEADER + "".join(";".join(r) + "\n" for r in rows), encoding="utf-8"
+    )
+    return path
+
+
+def test_certificado_keys():
+    keys = certificado_keys(["01234-56-7890", None, "", "abc", "1234567890123"])
+    assert keys.tolist() == [1234567890, -1, -1, -1, -1]
+
+
+def test_refresh_lookup_and_persistence(tmp_path):
+    dump = write_dump(
+        tmp_path / "produtos_certificados.csv",
+        [
+            ("00001-20-00001", "ACME", "X1", "Fone X", "Fone"),
+            ("00001-20-00001", "ACME", "X1B", "Fone X", "Fone"),
+            ("00002-21-00002", "Beta", "B2", "Roteador", "Roteador"),
+        ],
+    )
+    index = SCHIndex(tmp_path)
+    assert len(index) == 0
+    assert index.refresh()
+    assert not index.refresh()  # arquivo já incorporado
+    assert index.lookup("00001200000 1")["modelo"] == "X1 | X1B"
+    assert "000022100002" in index
+    assert index.lookup("999") is None
+
+    reloaded = SCHIndex(tmp_path)
+    assert len(reloaded) == 2
+    assert reloaded.sources == {dump.name: SCHIndex._signature(dump)}
+
+
+def test_refresh_replaces_certificates(tmp_path):
+    dump = write_dump(
+        tmp_path / "produtos_certificados.csv",
+        [
+            ("00001-20-00001", "ACME", "X1", "Fone X", "Fone"),
+            ("00002-21-00002", "Beta", "B2", "Roteador", "Roteador"),
+        ],
+    )
+    index = SCHIndex(tmp_path)
+    index.refresh()
+    write_dump(dump, [("00002-21-00002", "Beta", "B3", "Roteador", "Roteador")])
+    os.utime(dump, ns=(0, 10**18))
+    assert index.refresh()
+    assert index.lookup("000012000001")["modelo"] == "X1"
+    assert index.lookup("000022100002")["modelo"] == "B3"
+
+
+def test_enrich(tmp_path):
+    write_dump(
+        tmp_path / "produtos_certificados.csv",
+        [("00001-20-00001", "ACME", "X1", "Fone X", "Fone")],
+    )
+    index = SCHIndex(tmp_path)
+    index.refresh()
+    df = index.enrich(pd.DataFrame({"certificado": ["000012000001", "123", None]}))
+    assert df["modelo_sch"].tolist()[0] == "X1"
+    assert df["fabricante_sch"].isna().tolist() == [False, True, True]
@@ -0,0 +1,132 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from espatula.screenshots import (
+    CAPTURADO,
+    PENDENTE,
+    REMOVIDO,
+    SINCRONIZADO,
+    ScreenshotManifest,
+    get_manifest,
+)
+
+
+def lines(manifest):
+    return manifest.manifest_file.read_text(encoding="utf-8").splitlines()
+
+
+def test_lifecycle(tmp_path):
+    manifest = ScreenshotManifest(tmp_path)
+    assert not manifest.exists()
+    manifest.add("a.pdf", url="https://a", sessao="fone")
+    manifest.add("b.pdf", url="https://b", sessao="fone")
+    manifest.add("c.pdf", url="https://c", sessao="drone")
+    assert manifest.to_delete("fone") == ["a.pdf", "b.pdf"]
+    assert manifest.to_delete("drone") == ["c.pdf"]
+
+    manifest.persisted(["a.pdf", "c.pdf", "x.pdf"])
+    assert manifest.to_upload() == ["a.pdf", "c.pdf"]
+    assert manifest.to_delete("fone") == ["b.pdf"]
+
+    manifest.mark(["b.pdf"], REMOVIDO)
+    manifest.mark(["a.pdf"], SINCRONIZADO)
+    manifest.mark(["c.pdf"], SINCRONIZADO, pacote="ml_drone.zip")
+    assert manifest.to_upload() == manifest.to_delete("fone") == []
+    assert manifest.entries["c.pdf"]["url"] == "https://c"
+
+    # O estado é reconstruído a partir do arquivo
+    reloaded = ScreenshotManifest(tmp_path)
+    assert reloaded.entries == manifest.entries
+    assert reloaded.status[SINCRONIZADO] == {"a.pdf", "c.pdf"}
+
+
+def test_mark_skips_unchanged(tmp_path):
+    manifest = ScreenshotManifest(tmp_path)
+    manifest.add("a.pdf")
+    manifest.mark(["a.pdf", "b.pdf"], CAPTURADO)
+    assert len(lines(manifest)) == 1
+
+
+def test_rebuild(tmp_path):
+    for name in ("a.pdf", "b.pdf", "c.txt"):
+        (tmp_path / name).write_bytes(b"%PDF")
+    manifest = ScreenshotManifest(tmp_path)
+    manifest.rebuild({"a.pdf"})
+    assert manifest.to_upload() == ["a.pdf"]
+    # Arquivos sem sessão são excluídos por qualquer sessão
+    assert manifest.to_delete("fone") == ["b.pdf"]
+    manifest.rebuild({"a.pdf"})
+    assert len(lines(manifest)) == 2
+
+
+def test_compact(tmp_path):
+    manifest = ScreenshotManifest(tmp_path)
+    for name in ("a.pdf", "b.pdf"):
+        manifest.add(name, sessao="fone")
+    manifest.persisted(["a.pdf"])
+    manifest.mark(["a.pdf"], SINCRONIZADO)
+    manifest.mark(["b.pdf"], REMOVIDO)
+    assert len(lines(manifest)) == 5
+
+    manifest.compact()
+    assert len(lines(manifest)) == 1
+    assert set(manifest.entries) == {"a.pdf"}
+    assert not manifest.status[REMOVIDO]
+    reloaded = ScreenshotManifest(tmp_path)
+    assert reloaded.entries == manifest.entries
+    assert reloaded.status[SINCRONIZADO] == {"a.pdf"}
+    assert not reloaded.status[PENDENTE]
+
+
+def capture(folder, names, sessao):
+    """Executada em outro processo, como a raspagem de um job"""
+    manifest = ScreenshotManifest(folder)
+    for name in names:
+        manifest.add(name, sessao=sessao)
+    manifest.persisted(names[::2])
+
+
+def test_reads_changes_from_other_processes(tmp_path):
+    manifest = get_manifest(tmp_path)
+    manifest.add("antigo.pdf", sessao="fone")
+    names = [f"{i}.pdf" for i in range(40)]
+    with ProcessPoolExecutor(2, mp_context=get_context("spawn")) as executor:
+        jobs = [
+            executor.submit(capture, tmp_path, names[:20], "drone"),
+            executor.submit(capture, tmp_path, names[20:], "tv box"),
+        ]
+        for job in jobs:
+            job.result()
+    assert get_manifest(tmp_path) is manifest
+    assert len(manifest.entries) == 41
+    assert len(manifest.to_upload()) == 20
+    # O job de outra palavra-chave não perde os screenshots ainda não gravados
+    assert manifest.to_delete("fone") == ["antigo.pdf"]
+    assert ScreenshotManifest(tmp_path).entries == manifest.entries
+
+
+def test_compaction_by_another_instance(tmp_path):
+    first, second = ScreenshotManifest(tmp_path), ScreenshotManifest(tmp_path)
+    first.add("a.pdf")
+    first.add("b.pdf")
+    second.mark(["a.pdf"], REMOVIDO)  # lê as alterações antes de gravar
+    assert second.entries["a.pdf"]["situacao"] == REMOVIDO
+    second.compact()
+    first.add("c.pdf")
+    assert set(first.entries) == {"b.pdf", "c.pdf"}
+    assert set(ScreenshotManifest(tmp_path).entries) == {"b.pdf", "c.pdf"}
+
+
+def test_rebuild_with_existing_manifest(tmp_path):
+    # O manifesto é criado pela primeira captura da nova versão
+    manifest = ScreenshotManifest(tmp_path)
+    manifest.add("novo.pdf", sessao="fone")
+    for name in ("novo.pdf", "antigo.pdf", "citado.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF")
+    assert manifest.exists()
+    assert manifest.untracked() == ["antigo.pdf", "citado.pdf"]
+    manifest.rebuild({"citado.pdf"})
+    assert manifest.untracked() == []
+    assert manifest.to_upload() == ["citado.pdf"]
+    assert manifest.to_delete("drone") == ["antigo.pdf"]
+    assert manifest.entries["novo.pdf"]["sessao"] == "fone"
@@ -0,0 +1,65 @@
+from espatula.screenshots import REMOVIDO, SINCRONIZADO, ScreenshotManifest
+from espatula.sync import TRANSFER_LOG, ScreenshotSync, checksum, sync_screenshots
+
+
+def pending(folder, names, sessao="fone"):
+    manifest = ScreenshotManifest(folder)
+    for name in names:
+        (folder / name).write_bytes(f"%PDF {name}".encode() * 100)
+        manifest.add(name, sessao=sessao)
+    manifest.persisted(names)
+    return manifest
+
+
+def test_sync_copies_verifies_and_removes(tmp_path):
+    source, target = tmp_path / "local", tmp_path / "nuvem"
+    source.mkdir()
+    manifest = pending(source, ["a.pdf", "b.pdf"])
+    contents = {n: (source / n).read_bytes() for n in ("a.pdf", "b.pdf")}
+    done = []
+    stats = sync_screenshots(manifest, target, progress=lambda d, t: done.append(d))
+    assert stats == {SINCRONIZADO: 2, REMOVIDO: 0, "erros": 0}
+    assert done == [1, 2]
+    assert {n: (target / n).read_bytes() for n in contents} == contents
+    assert not list(source.glob("*.pdf"))
+    assert not list(target.glob("*.part"))
+    assert not (source / TRANSFER_LOG).exists()
+    assert manifest.to_upload() == []
+
+
+def test_missing_source_is_removed(tmp_path):
+    source = tmp_path / "local"
+    source.mkdir()
+    manifest = pending(source, ["a.pdf"])
+    (source / "a.pdf").unlink()
+    stats = sync_screenshots(manifest, tmp_path / "nuvem")
+    assert stats[REMOVIDO] == 1
+    assert manifest.entries["a.pdf"]["situacao"] == REMOVIDO
+
+
+def test_resume_after_interruption(tmp_path):
+    source, target = tmp_path / "local", tmp_path / "nuvem"
+    source.mkdir()
+    target.mkdir()
+    manifest = pending(source, ["a.pdf", "b.pdf"])
+    # Cópia verificada antes da interrupção, o original já foi excluído
+    sync = ScreenshotSync(manifest, target)
+    (target / "a.pdf").write_bytes((source / "a.pdf").read_bytes())
+    sync.log("a.pdf", checksum(target / "a.pdf"))
+    (source / "a.pdf").unlink()
+
+    stats = ScreenshotSync(manifest, target).run()
+    assert stats == {SINCRONIZADO: 2, REMOVIDO: 0, "erros": 0}
+
+
+def test_corrupted_target_is_copied_again(tmp_path):
+    source, target = tmp_path / "local", tmp_path / "nuvem"
+    source.mkdir()
+    target.mkdir()
+    manifest = pending(source, ["a.pdf"])
+    original = (source / "a.pdf").read_bytes()
+    sync = ScreenshotSync(manifest, target)
+    sync.log("a.pdf", checksum(source / "a.pdf"))
+    (target / "a.pdf").write_bytes(b"corrompido")
+    assert sync.run()[SINCRONIZADO] == 1
+    assert (target / "a.pdf").read_bytes() == original
@@ -1,14 +1,13 @@
-import base64
-import uuid
+import math
 
 
 from fastcore.xtras import Path
+import pandas as pd
 import streamlit as st
 from streamlit_pdf_viewer import pdf_viewer
 
 
 from config import (
-    CLOUD_PATH,
     LOGOS,
     TITLE,
     FOLDER,
@@ -20,9 +19,21 @@ from config import (
     SHUFFLE,
     RECONNECT,
     TIMEOUT,
+    LOCAL_PROCESSING,
+    PACK_SCREENSHOTS,
+    SCRAPERS,
+)
+from espatula.bundle import extract
+from espatula.processing import has_classifier
+from callbacks import _set_folder, _set_cloud, get_scraper, load_json
+from data_processing import (
+    apply_group_decision,
+    derive_columns,
+    entity_index,
+    image_cache,
+    image_members,
+    update_processed_pages,
 )
-from callbacks import _set_folder, _set_cloud
-from data_processing import update_processed_pages
 
 COLUMN_CONFIG = {
     "url": st.column_config.LinkColumn(
@@ -45,6 +56,15 @@ COLUMN_CONFIG = {
     "imagem": st.column_config.ImageColumn(
         "Imagem", width="small", help="📜Dados do Anúncio"
     ),
+    "grupo": st.column_config.TextColumn(
+        "Grupo",
+        width="small",
+        help="🖼️Anúncios com imagens quase idênticas, em qualquer marketplace",
+        disabled=True,
+    ),
+    "miniatura": st.column_config.ImageColumn(
+        "Imagem", width="small", help="📜Dados do Anúncio - cópia local"
+    ),
     "nome": st.column_config.TextColumn(
         "Título", width=None, help="📜Dados do Anúncio", disabled=True
     ),
@@ -87,6 +107,19 @@ COLUMN_CONFIG = {
         help="🗃️Dados de Certificação - SCH",
         disabled=True,
     ),
+    "sugestao_sch": st.column_config.TextColumn(
+        "SCH - Certificado Sugerido",
+        width=None,
+        help="🖇️Comparação de Strings - Anúncio x SCH",
+        disabled=True,
+    ),
+    "sugestao_score": st.column_config.ProgressColumn(
+        "SCH - Sugestão (%)",
+        format="%d%%",
+        min_value=0,
+        max_value=100,
+        help="🖇️Comparação de Strings - Anúncio x SCH",
+    ),
     "modelo_match": st.column_config.CheckboxColumn(
         "Modelo Confere?",
         width=None,
@@ -119,7 +152,8 @@ ARRANJO_COLUNAS = [
     "passível?",
     "modelo_match",
     "nome_match",
-    "imagem",
+    "grupo",
+    "miniatura",
     "data",
     "nome",
     "subcategoria",
@@ -131,20 +165,19 @@ ARRANJO_COLUNAS = [
     "nome_sch",
     "fabricante_sch",
     "tipo_sch",
+    "sugestao_sch",
+    "sugestao_score",
     "url",
 ]
 
 
 def display_df(state, df, output_df_key):
-    # Generate a unique key for the edited rows state to avoid conflicts
-    edited_key = f"{output_df_key}_{uuid.uuid4()}"
+    # A chave muda somente quando uma edição move a linha entre as tabelas
+    edited_key = f"{output_df_key}_{state.editor_version or 0}"
     # The index in df should be in the default numeric order
-    df.loc[:, ["pdf"]] = f"{CLOUD_PATH}/" + df.loc[:, "screenshot"].astype("string")
-    df.loc[:, ["modelo_match"]] = (df.loc[:, "modelo_score"] == 100).astype("bool")
-    df.loc[:, ["nome_match"]] = (df.loc[:, "nome_score"] == 100).astype("bool")
     colunas = ARRANJO_COLUNAS + ["pdf"]
     state[output_df_key] = st.data_editor(
-        df.style.highlight_null(color="yellow"),
+        df,
         height=720 if len(df) >= 20 else None,
         use_container_width=True,
         column_order=colunas,
@@ -158,9 +191,200 @@ def display_df(state, df, output_df_key):
     return state[output_df_key]
 
 
-def pdf_container(pdf_path):
-    base64_pdf = base64.b64encode(Path(pdf_path).read_bytes()).decode("utf-8")
-    return pdf_viewer(input=base64_pdf, width="100%")
+PAGE_SIZES = (10, 25, 50, 100)
+CERTIFICADO = ("Todos", "Com certificado", "Sem certificado")
+
+
+def raw_file(state, kind: str, marketplace: str) -> Path:
+    scraper = get_scraper(marketplace, state.folder)
+    if kind == "links":
+        return scraper.links_file(state.keyword)
+    return scraper.pages_file(state.keyword)
+
+
+def filter_records(
+    records: dict, pagina=None, certificado: str = CERTIFICADO[0], busca: str = ""
+) -> list[dict]:
+    busca = busca.strip().lower()
+    filtered = []
+    for record in records.values():
+        if pagina is not None and record.get("página_de_busca") != pagina:
+            continue
+        if certificado != CERTIFICADO[0] and bool(record.get("certificado")) != (
+            certificado == CERTIFICADO[1]
+        ):
+            continue
+        if busca and busca not in f"{record.get('nome', '')}".lower():
+            continue
+        filtered.append(record)
+    return filtered
+
+
+def show_raw_data(state, kind: str):
+    """Exibe os dados brutos paginados, enviando ao navegador somente a página visível"""
+    # A pasta do marketplace é criada ao acessar `scraper.folder`, só as existentes
+    marketplaces = [
+        m
+        for m in SCRAPERS
+        if (Path(state.folder) / get_scraper(m, state.folder).name).is_dir()
+        and raw_file(state, kind, m).is_file()
+    ]
+    if not marketplaces:
+        return
+    filters = st.columns(4, vertical_alignment="bottom")
+    marketplace = filters[0].selectbox(
+        "Marketplace",
+        marketplaces,
+        index=marketplaces.index(state.mkplc) if state.mkplc in marketplaces else 0,
+        key=f"{kind}_marketplace",
+    )
+    records = load_json(raw_file(state, kind, marketplace))
+    paginas = sorted(
+        {p for r in records.values() if (p := r.get("página_de_busca")) is not None}
+    )
+    pagina = filters[1].selectbox(
+        "Página de Busca",
+        [None, *paginas],
+        format_func=lambda p: "Todas" if p is None else p,
+        key=f"{kind}_pagina",
+    )
+    certificado = filters[2].selectbox(
+        "Certificado", CERTIFICADO, key=f"{kind}_certificado"
+    )
+    page_size = filters[3].selectbox("Por Página", PAGE_SIZES, key=f"{kind}_size")
+    busca = st.text_input(
+        "Buscar no nome do produto", key=f"{kind}_busca", placeholder="🔎"
+    )
+    filtered = filter_records(records, pagina, certificado, busca)
+    n_pages = max(1, math.ceil(len(filtered) / page_size))
+    page = st.number_input(
+        f"Página (de {n_pages})",
+        min_value=1,
+        max_value=n_pages,
+        value=1,
+        key=f"{kind}_page_{n_pages}",
+    )
+    start = (page - 1) * page_size
+    st.caption(
+        f"Registros {min(start + 1, len(filtered))}-{min(start + page_size, len(filtered))} de {len(filtered)}"
+    )
+    st.json(filtered[start : start + page_size], expanded=1)
+
+
+def pdf_container(pdf_bytes: bytes):
+    return pdf_viewer(input=pdf_bytes, width="100%")
+
+
+def screenshot_pdf(state, scraper, arquivo: str) -> bytes | None:
+    """Bytes do pdf do screenshot, avulso ou dentro do pacote sincronizado"""
+    if (pdf_path := Path(state.screenshots or "") / arquivo).is_file():
+        return pdf_path.read_bytes()
+    # Screenshots agrupados são lidos do pacote sincronizado na pasta da nuvem
+    pacote = Path(state.cloud or "") / scraper.screenshots.locate(arquivo)
+    if pacote.suffix == ".zip" and pacote.is_file():
+        return extract(pacote, arquivo)
+    return None
+
+
+def screenshot_preview(state, arquivo: str):
+    """Exibe as imagens das páginas do screenshot ou, na falta delas, o pdf completo"""
+    scraper = get_scraper(state.mkplc, state.folder)
+    previews = scraper.previews
+    if pages := previews.pages(arquivo):
+        page = st.number_input(
+            f"Página (de {len(pages)})",
+            min_value=1,
+            max_value=len(pages),
+            key=f"preview_{arquivo}",
+        )
+        st.image(str(pages[page - 1]), use_column_width="auto")
+        return
+    thumbnail = previews.thumbnail(arquivo)
+    if thumbnail:
+        st.image(str(thumbnail), use_column_width="auto")
+    # A miniatura mostra só a tela visível, o pdf completo é enviado sob demanda
+    if thumbnail and not st.toggle("Exibir o pdf completo", key=f"pdf_{arquivo}"):
+        return
+    if (pdf_bytes := screenshot_pdf(state, scraper, arquivo)) is not None:
+        pdf_container(pdf_bytes)
+    elif not thumbnail:
+        st.caption("Pré-visualização indisponível para este anúncio")
+    else:
+        st.caption("Pdf do screenshot indisponível")
+
+
+@st.fragment
+def show_previews(state):
+    df = state.processed_pages
+    df = df.loc[df["screenshot"].fillna("") != "", ["nome", "url", "screenshot"]]
+    if df.empty:
+        return
+    arquivo = st.selectbox(
+        "Anúncio",
+        df["screenshot"].to_list(),
+        format_func=dict(zip(df["screenshot"], df["nome"].fillna(""))).get,
+        key="preview_anuncio",
+    )
+    screenshot_preview(state, arquivo)
+    url = df.loc[df["screenshot"] == arquivo, "url"].iloc[0]
+    show_same_product(state, url)
+    show_same_image(state, url)
+
+
+def show_listings(caption: str, others):
+    if not others.empty:
+        st.caption(caption)
+        st.dataframe(
+            others,
+            hide_index=True,
+            column_config={"url": st.column_config.LinkColumn("url")},
+        )
+
+
+def show_same_product(state, url: str):
+    index = entity_index(state)
+    others = index.members(index.entity(state.mkplc, url))
+    others = others.loc[others["url"] != url, ["marketplace", "nome", "url"]]
+    show_listings("Outros anúncios do mesmo produto", others)
+
+
+def show_same_image(state, url: str):
+    df = state.processed_pages
+    if pd.isna(imagem := df.loc[df["url"] == url, "imagem"].iloc[0]):
+        return
+    others = image_members(state, imagem)
+    others = others.loc[(others["url"] != url) | (others["marketplace"] != state.mkplc)]
+    show_listings("Outros anúncios com a mesma imagem", others)
+
+
+def discard_group_decision(state):
+    state.group_decision = None
+
+
+def confirm_group_decision(state):
+    """Pergunta se a classificação editada vale para os anúncios com a mesma imagem"""
+    if (decision := state.group_decision) is None:
+        return
+    classe = "Positivo" if decision["valor"] else "Negativo"
+    with st.container(border=True):
+        st.warning(
+            f"{len(decision['urls'])} outro(s) anúncio(s) desta tabela possuem imagem quase idêntica. Aplicar a mesma classificação ({classe})?",
+            icon="🖼️",
+        )
+        show_listings(
+            "Anúncios com a mesma imagem, em todos os marketplaces",
+            image_members(state, decision["imagem"]),
+        )
+        left, right = st.columns(2)
+        left.button(
+            "Aplicar", on_click=apply_group_decision, args=(state,), key="grupo_aplicar"
+        )
+        right.button(
+            "Manter somente este anúncio",
+            on_click=discard_group_decision,
+            args=(state,),
+            key="grupo_ignorar",
+        )
 
 
 def show_results(state):
@@ -188,6 +412,7 @@ def show_results(state):
                             * (_fuzzy string matching - Distância de Levenshtein_).
                         * _Uma taxa de `100%` indica que um dado está contido no outro._
                             * :red[Isso não garante a validade da homologação, somente é um indicativo de correspondência dos dados.]                        
+                        * No processamento local, os registros sem certificado válido são comparados com o catálogo do SCH, restrito ao mesmo fabricante e prefixo do modelo, e o certificado mais próximo é sugerido.
                         """)
     with columns[3]:
         with st.popover("📌Classificador Binário"):
@@ -212,6 +437,16 @@ def show_results(state):
         icon="🔥",
         expanded=True,
     ):
+        # O link de screenshots agrupados aponta para o pacote da sessão
+        manifest = get_scraper(state.mkplc, state.folder).screenshots
+        derive_columns(
+            state.processed_pages,
+            manifest.locate,
+            image_cache(state),
+            entity_index(state),
+            state.mkplc,
+        )
+        confirm_group_decision(state)
         rows = state.processed_pages["passível?"]
         display_df(
             state,
@@ -231,6 +466,8 @@ def show_results(state):
         "É possível alterar a Classe, caso incorreta, clicando na coluna _Positivo/Negativo_!",
         icon="✍🏽",
     )
+    with st.expander("Pré-visualização da Captura de Tela", icon="🖼️"):
+        show_previews(state)
 
 
 def presentation_page():
@@ -314,6 +551,8 @@ def get_cached_info(state):
         cache_info += "\n * :red[0] anúncios completos"
     if (processed_pages := state.processed_pages) is not None:
         cache_info += f"\n* **{len(processed_pages)}** anúncios processados"
+        if cache_stats := state.get("cache_stats"):
+            cache_info += f" (**{cache_stats['hits']}** do cache, **{cache_stats['misses']}** novos)"
     else:
         cache_info += "\n * :red[0] anúncios processados"
     return any([cached_links, cached_pages, processed_pages is not None]), cache_info
@@ -363,6 +602,22 @@ def get_params(state, config):
             value=float(config.get(KEYS["timeout"], 2)),
         )
 
+    with st.expander("CONFIGURAÇÕES - PROCESSAMENTO", expanded=False):
+        classifier = has_classifier()
+        st.checkbox(
+            LOCAL_PROCESSING,
+            key="local_processing",
+            disabled=not classifier,
+            help="Processa os dados nesta máquina, com a base do SCH salva em <pasta de trabalho>/sch, em vez do serviço remoto"
+            if classifier
+            else "Indisponível, sem classificador: defina a variável de ambiente CLASSIFIER com o arquivo do modelo treinado",
+        )
+        st.checkbox(
+            PACK_SCREENSHOTS,
+            key="pack_screenshots",
+            help="Envia os screenshots de cada palavra-chave num único arquivo zip para a pasta do Onedrive, em vez de um pdf por anúncio",
+        )
+
 
 # file_path = "C:/streamlit/todo_app/assets/todo_guide.pdf"
 # with open(file_path, "rb") as f:  # pdf file is binary, use rb